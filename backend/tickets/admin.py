@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth import get_user_model
-from .models import Ticket, TicketTask, TypeOfService, TicketAttachment, EscalationLog, AuditLog, Product, Client, CallLog, FeedbackRating, Notification, Category, RetentionPolicy, Announcement
+from .models import Ticket, TicketTask, TypeOfService, AttachmentBlob, TicketAttachment, ChunkedUpload, EscalationLog, AuditLog, AuditArchiveSegment, Product, Client, CallLog, FeedbackRating, Notification, Category, RetentionPolicy, RetentionPurgeRun, Announcement
 
 User = get_user_model()
 
@@ -32,8 +32,22 @@ class TypeOfServiceAdmin(admin.ModelAdmin):
 
 @admin.register(TicketAttachment)
 class TicketAttachmentAdmin(admin.ModelAdmin):
-    list_display = ('ticket', 'file', 'uploaded_by', 'is_resolution_proof', 'uploaded_at')
+    list_display = ('ticket', 'original_name', 'file', 'uploaded_by', 'is_resolution_proof', 'uploaded_at')
     list_filter = ('is_resolution_proof',)
+    readonly_fields = ('blob', 'content_sha256')
+
+
+@admin.register(AttachmentBlob)
+class AttachmentBlobAdmin(admin.ModelAdmin):
+    list_display = ('sha256', 'name', 'size', 'ref_count', 'created_at')
+    readonly_fields = ('sha256', 'name', 'size', 'ref_count', 'created_at')
+
+
+@admin.register(ChunkedUpload)
+class ChunkedUploadAdmin(admin.ModelAdmin):
+    list_display = ('filename', 'ticket', 'uploaded_by', 'offset', 'size', 'status', 'updated_at')
+    list_filter = ('status',)
+    readonly_fields = ('created_at', 'updated_at')
 
 
 @admin.register(EscalationLog)
@@ -50,6 +64,12 @@ class AuditLogAdmin(admin.ModelAdmin):
     readonly_fields = ('timestamp', 'entity', 'entity_id', 'action', 'activity', 'actor', 'actor_email', 'ip_address', 'changes')
 
 
+@admin.register(AuditArchiveSegment)
+class AuditArchiveSegmentAdmin(admin.ModelAdmin):
+    list_display = ('path', 'first_timestamp', 'last_timestamp', 'row_count', 'size_bytes', 'compression')
+    readonly_fields = ('created_at',)
+
+
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     list_display = ('name', 'description', 'is_active', 'created_at')
@@ -99,6 +119,13 @@ class RetentionPolicyAdmin(admin.ModelAdmin):
     readonly_fields = ('updated_at',)
 
 
+@admin.register(RetentionPurgeRun)
+class RetentionPurgeRunAdmin(admin.ModelAdmin):
+    list_display = ('target', 'cutoff', 'deleted', 'batches', 'elapsed_seconds', 'started_at', 'finished_at')
+    list_filter = ('target',)
+    readonly_fields = ('started_at', 'updated_at')
+
+
 @admin.register(Announcement)
 class AnnouncementAdmin(admin.ModelAdmin):
     list_display = ('title', 'announcement_type', 'visibility', 'is_active', 'start_date', 'end_date', 'created_by', 'created_at')
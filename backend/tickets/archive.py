@@ -0,0 +1,270 @@
+"""Cold storage for aged audit logs.
+
+``archive_audit_logs`` moves ``AuditLog`` rows older than a cutoff into
+append-only JSONL segment files under ``MEDIA_ROOT/audit_archive``,
+compressed with zstd when the optional ``zstandard`` package is installed
+and gzip otherwise. A segment holds at most ``segment_size`` consecutive
+rows and is indexed by an ``AuditArchiveSegment`` row. The file is written
+and renamed into place first; the index row is then saved and the archived
+rows deleted in one transaction, so an interrupted run loses nothing and is
+simply run again. Files are never rewritten.
+
+``search_archive`` streams matching records back, newest first, opening
+only the segments whose index can match. ``archive_page`` returns a bounded
+page of them and a cursor to resume from.
+
+Schedulers should call ``python manage.py archive_audit_logs`` (or
+``archive_audit_logs()``) before ``purge_retention``.
+"""
+import gzip
+import io
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .exports import _json_default, display_name, user_name_fields
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is always available
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = 'audit_archive'
+DEFAULT_SEGMENT_SIZE = 10000
+
+_FIELDS = [
+    'id', 'timestamp', 'entity', 'entity_id', 'action', 'activity', 'actor_id',
+    'actor_email', 'actor_role', 'ip_address', 'changes', *user_name_fields('actor'),
+]
+
+
+def _open(path, mode, compression):
+    if compression == 'zst':
+        if zstandard is None:
+            raise RuntimeError(f'{path} is zstd-compressed but zstandard is not installed.')
+        raw = open(path, mode)
+        if mode == 'wb':
+            return zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=True)
+        return zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    return gzip.open(path, mode)
+
+
+def _record(row):
+    """The archived form of a values() row; keys match AuditLogSerializer."""
+    if row['actor_id']:
+        actor_name = display_name(row, 'actor')
+    else:
+        actor_name = row['actor_email'] or 'System'
+    return {
+        'id': row['id'],
+        'timestamp': row['timestamp'],
+        'entity': row['entity'],
+        'entity_id': row['entity_id'],
+        'action': row['action'],
+        'activity': row['activity'],
+        'actor': row['actor_id'],
+        'actor_email': row['actor_email'],
+        'actor_name': actor_name,
+        'actor_role': row['actor_role'],
+        'ip_address': row['ip_address'],
+        'changes': row['changes'],
+    }
+
+
+def _write_segment(rows):
+    """Write ``rows`` (ascending pk) to a new segment file; returns the unsaved index row."""
+    from .models import AuditArchiveSegment
+
+    compression = 'zst' if zstandard else 'gz'
+    first, last = rows[0], rows[-1]
+    relative = Path(ARCHIVE_DIR, f"{first['timestamp']:%Y/%m}",
+                    f"audit-{first['id']:012d}-{last['id']:012d}.jsonl.{compression}")
+    path = Path(settings.MEDIA_ROOT) / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + '.tmp')
+
+    with _open(tmp, 'wb', compression) as fh:
+        for row in rows:
+            line = json.dumps(_record(row), default=_json_default, separators=(',', ':'))
+            fh.write(line.encode('utf-8') + b'\n')
+    os.replace(tmp, path)
+
+    return AuditArchiveSegment(
+        path=relative.as_posix(),
+        compression=compression,
+        first_pk=first['id'],
+        last_pk=last['id'],
+        first_timestamp=min(row['timestamp'] for row in rows),
+        last_timestamp=max(row['timestamp'] for row in rows),
+        row_count=len(rows),
+        size_bytes=path.stat().st_size,
+        entities=sorted({row['entity'] for row in rows}),
+        actions=sorted({row['action'] for row in rows}),
+        actor_ids=sorted({row['actor_id'] for row in rows}, key=lambda pk: (pk is not None, pk or 0)),
+        actor_roles=sorted({row['actor_role'] or '' for row in rows}),
+    )
+
+
+def archive_audit_logs(days=None, *, segment_size=DEFAULT_SEGMENT_SIZE, dry_run=False,
+                       max_segments=None, now=None):
+    """Move audit logs older than ``days`` (default: the policy's archive days) into segments.
+
+    Returns a metrics dict. ``dry_run`` only counts the rows that would move;
+    ``max_segments`` stops early, and the next run carries on.
+    """
+    from .models import AuditLog, AuditSummaryBucket, RetentionPolicy
+
+    if days is None:
+        days = RetentionPolicy.get_policy().audit_log_archive_days
+    result = {'archived': 0, 'segments': 0, 'bytes': 0, 'elapsed': 0.0, 'rows_per_second': 0.0}
+    if not days:
+        return {**result, 'skipped': 'archiving disabled'}
+
+    cutoff = (now or timezone.now()) - timezone.timedelta(days=days)
+    aged = AuditLog.objects.filter(timestamp__lt=cutoff)
+    if dry_run:
+        return {**result, 'cutoff': cutoff, 'would_archive': aged.count()}
+
+    started = time.perf_counter()
+    archived = segments = size = 0
+    while max_segments is None or segments < max_segments:
+        rows = list(aged.order_by('pk').values(*_FIELDS)[:segment_size])
+        if not rows:
+            break
+        segment = _write_segment(rows)
+        try:
+            with transaction.atomic():
+                segment.save()
+                moved = aged.filter(pk__gte=segment.first_pk, pk__lte=segment.last_pk)
+                AuditSummaryBucket.remove(moved)
+                moved.delete()
+        except Exception:
+            os.remove(Path(settings.MEDIA_ROOT) / segment.path)
+            raise
+        archived += segment.row_count
+        segments += 1
+        size += segment.size_bytes
+
+    elapsed = time.perf_counter() - started
+    logger.info(f'Archived {archived} audit logs into {segments} segments ({size} bytes, {elapsed:.2f}s)')
+    return {
+        **result,
+        'cutoff': cutoff,
+        'archived': archived,
+        'segments': segments,
+        'bytes': size,
+        'elapsed': elapsed,
+        'rows_per_second': archived / elapsed if elapsed else 0.0,
+    }
+
+
+def archived_until():
+    """Timestamp of the newest archived audit log, or None when nothing is archived."""
+    from .models import AuditArchiveSegment
+
+    return AuditArchiveSegment.objects.aggregate(last=Max('last_timestamp'))['last']
+
+
+def read_segment(segment):
+    """Yield a segment's records in file (ascending pk) order, timestamps parsed."""
+    with _open(Path(settings.MEDIA_ROOT) / segment.path, 'rb', segment.compression) as raw:
+        for line in io.TextIOWrapper(raw, encoding='utf-8'):
+            record = json.loads(line)
+            record['timestamp'] = parse_datetime(record['timestamp'])
+            yield record
+
+
+def _search_hits(*, start=None, end=None, entity=None, action=None, actor_roles=None, match=None, resume=None):
+    """Yield ``(segment, hits)`` for each segment with matches, newest first.
+
+    ``resume`` is a segment to start at, skipping the ones newer than it.
+    """
+    from .models import AuditArchiveSegment
+
+    segments = AuditArchiveSegment.objects.order_by('-last_timestamp', '-last_pk')
+    if start:
+        segments = segments.filter(last_timestamp__gte=start)
+    if end:
+        segments = segments.filter(first_timestamp__lt=end)
+    if resume is not None:
+        segments = segments.filter(
+            Q(last_timestamp__lt=resume.last_timestamp)
+            | Q(last_timestamp=resume.last_timestamp, last_pk__lte=resume.last_pk)
+        )
+
+    for segment in segments:
+        if entity and entity not in segment.entities:
+            continue
+        if action and action not in segment.actions:
+            continue
+        if actor_roles is not None and segment.actor_roles is not None and actor_roles.isdisjoint(segment.actor_roles):
+            continue
+        hits = [
+            record for record in read_segment(segment)
+            if (not start or record['timestamp'] >= start)
+            and (not end or record['timestamp'] < end)
+            and (not entity or record['entity'] == entity)
+            and (not action or record['action'] == action)
+            and (actor_roles is None or (record['actor_role'] or '') in actor_roles)
+            and (match is None or match(record))
+        ]
+        if hits:
+            hits.sort(key=lambda record: (record['timestamp'], record['id']), reverse=True)
+            yield segment, hits
+
+
+def search_archive(*, start=None, end=None, entity=None, action=None, actor_roles=None, match=None):
+    """Yield archived records in ``[start, end)``, newest first.
+
+    ``actor_roles`` restricts results to a set of ``actor_role`` snapshots
+    (``''`` admits system entries), like ``AuditLog.actor_role`` filters on
+    the hot table; ``match`` is an optional per-record predicate. Segments
+    whose index rules out the filters are not opened.
+    """
+    filters = dict(start=start, end=end, entity=entity, action=action, actor_roles=actor_roles, match=match)
+    for _, hits in _search_hits(**filters):
+        yield from hits
+
+
+def archive_page(limit, cursor=None, **filters):
+    """Up to ``limit`` records of ``search_archive(**filters)``; returns ``(records, next_cursor)``.
+
+    ``next_cursor`` is None once nothing is left; a page that exactly fills
+    may be followed by an empty one. A cursor names the segment to resume
+    in and how many of its matches were already returned; segments are
+    never rewritten, so it stays valid while newer ones are archived.
+    Raises ValueError for a malformed cursor or one whose segment has since
+    been purged. Only the segments the page reaches are opened.
+    """
+    from .models import AuditArchiveSegment
+
+    resume, skip = None, 0
+    if cursor:
+        try:
+            last_pk, skip = (int(part) for part in cursor.split(':'))
+        except ValueError:
+            raise ValueError(f'Invalid archive cursor {cursor!r}.')
+        resume = AuditArchiveSegment.objects.filter(last_pk=last_pk).first()
+        if resume is None or skip < 0:
+            raise ValueError(f'Invalid archive cursor {cursor!r}.')
+
+    records = []
+    for segment, hits in _search_hits(resume=resume, **filters):
+        offset = skip if resume is not None and segment.pk == resume.pk else 0
+        hits = hits[offset:]
+        room = limit - len(records)
+        if len(hits) >= room:
+            records.extend(hits[:room])
+            return records, f'{segment.last_pk}:{offset + room}'
+        records.extend(hits)
+    return records, None
@@ -0,0 +1,140 @@
+"""Full-text search over audit logs.
+
+``search_audit_logs`` matches every word of the query as a prefix against
+the log's activity, actor email and entity, through an index instead of
+``icontains`` scans:
+
+- PostgreSQL: a GIN index on a ``tsvector`` expression (``simple`` config).
+- SQLite: an external-content FTS5 table kept in sync by triggers.
+
+Punctuation separates words on both, so ``maptech`` finds
+``admin@maptechisi.com``. Other databases, or an SQLite build without FTS5,
+fall back to the ``icontains`` filter. ``record_matcher`` applies the same
+rules to archived records. ``install()`` creates the index and
+``rebuild()`` repopulates it; the ``rebuild_audit_search`` command runs
+both.
+"""
+import re
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+TABLE = 'tickets_auditlog'
+FTS_TABLE = 'tickets_auditlog_fts'
+PG_INDEX = 'tickets_auditlog_search_gin'
+SEARCH_FIELDS = ('activity', 'actor_email', 'entity')
+
+# Must match the indexed expression exactly for PostgreSQL to use the index.
+PG_VECTOR = (
+    "to_tsvector('simple', regexp_replace("
+    "coalesce(activity, '') || ' ' || coalesce(actor_email, '') || ' ' || coalesce(entity, ''), "
+    "'[^[:alnum:]]+', ' ', 'g'))"
+)
+
+_WORD = re.compile(r'[^\W_]+')
+
+# alias -> whether the FTS5 table exists; filled on first search.
+_fts_available = {}
+
+
+def _terms(text):
+    return _WORD.findall(text.lower())
+
+
+def _sqlite_has_fts(connection):
+    alias = connection.alias
+    if alias not in _fts_available:
+        _fts_available[alias] = FTS_TABLE in connection.introspection.table_names()
+    return _fts_available[alias]
+
+
+def search_audit_logs(queryset, text):
+    """Filter an AuditLog ``queryset`` to rows matching every word of ``text``."""
+    terms = _terms(text)
+    connection = connections[queryset.db]
+    if terms and connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        return queryset.filter(pk__in=RawSQL(
+            f"SELECT id FROM {TABLE} WHERE {PG_VECTOR} @@ to_tsquery('simple', %s)", (tsquery,),
+        ))
+    if terms and connection.vendor == 'sqlite' and _sqlite_has_fts(connection):
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match,),
+        ))
+    condition = Q()
+    for field in SEARCH_FIELDS:
+        condition |= Q(**{f'{field}__icontains': text})
+    return queryset.filter(condition)
+
+
+def record_matcher(text):
+    """A predicate giving ``search_audit_logs``' matches for records outside the table.
+
+    Archived logs are searched with it, so a query finds the same entries
+    on both sides of the archive cutoff: every word of ``text`` must be a
+    prefix of a word in the record's activity, actor email or entity.
+    """
+    terms = _terms(text)
+    if not terms:
+        # Like the icontains fallback above.
+        needle = text.lower()
+        return lambda record: any(needle in (record.get(field) or '').lower() for field in SEARCH_FIELDS)
+
+    def matches(record):
+        words = _terms(' '.join(record.get(field) or '' for field in SEARCH_FIELDS))
+        return all(any(word.startswith(term) for word in words) for term in terms)
+    return matches
+
+
+def _sqlite_statements():
+    columns = ', '.join(SEARCH_FIELDS)
+    new_values = ', '.join(f'new.{field}' for field in SEARCH_FIELDS)
+    old_values = ', '.join(f'old.{field}' for field in SEARCH_FIELDS)
+    insert = f'INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values});'
+    delete = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        f"{columns}, content='{TABLE}', content_rowid='id', tokenize='unicode61')",
+        f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {TABLE} BEGIN {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {TABLE} BEGIN {delete} END',
+        f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {columns} ON {TABLE} '
+        f'BEGIN {delete} {insert} END',
+    ]
+
+
+def install(connection):
+    """Create the search index (and SQLite triggers) if missing; returns whether one exists."""
+    _fts_available.pop(connection.alias, None)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {PG_INDEX} ON {TABLE} USING gin ({PG_VECTOR})')
+            return True
+        if connection.vendor == 'sqlite':
+            try:
+                for statement in _sqlite_statements():
+                    cursor.execute(statement)
+            except Exception:
+                # SQLite built without FTS5: search keeps using icontains.
+                return False
+            return True
+    return False
+
+
+def uninstall(connection):
+    _fts_available.pop(connection.alias, None)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(f'DROP INDEX IF EXISTS {PG_INDEX}')
+        elif connection.vendor == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def rebuild(connection):
+    """Repopulate the SQLite FTS table from the audit table (PostgreSQL indexes need no rebuild)."""
+    if connection.vendor == 'sqlite' and _sqlite_has_fts(connection):
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
@@ -0,0 +1,271 @@
+"""Buffered AuditLog writes.
+
+``AuditLog.log`` hands its entry to the current ``audit_batch()`` scope when
+there is one. ``AuditBatchMiddleware`` opens a scope per request; management
+commands and other units of work can open their own. A scope writes what it
+collected with one ``bulk_create`` when it closes, so an endpoint that logs
+several lines pays for one INSERT. Outside a scope ``AuditLog.log`` still
+inserts immediately.
+
+Entries logged inside an atomic block follow that block: they are dropped
+if it rolls back, and if it is still open when the scope closes they are
+written inside it, exactly as a direct insert would have been.
+
+Committed batches go to the backend named by ``AUDIT_LOG_WRITER``:
+``SyncAuditWriter`` inserts on the closing thread, ``BackgroundAuditWriter``
+on a worker thread. Every insert also bumps the AuditSummaryBucket counters
+in the same transaction. A failed bulk insert falls back to row-by-row inserts,
+and entries that still cannot be saved are logged in full rather than
+silently lost.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import queue
+import threading
+import weakref
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_scope = contextvars.ContextVar('audit_batch', default=None)
+
+
+class _Pending:
+    """An entry logged inside an atomic block, waiting on that block's outcome.
+
+    It is registered as an on_commit hook, and Django's hook list holds the
+    only strong reference; the batch keeps a weak one. When the block
+    commits, the hook puts the entry back in its batch's slot. When it rolls
+    back, Django discards the hook and the weak reference dies with it. A
+    live, uncalled hook at flush time means the block is still open.
+    """
+
+    __slots__ = ('entry', 'batch', 'index', '__weakref__')
+
+    def __init__(self, entry, batch, index):
+        self.entry = entry
+        self.batch = batch
+        self.index = index
+
+    def __call__(self):
+        if self.batch is not None:
+            self.batch.entries[self.index] = self.entry
+
+
+def _save_one(entry):
+    from .models import AuditSummaryBucket
+
+    with transaction.atomic():
+        entry.save()
+        AuditSummaryBucket.add([entry])
+
+
+def _save_each(entries):
+    for entry in entries:
+        try:
+            _save_one(entry)
+        except Exception as e:
+            fields = {f.attname: getattr(entry, f.attname) for f in entry._meta.concrete_fields if not f.primary_key}
+            logger.error(f'Failed to save audit log ({e}): {json.dumps(fields, default=str)}')
+
+
+def write_entries(entries):
+    """Insert ``entries`` with one bulk_create, falling back to one insert each."""
+    from .models import AuditLog, AuditSummaryBucket
+
+    if not entries:
+        return
+    try:
+        with transaction.atomic():
+            AuditLog.objects.bulk_create(entries)
+            AuditSummaryBucket.add(entries)
+    except Exception as e:
+        logger.warning(f'Bulk audit log insert of {len(entries)} entries failed ({e}); inserting one by one')
+        for entry in entries:
+            entry.pk = None
+        _save_each(entries)
+
+
+class AuditBatch:
+    """Entries collected by one ``audit_batch()`` scope."""
+
+    def __init__(self, using=DEFAULT_DB_ALIAS):
+        self.using = using
+        self.entries = []
+
+    def add(self, entry):
+        connection = transaction.get_connection(self.using)
+        if connection.in_atomic_block:
+            pending = _Pending(entry, self, len(self.entries))
+            transaction.on_commit(pending, using=self.using)
+            self.entries.append(weakref.ref(pending))
+        else:
+            self.entries.append(entry)
+
+    def flush(self):
+        entries, self.entries = self.entries, []
+        committed, in_transaction = [], []
+        for item in entries:
+            if not isinstance(item, weakref.ref):
+                committed.append(item)
+                continue
+            pending = item()
+            if pending is None:
+                continue  # the block it was logged in rolled back
+            # Still open: written inside the block, so it shares its fate.
+            pending.batch = None
+            in_transaction.append(pending.entry)
+        if in_transaction:
+            write_entries(in_transaction)
+        if committed:
+            get_audit_writer().write(committed)
+
+
+@contextmanager
+def audit_batch(using=DEFAULT_DB_ALIAS):
+    """Buffer ``AuditLog.log`` entries until the block exits. Nested scopes join the outer one."""
+    if _scope.get() is not None:
+        yield _scope.get()
+        return
+    batch = AuditBatch(using)
+    token = _scope.set(batch)
+    try:
+        yield batch
+    finally:
+        _scope.reset(token)
+        batch.flush()
+
+
+def record(entry):
+    """Save ``entry`` now, or buffer it in the current scope (it then has no pk until flushed)."""
+    batch = _scope.get()
+    if batch is None:
+        _save_one(entry)
+    else:
+        batch.add(entry)
+    return entry
+
+
+class AuditBatchMiddleware:
+    """Collect a request's audit log entries and write them in one batch."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with audit_batch():
+            return self.get_response(request)
+
+
+class SyncAuditWriter:
+    """Insert each batch on the thread that closes the scope."""
+
+    def write(self, entries):
+        write_entries(entries)
+
+    def flush(self, timeout=None):
+        """Block until everything written so far is saved."""
+        return True
+
+
+class BackgroundAuditWriter(SyncAuditWriter):
+    """Hand batches to a bounded queue drained by one worker thread.
+
+    The worker merges queued batches into larger inserts. When the queue is
+    full the batch is written on the calling thread instead of being dropped,
+    and whatever is still queued at interpreter exit is written then.
+    """
+
+    def __init__(self, maxsize=None, batch_size=500):
+        if maxsize is None:
+            maxsize = getattr(settings, 'AUDIT_LOG_QUEUE_SIZE', 1000)
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._worker = None
+        self._lock = threading.Lock()
+        atexit.register(self._drain)
+
+    def write(self, entries):
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(entries)
+        except queue.Full:
+            logger.warning(f'Audit log queue full; writing {len(entries)} entries inline')
+            write_entries(entries)
+
+    def flush(self, timeout=None):
+        self._ensure_worker()
+        done = threading.Event()
+        self._queue.put(done, timeout=timeout)
+        return done.wait(timeout)
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+                self._worker.start()
+
+    def _take(self, block=True):
+        items = [self._queue.get(block=block)]
+        size = len(items[0]) if isinstance(items[0], list) else 0
+        while size < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            items.append(item)
+            size += len(item) if isinstance(item, list) else 0
+        return items
+
+    def _process(self, items):
+        try:
+            write_entries([entry for item in items if isinstance(item, list) for entry in item])
+        finally:
+            for item in items:
+                if isinstance(item, threading.Event):
+                    item.set()
+                self._queue.task_done()
+
+    def _run(self):
+        while True:
+            self._process(self._take())
+
+    def _drain(self):
+        while True:
+            try:
+                items = self._take(block=False)
+            except queue.Empty:
+                return
+            self._process(items)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_writer():
+    """Return the process-wide writer configured by AUDIT_LOG_WRITER."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                path = getattr(settings, 'AUDIT_LOG_WRITER', 'tickets.audit_writer.SyncAuditWriter')
+                _writer = import_string(path)()
+    return _writer
+
+
+@receiver(setting_changed)
+def _reset_writer(setting, **kwargs):
+    global _writer
+    if setting in ('AUDIT_LOG_WRITER', 'AUDIT_LOG_QUEUE_SIZE'):
+        _writer = None
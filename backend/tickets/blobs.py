@@ -0,0 +1,431 @@
+"""Content-addressed, deduplicated attachment storage.
+
+Resolution proofs are often the same screenshot or PDF attached to several
+tickets. Each distinct content is stored once, as
+``ticket_attachments/blobs/<sha256[:2]>/<sha256><ext>`` in the default
+storage, and tracked by an ``AttachmentBlob`` row that counts the
+``TicketAttachment`` rows pointing at it. The name the user uploaded is
+kept on ``TicketAttachment.original_name``.
+
+The SHA-256 is computed while the request body streams in:
+``FILE_UPLOAD_HANDLERS`` uses the hashing handlers below, which set
+``sha256`` on each uploaded file. Files from elsewhere are hashed on the
+way into ``store_attachments``. Before anything is written, every upload
+path (``store_attachments``, ``stage``) checks that each file's bytes are
+the type it claims and raises ``filetypes.AttachmentTypeError`` otherwise.
+
+Storing happens in two steps, so no transaction is held open while bytes
+are copied. That matters most on SQLite, where an open write transaction
+locks the whole database. First, with no transaction, each file that is
+not stored yet is written to a scratch name under ``SCRATCH_DIR``; a
+multi-file upload writes them concurrently on a bounded thread pool
+(``ATTACHMENT_WRITE_WORKERS``). Then one short transaction locks the blob
+rows in digest order, renames the scratch files into their content
+addresses, bumps the counts and inserts the ``TicketAttachment`` rows with
+one ``bulk_create``. It is all or nothing: if any write or the insert
+fails, the files written for it are removed and the transaction rolls
+back.
+
+Deleting an attachment by any route (``delete_attachment``, a ticket
+cascade, the admin) calls ``release_blob``. When the last reference goes,
+the row is deleted, and the file is deleted once that commits, under the
+row lock and only if no upload has re-created the blob in the meantime.
+
+Attachments saved before blobs existed have no ``blob``. The
+``dedupe_attachments`` command moves them into the store.
+"""
+import hashlib
+import logging
+import os
+import posixpath
+import re
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.text import get_valid_filename
+
+from .filetypes import check_attachment_type
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = 'ticket_attachments/blobs'
+SCRATCH_DIR = 'ticket_attachments/staging'
+DEFAULT_WRITE_WORKERS = 4
+_EXTENSION = re.compile(r'^\.[a-z0-9]{1,10}$')
+
+
+class HashingMemoryFileUploadHandler(MemoryFileUploadHandler):
+    """``MemoryFileUploadHandler`` that also sets ``sha256`` on the file it builds."""
+
+    def new_file(self, *args, **kwargs):
+        # Set first: the parent raises StopFutureHandlers once it takes the file.
+        self._sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.activated:
+            self._sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        if uploaded is not None:
+            uploaded.sha256 = self._sha256.hexdigest()
+        return uploaded
+
+
+class HashingTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """``TemporaryFileUploadHandler`` that also sets ``sha256`` on the file it builds."""
+
+    def new_file(self, *args, **kwargs):
+        self._sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self._sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.sha256 = self._sha256.hexdigest()
+        return uploaded
+
+
+def content_digest(content):
+    """SHA-256 of ``content``: the upload handler's, or computed in one pass over the file."""
+    digest = getattr(content, 'sha256', None)
+    if digest:
+        return digest
+    sha256 = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        sha256.update(chunk)
+    content.seek(0)
+    return sha256.hexdigest()
+
+
+def blob_name(digest, filename):
+    """Storage name for content ``digest``; keeps a plain extension so the type can still be guessed."""
+    ext = posixpath.splitext(filename or '')[1].lower()
+    if not _EXTENSION.match(ext):
+        ext = ''
+    return f'{BLOB_DIR}/{digest[:2]}/{digest}{ext}'
+
+
+def clean_filename(filename):
+    """The uploaded file name, safe to store and send back in Content-Disposition."""
+    name = os.path.basename(filename or '')
+    return get_valid_filename(name)[:255] if name else ''
+
+
+def _locked_blob(digest, name, size):
+    """The AttachmentBlob for ``digest``, created if missing and locked for this transaction."""
+    from .models import AttachmentBlob
+
+    try:
+        with transaction.atomic():
+            AttachmentBlob.objects.get_or_create(sha256=digest, defaults={'name': name, 'size': size})
+    except IntegrityError:
+        # Another request created it first.
+        pass
+    return AttachmentBlob.objects.select_for_update().get(sha256=digest)
+
+
+def _write_blob(name, content):
+    """Write ``content`` to exactly ``name``."""
+    storage = default_storage
+    content.seek(0)
+    try:
+        saved = storage.save(name, content)
+    except Exception:
+        # Never leave a partial file under a content address.
+        storage.delete(name)
+        raise
+    if saved != name:
+        storage.delete(saved)
+        raise RuntimeError(f'Storage renamed blob {name} to {saved}')
+
+
+def _move(source, target):
+    """Move a stored file to ``target``: a rename on local storage, a copy elsewhere."""
+    storage = default_storage
+    try:
+        source_path, target_path = storage.path(source), storage.path(target)
+    except NotImplementedError:
+        with storage.open(source, 'rb') as fh:
+            _write_blob(target, File(fh, name=target))
+        storage.delete(source)
+        return
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    os.replace(source_path, target_path)
+
+
+def _remove_if_unreferenced(digest, name, drop=None):
+    """Delete blob file ``name`` unless an AttachmentBlob row still references it.
+
+    Runs under the row lock (taking it by inserting a placeholder when the row
+    is gone), so an upload of the same content that is about to commit is
+    waited for rather than left pointing at a deleted file.
+    """
+    with transaction.atomic():
+        blob = _locked_blob(digest, name, 0)
+        if blob.ref_count:
+            return False
+        blob.delete()
+        (drop or default_storage.delete)(name)
+    return True
+
+
+class StagedBlob:
+    """Content written into storage ahead of the transaction that attaches it.
+
+    ``write`` runs with no transaction open. It copies (or, for temporary
+    upload files on local storage, moves) the bytes to a scratch name,
+    unless the content-addressed name already exists. Under the blob's row
+    lock, ``promote`` only has to rename the scratch file into place.
+    """
+
+    def __init__(self, content, filename, digest):
+        self.content = content
+        self.filename = filename
+        self.digest = digest
+        self.size = content.size
+        self.name = blob_name(digest, filename)
+        self.scratch = None
+        self.promoted = None
+
+    def write(self):
+        if default_storage.exists(self.name):
+            # Checked again under the lock.
+            return
+        self.content.seek(0)
+        self.scratch = default_storage.save(f'{SCRATCH_DIR}/{uuid.uuid4().hex}', self.content)
+
+    def promote(self, blob):
+        """Make ``blob.name`` hold the content; call with the blob row locked. Returns whether it was missing."""
+        if default_storage.exists(blob.name):
+            return False
+        if self.scratch:
+            _move(self.scratch, blob.name)
+            self.scratch = None
+        else:
+            # Removed after the unlocked check in write(); copy it under the lock.
+            _write_blob(blob.name, File(self.content, name=blob.name))
+        self.promoted = blob.name
+        return True
+
+    def finish(self):
+        """Delete the scratch copy if the blob turned out to be stored already."""
+        if self.scratch:
+            default_storage.delete(self.scratch)
+            self.scratch = None
+
+    def discard(self):
+        """Undo ``write`` and ``promote`` after the attaching transaction failed."""
+        if self.scratch:
+            scratch, self.scratch = self.scratch, None
+            self._drop(scratch)
+        if self.promoted:
+            promoted, self.promoted = self.promoted, None
+            _remove_if_unreferenced(self.digest, promoted, drop=self._drop)
+
+    def _drop(self, name):
+        # A temporary upload moved into storage goes back, so a chunked
+        # upload can be finalized again.
+        source = getattr(self.content, 'temporary_file_path', None)
+        source = source() if source else None
+        if source and not os.path.exists(source):
+            try:
+                file_move_safe(default_storage.path(name), source)
+                return
+            except (NotImplementedError, OSError) as e:
+                logger.warning(f'Could not restore {source} from {name}: {e}')
+        default_storage.delete(name)
+
+
+def stage(content, *, filename=None, digest=None):
+    """Write ``content`` into storage outside any transaction; returns the StagedBlob to attach.
+
+    Raises AttachmentTypeError when the bytes are not the type ``content`` claims.
+    """
+    check_attachment_type(content, filename)
+    staged = StagedBlob(content, filename or content.name, digest or content_digest(content))
+    staged.write()
+    return staged
+
+
+def _write_staged(staged):
+    """``write`` every StagedBlob, concurrently; on any failure all of them are discarded.
+
+    The pool only touches storage, never the database.
+    """
+    workers = min(len(staged), getattr(settings, 'ATTACHMENT_WRITE_WORKERS', DEFAULT_WRITE_WORKERS))
+    error = None
+    if workers <= 1:
+        for item in staged:
+            try:
+                item.write()
+            except Exception as e:
+                error = e
+                break
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='attachment-writes') as pool:
+            futures = [pool.submit(item.write) for item in staged]
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                error = error or e
+    if error is not None:
+        for item in staged:
+            item.discard()
+        raise error
+
+
+def _attach(ticket, entries, *, uploaded_by, is_resolution_proof):
+    """Create attachments for ``(StagedBlob, filename)`` entries in one transaction, all or none."""
+    from .models import AttachmentBlob, TicketAttachment
+    from .previews import request_previews
+
+    distinct = {staged.digest: staged for staged, _ in entries}
+    counts = Counter(staged.digest for staged, _ in entries)
+    try:
+        with transaction.atomic():
+            # Locked in digest order, so concurrent batches cannot deadlock.
+            blobs = {
+                digest: _locked_blob(digest, distinct[digest].name, distinct[digest].size)
+                for digest in sorted(distinct)
+            }
+            for digest, staged in distinct.items():
+                staged.promote(blobs[digest])
+            for digest, count in counts.items():
+                AttachmentBlob.objects.filter(pk=blobs[digest].pk).update(ref_count=F('ref_count') + count)
+            attachments = []
+            for staged, filename in entries:
+                blob = blobs[staged.digest]
+                attachment = TicketAttachment(
+                    ticket=ticket,
+                    uploaded_by=uploaded_by,
+                    is_resolution_proof=is_resolution_proof,
+                    original_name=clean_filename(filename),
+                    blob=blob,
+                    content_sha256=staged.digest,
+                )
+                attachment.file.name = blob.name
+                attachments.append(attachment)
+            TicketAttachment.objects.bulk_create(attachments)
+            # bulk_create sends no post_save, so queue the thumbnails here.
+            for attachment in attachments:
+                request_previews(attachment)
+    except Exception:
+        for staged in distinct.values():
+            staged.discard()
+        raise
+    for staged in distinct.values():
+        staged.finish()
+    return attachments
+
+
+def store_attachments(ticket, files, *, uploaded_by, is_resolution_proof=False):
+    """Create a TicketAttachment for each uploaded file in one transaction; returns them in order.
+
+    Raises AttachmentTypeError, before writing any file, when one is not the type it claims.
+    """
+    for f in files:
+        check_attachment_type(f)
+    staged, entries = {}, []
+    for f in files:
+        digest = content_digest(f)
+        entries.append((staged.setdefault(digest, StagedBlob(f, f.name, digest)), f.name))
+    _write_staged(list(staged.values()))
+    return _attach(ticket, entries, uploaded_by=uploaded_by, is_resolution_proof=is_resolution_proof)
+
+
+def store_staged(ticket, staged, *, uploaded_by, is_resolution_proof=False, filename=None):
+    """Create a TicketAttachment for content already written with ``stage``."""
+    entries = [(staged, filename or staged.filename)]
+    return _attach(ticket, entries, uploaded_by=uploaded_by, is_resolution_proof=is_resolution_proof)[0]
+
+
+def store_attachment(ticket, content, *, uploaded_by, is_resolution_proof=False, filename=None, digest=None):
+    """Create a TicketAttachment for ``content``, storing its bytes only if no blob holds them yet."""
+    staged = stage(content, filename=filename, digest=digest)
+    return store_staged(ticket, staged, uploaded_by=uploaded_by, is_resolution_proof=is_resolution_proof)
+
+
+def release_blob(blob_id):
+    """Drop one reference to a blob; deletes the row, and its file once that commits, when none are left."""
+    from .models import AttachmentBlob
+
+    with transaction.atomic():
+        blob = AttachmentBlob.objects.select_for_update().filter(pk=blob_id).first()
+        if blob is None:
+            return
+        if blob.ref_count > 1:
+            AttachmentBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+            return
+        blob.delete()
+        # A rollback (of a ticket cascade, say) brings the row back, so the
+        # file stays until the delete commits, and only if no upload has
+        # re-created the blob by then.
+        transaction.on_commit(partial(_remove_if_unreferenced, blob.sha256, blob.name))
+
+
+def dedupe_attachment(attachment):
+    """Move a pre-blob attachment's file into the blob store; returns bytes freed (0 if it was unique)."""
+    from .models import AttachmentBlob, TicketAttachment
+
+    storage = default_storage
+    old_name = attachment.file.name
+    with storage.open(old_name, 'rb') as fh:
+        # Already-accepted files are moved as they are, not re-checked.
+        content = File(fh, name=old_name)
+        staged = StagedBlob(content, old_name, content_digest(content))
+        staged.write()
+        try:
+            with transaction.atomic():
+                blob = _locked_blob(staged.digest, staged.name, staged.size)
+                created = staged.promote(blob)
+                AttachmentBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+                previews = attachment.previews or {}
+                if previews.get('source') == old_name:
+                    previews = {**previews, 'source': blob.name}
+                TicketAttachment.objects.filter(pk=attachment.pk).update(
+                    file=blob.name,
+                    blob=blob,
+                    content_sha256=staged.digest,
+                    original_name=attachment.original_name or clean_filename(old_name),
+                    previews=previews,
+                )
+        except Exception:
+            staged.discard()
+            raise
+        staged.finish()
+    storage.delete(old_name)
+    return 0 if created else staged.size
+
+
+def dedupe_attachments(limit=None):
+    """Move every attachment without a blob into the store; returns ``(attachments, bytes freed)``."""
+    from .models import TicketAttachment
+
+    pending = TicketAttachment.objects.filter(blob__isnull=True).exclude(file='').order_by('pk')
+    if limit:
+        pending = pending[:limit]
+    moved = freed = 0
+    for attachment in pending.iterator():
+        if not default_storage.exists(attachment.file.name):
+            logger.warning(f'Attachment {attachment.pk} points at missing file {attachment.file.name}')
+            continue
+        freed += dedupe_attachment(attachment)
+        moved += 1
+    return moved, freed
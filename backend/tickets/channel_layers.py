@@ -0,0 +1,172 @@
+"""Local multi-process channel layer.
+
+``SQLiteChannelLayer`` stores channel messages and group membership in a
+shared SQLite file, so several Daphne workers on one host can fan out to
+each other's sockets without running Redis. Receivers poll, so use it for
+development, single-host deployments and tests; use Redis in production.
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+from django.core.exceptions import ImproperlyConfigured
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS channel_message (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    expires REAL NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS channel_message_channel ON channel_message (channel, id);
+CREATE TABLE IF NOT EXISTS channel_group (
+    group_name TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    joined REAL NOT NULL,
+    PRIMARY KEY (group_name, channel)
+);
+"""
+
+
+class SQLiteChannelLayer(BaseChannelLayer):
+    """Channel layer backed by a SQLite file shared between processes."""
+
+    extensions = ['groups', 'flush']
+
+    def __init__(self, path, expiry=60, group_expiry=86400, capacity=100, channel_capacity=None,
+                 poll_interval=0.05, **kwargs):
+        if kwargs:
+            raise ImproperlyConfigured(
+                f'Unknown SQLiteChannelLayer CONFIG option(s): {", ".join(sorted(kwargs))}.'
+            )
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity)
+        self.channel_capacity = self.compile_capacities(self.channel_capacity)
+        self.path = str(path)
+        self.group_expiry = group_expiry
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        conn = self._connect()
+        try:
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        # Lets group_send apply per-channel channel_capacity in SQL.
+        conn.create_function('channel_capacity', 1, self.get_capacity, deterministic=True)
+        return conn
+
+    @property
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    async def _run(self, func, *args):
+        return await asyncio.to_thread(func, *args)
+
+    # Channel layer API
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        self.require_valid_channel_name(channel)
+        assert '__asgi_channel__' not in message
+        await self._run(self._send, channel, json.dumps(message))
+
+    def _send(self, channel, body):
+        conn = self._conn
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            now = time.time()
+            conn.execute('DELETE FROM channel_message WHERE expires < ?', (now,))
+            queued = conn.execute(
+                'SELECT COUNT(*) FROM channel_message WHERE channel = ?', (channel,),
+            ).fetchone()[0]
+            if queued >= self.get_capacity(channel):
+                raise ChannelFull(channel)
+            conn.execute(
+                'INSERT INTO channel_message (channel, expires, body) VALUES (?, ?, ?)',
+                (channel, now + self.expiry, body),
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+        delay = 0.005
+        while True:
+            body = await self._run(self._pop, channel)
+            if body is not None:
+                return json.loads(body)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.poll_interval)
+
+    def _pop(self, channel):
+        row = self._conn.execute(
+            'DELETE FROM channel_message WHERE id = ('
+            ' SELECT id FROM channel_message WHERE channel = ? AND expires >= ? ORDER BY id LIMIT 1'
+            ') RETURNING body',
+            (channel, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    async def new_channel(self, prefix='specific.'):
+        return f'{prefix}{uuid.uuid4().hex}'
+
+    # Groups extension
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        await self._run(
+            self._execute,
+            'INSERT OR REPLACE INTO channel_group (group_name, channel, joined) VALUES (?, ?, ?)',
+            (group, channel, time.time()),
+        )
+
+    async def group_discard(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        await self._run(
+            self._execute,
+            'DELETE FROM channel_group WHERE group_name = ? AND channel = ?',
+            (group, channel),
+        )
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), 'Message is not a dict'
+        self.require_valid_group_name(group)
+        now = time.time()
+        # One statement fans the message out to every member, in any process.
+        # Like the other layers, members whose queue is full are skipped.
+        await self._run(self._execute, 'DELETE FROM channel_message WHERE expires < ?', (now,))
+        await self._run(
+            self._execute,
+            'INSERT INTO channel_message (channel, expires, body) '
+            'SELECT g.channel, ?, ? FROM channel_group g WHERE g.group_name = ? AND g.joined >= ? '
+            'AND (SELECT COUNT(*) FROM channel_message m WHERE m.channel = g.channel) < channel_capacity(g.channel)',
+            (now + self.expiry, json.dumps(message), group, now - self.group_expiry),
+        )
+
+    def _execute(self, sql, params=()):
+        self._conn.execute(sql, params)
+
+    # Flush extension
+
+    async def flush(self):
+        await self._run(self._execute, 'DELETE FROM channel_message')
+        await self._run(self._execute, 'DELETE FROM channel_group')
+
+    async def close(self):
+        pass
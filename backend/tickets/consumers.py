@@ -1,9 +1,23 @@
+import asyncio
 import json
+from urllib.parse import parse_qs
+
 from channels.generic.websocket import AsyncJsonWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 
+from .dispatch import get_dispatcher
+
+
+def _positive_int(value):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
 
 class NotificationConsumer(AsyncJsonWebsocketConsumer):
     """WebSocket consumer for real-time notifications.
@@ -20,6 +34,9 @@ class NotificationConsumer(AsyncJsonWebsocketConsumer):
             await self.close()
             return
 
+        # Let the notification dispatcher deliver on this server's event loop.
+        get_dispatcher().bind_loop(asyncio.get_running_loop())
+
         self.group_name = f'notifications_{self.user.id}'
         await self.channel_layer.group_add(self.group_name, self.channel_name)
         await self.accept()
@@ -85,8 +102,21 @@ class TicketChatConsumer(AsyncJsonWebsocketConsumer):
     Permissions:
       - admin_employee: only admins and the currently assigned employee
       - Old employees (not currently assigned) are rejected.
+
+    History is paged: connect sends the latest HISTORY_PAGE_SIZE messages
+    (or, with ?since_id=<id>, only the newer ones when they fit in a page;
+    ``has_more`` says whether the frame left anything out), and the
+    ``load_history {before_id, limit}`` action returns older pages.
     """
 
+    HISTORY_PAGE_SIZE = 50
+    MAX_HISTORY_PAGE_SIZE = 200
+    # mark_read frames arriving within this window are written and broadcast together
+    READ_RECEIPT_WINDOW = 0.25
+    MAX_READ_RECEIPT_BATCH = 500
+    # Messages remembered per connection so replies need no lookup
+    REPLY_CACHE_SIZE = 500
+
     async def connect(self):
         self.user = self.scope.get('user', AnonymousUser())
         if self.user.is_anonymous:
@@ -96,6 +126,9 @@ class TicketChatConsumer(AsyncJsonWebsocketConsumer):
         self.ticket_id = int(self.scope['url_route']['kwargs']['ticket_id'])
         self.channel_type = self.scope['url_route']['kwargs']['channel_type']
         self.room_group_name = f'chat_{self.ticket_id}_{self.channel_type}'
+        # Ticket/session/access context, cached until a session change
+        self._context = None
+        self._reply_cache = {}
 
         # Validate access
         allowed = await self._check_access()
@@ -103,15 +136,20 @@ class TicketChatConsumer(AsyncJsonWebsocketConsumer):
             await self.close()
             return
 
+        self._pending_read_ids = set()
+        self._read_flush_task = None
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
         await self.accept()
 
-        # Send existing messages
-        messages = await self._get_messages()
-        await self.send_json({'type': 'message_history', 'messages': messages})
+        # Send the latest page, or only what a reconnecting client missed
+        since_id = _positive_int(parse_qs(self.scope.get('query_string', b'').decode()).get('since_id', [None])[0])
+        history = await self._get_messages(since_id=since_id)
+        self._remember_messages(history['messages'])
+        await self.send_json({'type': 'message_history', **history})
 
     async def disconnect(self, close_code):
         if hasattr(self, 'room_group_name'):
+            await self._flush_read_receipts()
             # Notify others that typing stopped
             await self.channel_layer.group_send(
                 self.room_group_name,
@@ -139,6 +177,14 @@ class TicketChatConsumer(AsyncJsonWebsocketConsumer):
                     {'type': 'chat_message', 'message': msg_data}
                 )
 
+        elif action == 'load_history':
+            before_id = _positive_int(content.get('before_id'))
+            if before_id:
+                limit = _positive_int(content.get('limit')) or self.HISTORY_PAGE_SIZE
+                page = await self._get_history_page(before_id, min(limit, self.MAX_HISTORY_PAGE_SIZE))
+                self._remember_messages(page['messages'])
+                await self.send_json({'type': 'history_page', 'before_id': before_id, **page})
+
         elif action == 'typing':
             await self.channel_layer.group_send(
                 self.room_group_name,
@@ -163,7 +209,29 @@ class TicketChatConsumer(AsyncJsonWebsocketConsumer):
                 )
 
         elif action == 'mark_read':
-            read_data = await self._mark_messages_read(content.get('message_ids', []))
+            self._queue_read_receipts(content.get('message_ids', []))
+
+    # ── Read receipts ──
+
+    def _queue_read_receipts(self, message_ids):
+        if not isinstance(message_ids, list):
+            return
+        self._pending_read_ids.update(mid for mid in map(_positive_int, message_ids) if mid)
+        task = self._read_flush_task
+        if self._pending_read_ids and (task is None or task.done()):
+            self._read_flush_task = asyncio.create_task(self._flush_read_receipts_later())
+
+    async def _flush_read_receipts_later(self):
+        await asyncio.sleep(self.READ_RECEIPT_WINDOW)
+        await self._flush_read_receipts()
+
+    async def _flush_read_receipts(self):
+        """Write queued receipts and broadcast them as one read_receipt event."""
+        pending = getattr(self, '_pending_read_ids', None)  # unset if connect was refused
+        while pending:
+            batch = sorted(pending)[:self.MAX_READ_RECEIPT_BATCH]
+            pending.difference_update(batch)
+            read_data = await self._mark_messages_read(batch)
             if read_data:
                 await self.channel_layer.group_send(
                     self.room_group_name,
@@ -173,6 +241,7 @@ class TicketChatConsumer(AsyncJsonWebsocketConsumer):
     # ── Group send handlers ──
 
     async def chat_message(self, event):
+        self._remember_messages([event['message']])
         await self.send_json({'type': 'new_message', 'message': event['message']})
 
     async def typing_indicator(self, event):
@@ -197,107 +266,147 @@ class TicketChatConsumer(AsyncJsonWebsocketConsumer):
 
     async def force_disconnect(self, event):
         """Force-close this WS connection (used when employee is reassigned)."""
+        # The assignment changed, so every socket in the room re-checks its context.
+        self._context = None
+        # The event reaches every socket in the room, on every worker; only the
+        # unassigned user's sockets close.
+        if event.get('user_id') not in (None, self.user.id):
+            return
         await self.send_json({'type': 'force_disconnect', 'reason': event.get('reason', 'You are no longer assigned to this ticket.')})
         await self.close()
 
+    async def session_changed(self, event):
+        """An assignment session started or ended; reload the cached context."""
+        self._context = None
+
     # ── DB helpers ──
 
-    @database_sync_to_async
-    def _check_access(self):
+    def _load_context(self):
+        """Fetch the ticket and decide access; cached on the connection."""
         from .models import Ticket
-        from users.models import User
-        try:
-            ticket = Ticket.objects.select_related('created_by', 'assigned_to').get(id=self.ticket_id)
-        except Ticket.DoesNotExist:
-            return False
+        ticket = Ticket.objects.select_related('assigned_to').filter(id=self.ticket_id).first()
 
         user = self.user
-        if self.channel_type == 'admin_employee':
+        allowed = False
+        if ticket is not None and self.channel_type == 'admin_employee':
             # Only admin/superadmin or the currently assigned employee
-            if user.is_admin_level:
-                return True
-            if ticket.assigned_to_id and user.id == ticket.assigned_to_id:
-                return True
-            return False
-        return False
+            allowed = user.is_admin_level or bool(ticket.assigned_to_id and user.id == ticket.assigned_to_id)
+        self._context = {'ticket': ticket, 'allowed': allowed}
+        return self._context
+
+    def _current_session(self):
+        """Active AssignmentSession for this room (None if access was revoked)."""
+        context = self._context or self._load_context()
+        if not context['allowed']:
+            return None
+        if 'session' not in context:
+            context['session'] = self._ensure_session(context['ticket'])
+        return context['session']
+
+    @database_sync_to_async
+    def _check_access(self):
+        return self._load_context()['allowed']
 
     @staticmethod
     def _ensure_session(ticket):
         """Return the active AssignmentSession, auto-creating one for legacy tickets."""
-        from .models import AssignmentSession
+        from .models import AssignmentSession, Ticket
         session = AssignmentSession.objects.filter(ticket=ticket, is_active=True).first()
         if not session and ticket.assigned_to_id:
             session = AssignmentSession.objects.create(ticket=ticket, employee=ticket.assigned_to)
+            # ``ticket`` is cached for the connection and may be stale; write only
+            # this column so no Ticket save handlers run on old values.
+            Ticket.objects.filter(pk=ticket.pk).update(current_session=session)
             ticket.current_session = session
-            ticket.save(update_fields=['current_session'])
         return session
 
-    @database_sync_to_async
-    def _get_messages(self):
-        from .models import Ticket, Message
+    def _history_queryset(self):
+        """Messages this user may read in the room, or None if there are none."""
+        from .models import Message
         from users.models import User
-        try:
-            ticket = Ticket.objects.select_related('assigned_to').get(id=self.ticket_id)
-        except Ticket.DoesNotExist:
-            return []
-
-        user = self.user
-        is_employee = getattr(user, 'role', None) == User.ROLE_EMPLOYEE
+        context = self._context or self._load_context()
+        if not context['allowed']:
+            return None
 
-        if is_employee:
+        msgs = Message.objects.filter(ticket_id=self.ticket_id, channel_type=self.channel_type)
+        if getattr(self.user, 'role', None) == User.ROLE_EMPLOYEE:
             # Employee only sees messages from their current assignment session
-            session = self._ensure_session(ticket)
+            session = self._current_session()
             if not session:
-                return []
-            msgs = Message.objects.filter(
-                ticket=ticket,
-                channel_type=self.channel_type,
-                assignment_session=session,
-            )
-        else:
-            # Client and admin see the full history across all sessions
-            msgs = Message.objects.filter(
-                ticket=ticket,
-                channel_type=self.channel_type,
-            )
+                return None
+            msgs = msgs.filter(assignment_session=session)
+        # Client and admin see the full history across all sessions
 
-        msgs = msgs.select_related('sender', 'reply_to__sender').prefetch_related(
+        return msgs.select_related('sender', 'reply_to__sender').prefetch_related(
             'reactions__user', 'read_receipts__user'
-        ).order_by('created_at')
+        )
 
-        return [self._serialize_message(m) for m in msgs]
+    def _latest_page(self, msgs, limit):
+        """Newest ``limit`` messages of ``msgs`` in chronological order, plus has_more."""
+        page = list(msgs.order_by('-created_at', '-id')[:limit + 1])
+        return {
+            'messages': [self._serialize_message(m) for m in reversed(page[:limit])],
+            'has_more': len(page) > limit,
+        }
+
+    @database_sync_to_async
+    def _get_messages(self, since_id=None):
+        msgs = self._history_queryset()
+        if msgs is None:
+            return {'messages': [], 'has_more': False, 'incremental': False}
+
+        if since_id:
+            # Resume: send only what the client missed, unless that is more than a
+            # page. An incremental frame is never truncated, so has_more is False.
+            newer = list(msgs.filter(id__gt=since_id).order_by('created_at', 'id')[:self.HISTORY_PAGE_SIZE + 1])
+            if len(newer) <= self.HISTORY_PAGE_SIZE:
+                return {
+                    'messages': [self._serialize_message(m) for m in newer],
+                    'has_more': False,
+                    'incremental': True,
+                }
+
+        return {**self._latest_page(msgs, self.HISTORY_PAGE_SIZE), 'incremental': False}
+
+    @database_sync_to_async
+    def _get_history_page(self, before_id, limit):
+        from django.db.models import Q
+        msgs = self._history_queryset()
+        anchor = msgs.filter(id=before_id).values_list('created_at', flat=True).first() if msgs is not None else None
+        if anchor is None:
+            return {'messages': [], 'has_more': False}
+        older = msgs.filter(Q(created_at__lt=anchor) | Q(created_at=anchor, id__lt=before_id))
+        return self._latest_page(older, limit)
 
     @database_sync_to_async
     def _save_message(self, content, reply_to_id=None):
-        from .models import Ticket, Message
+        from .models import Message
         if not content or not content.strip():
             return None
-        try:
-            ticket = Ticket.objects.select_related('assigned_to').get(id=self.ticket_id)
-        except Ticket.DoesNotExist:
-            return None
 
-        session = self._ensure_session(ticket)
+        session = self._current_session()
         if not session:
             return None
 
         reply_to = None
+        reply_to_id = _positive_int(reply_to_id)
         if reply_to_id:
-            try:
-                reply_to = Message.objects.get(id=reply_to_id)
-            except Message.DoesNotExist:
-                pass
+            reply_to = self._reply_cache.get(reply_to_id)
+            if reply_to is None:
+                target = self._history_queryset().filter(id=reply_to_id).first()
+                reply_to = self._reply_summary(target) if target else None
 
+        # The payload is built from the inserted row: a new message has no
+        # reactions or receipts yet, and sender/reply_to are already known.
         msg = Message.objects.create(
-            ticket=ticket,
+            ticket_id=self.ticket_id,
             assignment_session=session,
             channel_type=self.channel_type,
             sender=self.user,
             content=content.strip(),
-            reply_to=reply_to,
+            reply_to_id=reply_to['id'] if reply_to else None,
         )
-        msg = Message.objects.select_related('sender', 'reply_to__sender').prefetch_related('reactions__user', 'read_receipts__user').get(id=msg.id)
-        return self._serialize_message(msg)
+        return self._message_payload(msg, reply_to, reactions={}, read_by=[])
 
     @database_sync_to_async
     def _toggle_reaction(self, message_id, emoji):
@@ -336,22 +445,43 @@ class TicketChatConsumer(AsyncJsonWebsocketConsumer):
         from .models import Message, MessageReadReceipt
         if not message_ids:
             return None
-        results = []
-        for mid in message_ids:
-            try:
-                msg = Message.objects.get(id=mid)
-                obj, created = MessageReadReceipt.objects.get_or_create(message=msg, user=self.user)
-                if created:
-                    results.append({
-                        'message_id': mid,
-                        'user_id': self.user.id,
-                        'username': self.user.username,
-                        'name': self._user_display_name(self.user),
-                        'read_at': obj.read_at.isoformat(),
-                    })
-            except Message.DoesNotExist:
-                continue
-        return results if results else None
+        # Only messages in this room that the user has not read yet
+        unread_ids = list(
+            Message.objects.filter(
+                id__in=message_ids, ticket_id=self.ticket_id, channel_type=self.channel_type,
+            ).exclude(read_receipts__user=self.user).order_by().values_list('id', flat=True)
+        )
+        if not unread_ids:
+            return None
+        try:
+            with transaction.atomic():
+                receipts = MessageReadReceipt.objects.bulk_create(
+                    [MessageReadReceipt(message_id=mid, user=self.user) for mid in unread_ids],
+                )
+        except IntegrityError:
+            # Another socket of this user marked some of them read in between;
+            # only the receipts written here are broadcast.
+            existing = set(
+                MessageReadReceipt.objects.filter(user=self.user, message_id__in=unread_ids)
+                .values_list('message_id', flat=True)
+            )
+            receipts = MessageReadReceipt.objects.bulk_create(
+                [MessageReadReceipt(message_id=mid, user=self.user) for mid in unread_ids if mid not in existing],
+                ignore_conflicts=True,
+            )
+            if not receipts:
+                return None
+        name = self._user_display_name(self.user)
+        return [
+            {
+                'message_id': receipt.message_id,
+                'user_id': self.user.id,
+                'username': self.user.username,
+                'name': name,
+                'read_at': receipt.read_at.isoformat(),
+            }
+            for receipt in receipts
+        ]
 
     @staticmethod
     def _user_display_name(user):
@@ -379,16 +509,35 @@ class TicketChatConsumer(AsyncJsonWebsocketConsumer):
             for rr in msg.read_receipts.all()
         ]
 
-        reply_to_data = None
-        if msg.reply_to:
-            reply_to_data = {
-                'id': msg.reply_to.id,
-                'content': msg.reply_to.content[:100],
-                'sender_id': msg.reply_to.sender.id,
-                'sender_username': msg.reply_to.sender.username,
-                'sender_name': self._user_display_name(msg.reply_to.sender),
+        reply_to_data = self._reply_summary(msg.reply_to) if msg.reply_to else None
+        return self._message_payload(msg, reply_to_data, reactions, read_by)
+
+    def _reply_summary(self, msg):
+        return {
+            'id': msg.id,
+            'content': msg.content[:100],
+            'sender_id': msg.sender.id,
+            'sender_username': msg.sender.username,
+            'sender_name': self._user_display_name(msg.sender),
+        }
+
+    def _remember_messages(self, payloads):
+        """Keep reply summaries of messages this socket has seen."""
+        cache = self._reply_cache
+        for payload in payloads:
+            if payload.get('id') is None or 'sender_id' not in payload:
+                continue
+            cache[payload['id']] = {
+                'id': payload['id'],
+                'content': payload.get('content', '')[:100],
+                'sender_id': payload['sender_id'],
+                'sender_username': payload.get('sender_username', ''),
+                'sender_name': payload.get('sender_name') or payload.get('sender_username', ''),
             }
+        while len(cache) > self.REPLY_CACHE_SIZE:
+            cache.pop(next(iter(cache)))
 
+    def _message_payload(self, msg, reply_to_data, reactions, read_by):
         return {
             'id': msg.id,
             'sender_id': msg.sender.id,
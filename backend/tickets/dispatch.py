@@ -0,0 +1,170 @@
+"""Real-time notification delivery.
+
+Notification rows are written inside the request transaction, but pushing
+them to the channel layer is deferred with ``transaction.on_commit`` and
+handed to a dispatcher backend, so clients are never told about rows that
+roll back and a slow channel layer never stalls a ticket save.
+
+The backend is chosen with the ``NOTIFICATION_DISPATCHER`` setting. A
+backend only needs ``enqueue(messages)``; ``messages`` is a list of
+``(group, event)`` pairs ready for ``channel_layer.group_send``. The base
+class defers to ``dispatch()`` on commit. A DB-backed outbox can instead
+override ``enqueue()`` to insert its rows in the same transaction.
+"""
+import asyncio
+import logging
+import queue
+import threading
+from functools import partial
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+async def _group_send_all(messages):
+    from channels.layers import get_channel_layer
+    channel_layer = get_channel_layer()
+    if not channel_layer:
+        return
+    results = await asyncio.gather(
+        *(channel_layer.group_send(group, event) for group, event in messages),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning(f'Failed to push notification: {result}')
+
+
+class NotificationDispatcher:
+    """Base backend: deliver messages once the current transaction commits."""
+
+    def enqueue(self, messages):
+        if messages:
+            transaction.on_commit(partial(self.dispatch, messages))
+
+    def dispatch(self, messages):
+        raise NotImplementedError
+
+    def bind_loop(self, loop):
+        """Called from the ASGI event loop; backends may deliver on it."""
+
+    def flush(self, timeout=None):
+        """Block until everything enqueued so far has been delivered."""
+        return True
+
+
+class SyncDispatcher(NotificationDispatcher):
+    """Deliver on the committing thread (the behaviour before dispatchers)."""
+
+    def dispatch(self, messages):
+        try:
+            async_to_sync(_group_send_all)(messages)
+        except Exception as e:
+            logger.warning(f'Failed to push notifications: {e}')
+
+
+class InProcessDispatcher(NotificationDispatcher):
+    """Hand messages to a bounded queue drained by one background worker.
+
+    The committing thread only does a ``put_nowait``, so write latency does
+    not depend on the number of recipients or on the channel layer. When the
+    queue is full the push is dropped and logged; the rows are already
+    saved, so clients still see them through the notifications API.
+
+    The worker sends on the ASGI server's event loop once a consumer has
+    bound it (required for the in-memory channel layer), otherwise on its
+    own loop.
+    """
+
+    def __init__(self, maxsize=None, batch_size=100, send_timeout=10):
+        if maxsize is None:
+            maxsize = getattr(settings, 'NOTIFICATION_QUEUE_SIZE', 1000)
+        self.batch_size = batch_size
+        self.send_timeout = send_timeout
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._server_loop = None
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def bind_loop(self, loop):
+        self._server_loop = loop
+
+    def dispatch(self, messages):
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(messages)
+        except queue.Full:
+            logger.warning(f'Notification queue full; dropped {len(messages)} real-time push(es)')
+
+    def flush(self, timeout=None):
+        self._ensure_worker()
+        done = threading.Event()
+        self._queue.put(done, timeout=timeout)
+        return done.wait(timeout)
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name='notification-dispatcher', daemon=True,
+                )
+                self._worker.start()
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        while True:
+            items = [self._queue.get()]
+            while len(items) < self.batch_size:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            messages = [m for item in items if isinstance(item, list) for m in item]
+            try:
+                if messages:
+                    self._send(loop, messages)
+            except Exception as e:
+                logger.warning(f'Failed to push notifications: {e}')
+            finally:
+                for item in items:
+                    if isinstance(item, threading.Event):
+                        item.set()
+                    self._queue.task_done()
+
+    def _send(self, loop, messages):
+        server_loop = self._server_loop
+        if server_loop is not None and server_loop.is_running() and not server_loop.is_closed():
+            future = asyncio.run_coroutine_threadsafe(_group_send_all(messages), server_loop)
+            future.result(timeout=self.send_timeout)
+        else:
+            loop.run_until_complete(_group_send_all(messages))
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """Return the process-wide dispatcher configured by NOTIFICATION_DISPATCHER."""
+    global _dispatcher
+    if _dispatcher is None:
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                path = getattr(settings, 'NOTIFICATION_DISPATCHER', 'tickets.dispatch.InProcessDispatcher')
+                _dispatcher = import_string(path)()
+    return _dispatcher
+
+
+@receiver(setting_changed)
+def _reset_dispatcher(setting, **kwargs):
+    global _dispatcher
+    if setting in ('NOTIFICATION_DISPATCHER', 'NOTIFICATION_QUEUE_SIZE'):
+        _dispatcher = None
@@ -0,0 +1,108 @@
+"""Attachment type detection from file content.
+
+The browser's ``content_type`` and the file name are whatever the client
+says they are. ``sniff_attachment_type`` reads the file's leading bytes
+instead and maps them to the attachment types the ticket views accept:
+``screenshot`` (PNG, JPEG, GIF, WebP, BMP, TIFF, HEIC/AVIF), ``recording``
+(MP4/QuickTime/3GP, WebM/Matroska, AVI, ASF/WMV, MPEG program streams, Ogg)
+and ``file`` (PDF, legacy Office, DOCX/XLSX). Anything else, including SVG
+and HTML, is None, so an ``image/*`` or ``video/*`` upload in a format not
+listed here is rejected.
+
+``check_attachment_type`` compares that with the type the name and
+content type claim (``claimed_attachment_type``); the blob store runs it
+on every upload path before writing a byte.
+"""
+import zipfile
+from pathlib import Path
+
+SNIFF_SIZE = 16
+
+# ISO-BMFF major brands of still images; every other ``ftyp`` is a video.
+_IMAGE_BRANDS = (b'heic', b'heix', b'mif1', b'avif')
+_IMAGE_TYPES = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.bmp', '.heic', '.heif', '.avif'}
+_VIDEO_TYPES = {'.mp4', '.webm'}
+_DOCUMENT_TYPES = {'.pdf', '.doc', '.docx', '.xls', '.xlsx'}
+_DOCUMENT_CONTENT_TYPES = {
+    'application/pdf',
+    'application/msword',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'application/vnd.ms-excel',
+    'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+_OLE2 = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+_IMAGE_MAGIC = (b'\x89PNG\r\n\x1a\n', b'\xff\xd8\xff', b'GIF87a', b'GIF89a', b'BM', b'II*\x00', b'MM\x00*')
+# Matroska/WebM, ASF (WMV), MPEG program stream pack and sequence headers, Ogg.
+_VIDEO_MAGIC = (
+    b'\x1a\x45\xdf\xa3', b'\x30\x26\xb2\x75\x8e\x66\xcf\x11', b'\x00\x00\x01\xba', b'\x00\x00\x01\xb3', b'OggS',
+)
+# Parts every DOCX / XLSX package contains.
+_OOXML_PARTS = ('word/document.xml', 'xl/workbook.xml')
+
+
+def _is_ooxml(file):
+    try:
+        with zipfile.ZipFile(file) as package:
+            names = set(package.namelist())
+    except (zipfile.BadZipFile, OSError, ValueError):
+        return False
+    return any(part in names for part in _OOXML_PARTS)
+
+
+def _from_header(head):
+    if head.startswith(_IMAGE_MAGIC):
+        return 'screenshot'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'screenshot'
+    if head[:4] == b'RIFF' and head[8:12] == b'AVI ':
+        return 'recording'
+    if head[4:8] == b'ftyp':
+        return 'screenshot' if head[8:12] in _IMAGE_BRANDS else 'recording'
+    if head.startswith(_VIDEO_MAGIC):
+        return 'recording'
+    if head.startswith((b'%PDF-', _OLE2)):
+        return 'file'
+    return None
+
+
+def sniff_attachment_type(file):
+    """The attachment type ``file``'s bytes belong to, or None; leaves the file at offset 0."""
+    file.seek(0)
+    head = file.read(SNIFF_SIZE)
+    file.seek(0)
+    attachment_type = _from_header(head)
+    if attachment_type is None and head.startswith(b'PK\x03\x04'):
+        attachment_type = 'file' if _is_ooxml(file) else None
+        file.seek(0)
+    return attachment_type
+
+
+class AttachmentTypeError(ValueError):
+    """An attachment whose bytes are not the supported type its name or content type claims."""
+
+    def __init__(self, name):
+        self.name = name
+        self.detail = f'The contents of "{name}" do not match its file type.'
+        super().__init__(self.detail)
+
+
+def claimed_attachment_type(name, content_type=''):
+    """The attachment type a file's name or declared content type claims, or None."""
+    content_type = (content_type or '').lower()
+    extension = Path(name or '').suffix.lower()
+    if content_type.startswith('image/') or extension in _IMAGE_TYPES:
+        return 'screenshot'
+    if content_type.startswith('video/') or extension in _VIDEO_TYPES:
+        return 'recording'
+    if content_type in _DOCUMENT_CONTENT_TYPES or extension in _DOCUMENT_TYPES:
+        return 'file'
+    return None
+
+
+def check_attachment_type(file, name=None):
+    """Raise AttachmentTypeError unless ``file``'s bytes are the type it claims to be."""
+    name = name or file.name
+    claimed = claimed_attachment_type(name, getattr(file, 'content_type', ''))
+    if claimed is None or sniff_attachment_type(file) != claimed:
+        raise AttachmentTypeError(name)
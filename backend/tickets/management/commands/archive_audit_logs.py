@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from tickets.archive import DEFAULT_SEGMENT_SIZE, archive_audit_logs
+
+
+class Command(BaseCommand):
+    help = "Move aged audit logs into compressed, append-only archive segments under MEDIA_ROOT."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            help="Archive logs older than this many days. Defaults to the retention policy's archive days.",
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only count the logs that would be archived.')
+        parser.add_argument('--segment-size', type=int, default=DEFAULT_SEGMENT_SIZE, help='Logs per segment file.')
+        parser.add_argument('--max-segments', type=int, help='Stop after writing this many segments; rerun to continue.')
+
+    def handle(self, *args, **options):
+        result = archive_audit_logs(
+            options['days'],
+            segment_size=max(1, options['segment_size']),
+            dry_run=options['dry_run'],
+            max_segments=options['max_segments'],
+        )
+
+        if 'skipped' in result:
+            self.stdout.write(f'audit_log: skipped ({result["skipped"]})')
+        elif 'would_archive' in result:
+            self.stdout.write(
+                f'audit_log: would archive {result["would_archive"]} logs older than {result["cutoff"]:%Y-%m-%d %H:%M}'
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'audit_log: archived {result["archived"]} logs into {result["segments"]} segments '
+                f'({result["bytes"]} bytes), {result["elapsed"]:.2f}s ({result["rows_per_second"]:.0f} rows/s)'
+            ))
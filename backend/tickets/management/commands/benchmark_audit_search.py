@@ -0,0 +1,85 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from tickets.audit_search import SEARCH_FIELDS, search_audit_logs
+from tickets.models import AuditLog
+
+WORDS = [
+    'printer', 'firewall', 'router', 'switch', 'laptop', 'server', 'backup', 'license',
+    'network', 'storage', 'camera', 'scanner', 'battery', 'monitor', 'keyboard', 'cable',
+]
+QUERIES = ['firewall', 'tech7', 'maptech', 'backup license', 'STF-0042']
+
+
+class Command(BaseCommand):
+    help = "Benchmark audit log search (icontains scan vs. the full-text index)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=200000, help='Number of audit logs to generate.')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query (best is reported).')
+        parser.add_argument(
+            '--limit', type=int, default=0,
+            help='Rows fetched per search. Defaults to every match, as the list and export endpoints do.',
+        )
+
+    def handle(self, *args, **options):
+        count = options['count']
+        repeat = max(1, options['repeat'])
+        limit = options['limit']
+
+        # Everything is created inside a transaction that is rolled back.
+        with transaction.atomic():
+            self._build_logs(count)
+            self.stdout.write(
+                f'Searching {AuditLog.objects.count()} audit logs on {connection.vendor}, '
+                f'best of {repeat} runs, {f"first {limit}" if limit else "all matching"} rows\n'
+            )
+            self.stdout.write(f'  {"query":<16} {"icontains":>10} {"index":>10} {"speedup":>8}  matches')
+            for text in QUERIES:
+                scan = min(self._time(self._icontains(text), limit) for _ in range(repeat))
+                index = min(self._time(search_audit_logs(AuditLog.objects.all(), text), limit) for _ in range(repeat))
+                matches = search_audit_logs(AuditLog.objects.all(), text).count()
+                speedup = scan / index if index else float('inf')
+                self.stdout.write(
+                    f'  {text:<16} {scan * 1000:8.1f}ms {index * 1000:8.1f}ms {speedup:7.1f}x  {matches}'
+                )
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _icontains(text):
+        condition = Q()
+        for field in SEARCH_FIELDS:
+            condition |= Q(**{f'{field}__icontains': text})
+        return AuditLog.objects.filter(condition)
+
+    @staticmethod
+    def _time(queryset, limit):
+        queryset = queryset.order_by('-timestamp').values_list('id', flat=True)
+        if limit:
+            queryset = queryset[:limit]
+        start = time.perf_counter()
+        list(queryset)
+        return time.perf_counter() - start
+
+    def _build_logs(self, count):
+        rng = random.Random(42)
+        entities = [value for value, _ in AuditLog.ENTITY_CHOICES]
+        actions = [value for value, _ in AuditLog.ACTION_CHOICES]
+        batch = []
+        for i in range(count):
+            batch.append(AuditLog(
+                entity=rng.choice(entities),
+                entity_id=i,
+                action=rng.choice(actions),
+                activity=f'tech{i % 50}@maptechisi.com updated STF-{i % 10000:04d}: '
+                         f'{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(WORDS)}',
+                actor_email=f'tech{i % 50}@maptechisi.com',
+            ))
+            if len(batch) == 5000:
+                AuditLog.objects.bulk_create(batch)
+                batch = []
+        AuditLog.objects.bulk_create(batch)
@@ -0,0 +1,124 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from tickets.models import Ticket
+from tickets.pagination import TicketCursorPagination
+from tickets.views import TicketViewSet, list_employees
+
+PAGE_SIZE = 50
+
+
+class Command(BaseCommand):
+    help = "Benchmark ticket list latency per role with and without the Ticket list indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=200000, help='Number of tickets to generate.')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query (best is reported).')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        repeat = max(1, options['repeat'])
+
+        # Everything, including dropping the indexes, happens inside a
+        # transaction that is rolled back.
+        with transaction.atomic():
+            users = self._build_tickets(count)
+            scenarios = [
+                ('admin, newest page', users['admin'], {}),
+                ('admin, status=open', users['admin'], {'status': Ticket.STATUS_OPEN}),
+                ('admin, unassigned', users['admin'], {'assigned_to': 'none'}),
+                ('sales, own tickets', users['sales'], {}),
+                ('employee, assigned', users['employee'], {}),
+            ]
+            self._analyze()
+            after = self._run(scenarios, users['admin'], repeat)
+            self._drop_indexes()
+            self._analyze()
+            before = self._run(scenarios, users['admin'], repeat)
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f'{count} tickets on {connection.vendor}, first page of {PAGE_SIZE}, best of {repeat} runs\n'
+        )
+        self.stdout.write(f'  {"query":<24} {"no index":>10} {"indexed":>10} {"speedup":>8}')
+        for label in after:
+            speedup = before[label] / after[label] if after[label] else float('inf')
+            self.stdout.write(
+                f'  {label:<24} {before[label] * 1000:8.1f}ms {after[label] * 1000:8.1f}ms {speedup:7.1f}x'
+            )
+
+    def _run(self, scenarios, admin, repeat):
+        timings = {
+            label: min(self._time_page(user, params) for _ in range(repeat))
+            for label, user, params in scenarios
+        }
+        timings['employee queue counts'] = min(self._time_employees(admin) for _ in range(repeat))
+        return timings
+
+    @staticmethod
+    def _time_page(user, params):
+        """One summary page of the ticket list, as the paginated endpoint reads it."""
+        request = APIRequestFactory().get('/api/tickets/', {'view': 'summary', **params})
+        force_authenticate(request, user)
+        view = TicketViewSet(action_map={'get': 'list'}, format_kwarg=None, kwargs={})
+        view.request = view.initialize_request(request)
+        start = time.perf_counter()
+        page = view.get_queryset().order_by(*TicketCursorPagination.ordering)[:PAGE_SIZE]
+        view.get_serializer(page, many=True).data
+        return time.perf_counter() - start
+
+    @staticmethod
+    def _time_employees(user):
+        request = APIRequestFactory().get('/api/employees/')
+        force_authenticate(request, user)
+        start = time.perf_counter()
+        list_employees(request)
+        return time.perf_counter() - start
+
+    @staticmethod
+    def _drop_indexes():
+        with connection.cursor() as cursor:
+            for index in Ticket._meta.indexes:
+                cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+
+    @staticmethod
+    def _analyze():
+        # Fresh statistics for every table, as autovacuum keeps them on
+        # PostgreSQL; with stale user-table stats SQLite may drive the join
+        # from users_user and sort the whole ticket table.
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def _build_tickets(self, count):
+        User = get_user_model()
+        rng = random.Random(42)
+
+        def make(role, i):
+            return User.objects.create_user(
+                username=f'bench-{role}{i}', email=f'bench-{role}{i}@example.com', password='bench', role=role,
+            )
+
+        admin = make(User.ROLE_ADMIN, 0)
+        sales = [make(User.ROLE_SALES, i) for i in range(20)]
+        employees = [make(User.ROLE_EMPLOYEE, i) for i in range(50)]
+        statuses = [value for value, _ in Ticket.STATUS_CHOICES]
+
+        batch = []
+        for i in range(count):
+            batch.append(Ticket(
+                stf_no=f'BENCH-{i:07d}',
+                status=rng.choice(statuses),
+                created_by=rng.choice(sales),
+                assigned_to=rng.choice(employees) if rng.random() < 0.8 else None,
+                description_of_problem='Benchmark ticket',
+            ))
+            if len(batch) == 5000:
+                Ticket.objects.bulk_create(batch)
+                batch = []
+        Ticket.objects.bulk_create(batch)
+        return {'admin': admin, 'sales': sales[0], 'employee': employees[0]}
@@ -0,0 +1,145 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from tickets.models import Client, Product, Ticket, TypeOfService
+from tickets.ticket_search import SEARCH_FIELDS, filter_tickets
+
+WORDS = [
+    'printer', 'firewall', 'router', 'switch', 'laptop', 'server', 'backup', 'license',
+    'network', 'storage', 'camera', 'scanner', 'battery', 'monitor', 'keyboard', 'cable',
+]
+BRANDS = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Stark']
+QUERIES = ['firewall', 'globex', 'backup license', 'BENCH-0004242', 'client 17']
+FILTERS = [
+    {'status': 'open,in_progress'},
+    {'priority': 'critical', 'status': 'in_progress'},
+    {'assigned_to': 'none'},
+    {'client': '17'},
+    {'sla': 'breached'},
+    {'sla': 'urgent', 'priority': 'high'},
+    {'status': 'open', 'search': 'printer'},
+]
+
+
+class Command(BaseCommand):
+    help = "Benchmark ticket list search (icontains scan vs. trigram indexes) and filters."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000000, help='Number of tickets to generate.')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per query (best is reported).')
+        parser.add_argument(
+            '--limit', type=int, default=50,
+            help='Rows fetched per query, as one page of the list endpoint. 0 fetches every match.',
+        )
+
+    def handle(self, *args, **options):
+        count = options['count']
+        repeat = max(1, options['repeat'])
+        limit = options['limit']
+
+        # Everything is created inside a transaction that is rolled back.
+        with transaction.atomic():
+            started = time.perf_counter()
+            self._build_tickets(count)
+            self.stdout.write(
+                f'Generated {count} tickets in {time.perf_counter() - started:.1f}s; '
+                f'querying on {connection.vendor}, best of {repeat} runs, '
+                f'{f"first {limit}" if limit else "all matching"} rows\n'
+            )
+
+            self.stdout.write(f'  {"search":<18} {"icontains":>10} {"index":>10} {"speedup":>8}  matches')
+            for text in QUERIES:
+                scan = min(self._time(self._icontains(text), limit) for _ in range(repeat))
+                indexed = filter_tickets(Ticket.objects.all(), {'search': text})
+                index = min(self._time(indexed, limit) for _ in range(repeat))
+                speedup = scan / index if index else float('inf')
+                self.stdout.write(
+                    f'  {text:<18} {scan * 1000:8.1f}ms {index * 1000:8.1f}ms {speedup:7.1f}x  {indexed.count()}'
+                )
+
+            self.stdout.write(f'\n  {"filters":<44} {"time":>10}  matches')
+            for params in FILTERS:
+                queryset = filter_tickets(Ticket.objects.all(), params)
+                best = min(self._time(queryset, limit) for _ in range(repeat))
+                label = '&'.join(f'{key}={value}' for key, value in params.items())
+                self.stdout.write(f'  {label:<44} {best * 1000:8.1f}ms  {queryset.count()}')
+            transaction.set_rollback(True)
+
+    @staticmethod
+    def _icontains(text):
+        queryset = Ticket.objects.all()
+        for term in text.split():
+            condition = Q()
+            for field in SEARCH_FIELDS:
+                condition |= Q(**{f'{field}__icontains': term})
+            queryset = queryset.filter(condition)
+        return queryset
+
+    @staticmethod
+    def _time(queryset, limit):
+        queryset = queryset.order_by('-created_at', 'id').values_list('id', flat=True)
+        if limit:
+            queryset = queryset[:limit]
+        start = time.perf_counter()
+        list(queryset)
+        return time.perf_counter() - start
+
+    def _build_tickets(self, count):
+        User = get_user_model()
+        rng = random.Random(42)
+        admin = User.objects.create_user(
+            username='bench-admin', email='bench-admin@example.com', password='bench', role=User.ROLE_ADMIN,
+        )
+        employees = [
+            User.objects.create_user(
+                username=f'bench-tech{i}', email=f'bench-tech{i}@example.com', password='bench',
+                role=User.ROLE_EMPLOYEE,
+            )
+            for i in range(20)
+        ]
+        services = [
+            TypeOfService.objects.create(name=f'Benchmark Service {days}', estimated_resolution_days=days)
+            for days in (1, 3, 7)
+        ]
+        clients = Client.objects.bulk_create(
+            [Client(client_name=f'Benchmark Client {i}') for i in range(200)]
+        )
+        products = Product.objects.bulk_create([
+            Product(
+                project_title='Benchmark Project', client=rng.choice(clients),
+                product_name=rng.choice(WORDS).title(), brand=rng.choice(BRANDS), model_name=f'M-{i}',
+            )
+            for i in range(1000)
+        ])
+        statuses = [value for value, _ in Ticket.STATUS_CHOICES]
+        priorities = [''] + [value for value, _ in Ticket.PRIORITY_CHOICES]
+        now = timezone.now()
+
+        batch = []
+        for i in range(count):
+            product = rng.choice(products)
+            status = rng.choice(statuses)
+            batch.append(Ticket(
+                stf_no=f'BENCH-{i:07d}',
+                status=status,
+                created_by=admin,
+                assigned_to=rng.choice(employees) if rng.random() < 0.8 else None,
+                type_of_service=rng.choice(services),
+                client_record_id=product.client_id,
+                product_record=product,
+                priority=rng.choice(priorities),
+                confirmed_by_admin=rng.random() < 0.9,
+                time_in=now - timezone.timedelta(hours=rng.randint(0, 240)) if status != Ticket.STATUS_OPEN else None,
+                description_of_problem=f'{rng.choice(WORDS)} {rng.choice(WORDS)} not responding',
+                action_taken=f'checked {rng.choice(WORDS)}' if rng.random() < 0.5 else '',
+            ))
+            if len(batch) == 5000:
+                Ticket.objects.bulk_create(batch)
+                batch = []
+        Ticket.objects.bulk_create(batch)
@@ -0,0 +1,96 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework import serializers
+
+from tickets.models import Category, Client, Product, Ticket, TypeOfService
+from tickets.serializers import TicketSerializer, TicketSummarySerializer
+from tickets.serializers.ticket import VIRTUAL_FIELD_SOURCES
+
+
+def _per_field_serializer_class():
+    """Reference TicketSerializer that resolves every client/product field
+    through its own SerializerMethodField, as the serializer used to."""
+    attrs = {}
+    for name, (relation, attr) in VIRTUAL_FIELD_SOURCES.items():
+        def getter(self, obj, relation=relation, attr=attr):
+            record = getattr(obj, relation, None)
+            if not record:
+                return ''
+            value = getattr(record, attr, None)
+            return '' if value is None else value
+        attrs[name] = serializers.SerializerMethodField()
+        attrs[f'get_{name}'] = getter
+    attrs['_readable_fields'] = serializers.Serializer._readable_fields
+    attrs['to_representation'] = serializers.ModelSerializer.to_representation
+    return type('PerFieldTicketSerializer', (TicketSerializer,), attrs)
+
+
+class Command(BaseCommand):
+    help = "Benchmark ticket serialization (per-field reference vs. one-pass fast path vs. summary)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=10000, help='Number of tickets to serialize.')
+        parser.add_argument('--repeat', type=int, default=3, help='Timed runs per serializer (best is reported).')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        repeat = max(1, options['repeat'])
+
+        # Everything is created inside a transaction that is rolled back.
+        with transaction.atomic():
+            tickets = self._build_tickets(count)
+            self.stdout.write(f'Serializing {len(tickets)} tickets, best of {repeat} runs\n')
+
+            results = []
+            for label, serializer_class in [
+                ('per-field reference', _per_field_serializer_class()),
+                ('TicketSerializer', TicketSerializer),
+                ('TicketSummarySerializer', TicketSummarySerializer),
+            ]:
+                best = min(self._time(serializer_class, tickets) for _ in range(repeat))
+                results.append((label, best))
+            transaction.set_rollback(True)
+
+        baseline = results[0][1]
+        for label, seconds in results:
+            speedup = baseline / seconds if seconds else float('inf')
+            self.stdout.write(f'  {label:<26} {seconds:8.3f}s  {speedup:5.2f}x')
+
+    @staticmethod
+    def _time(serializer_class, tickets):
+        start = time.perf_counter()
+        serializer_class(tickets, many=True).data
+        return time.perf_counter() - start
+
+    def _build_tickets(self, count):
+        User = get_user_model()
+        admin = User.objects.create_user(
+            username='bench-admin', email='bench-admin@example.com', password='bench', role=User.ROLE_ADMIN,
+        )
+        employee = User.objects.create_user(
+            username='bench-tech', email='bench-tech@example.com', password='bench', role=User.ROLE_EMPLOYEE,
+        )
+        service = TypeOfService.objects.create(name='Benchmark Service', estimated_resolution_days=3)
+        category = Category.objects.create(name='Benchmark Category')
+        client = Client.objects.create(client_name='Benchmark Client', contact_person='Jane Doe')
+        product = Product.objects.create(
+            project_title='Benchmark Project', client=client, category=category,
+            product_name='Firewall', brand='Acme', serial_no='SN-0001',
+        )
+        Ticket.objects.bulk_create(
+            [
+                Ticket(
+                    stf_no=f'BENCH-{i:07d}', created_by=admin, assigned_to=employee,
+                    type_of_service=service, client_record=client, product_record=product,
+                    priority=Ticket.PRIORITY_MEDIUM, confirmed_by_admin=True,
+                    description_of_problem='Intermittent connectivity drops.',
+                )
+                for i in range(count)
+            ],
+            batch_size=1000,
+        )
+        queryset = Ticket.objects.filter(stf_no__startswith='BENCH-').order_by('-created_at')
+        return list(TicketSerializer.setup_eager_loading(queryset))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from tickets.previews import build_missing_previews
+
+
+class Command(BaseCommand):
+    help = "Build thumbnails for attachments and profile pictures that have none yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Rebuild every file; cached derivatives with the same content are reused.',
+        )
+
+    def handle(self, *args, **options):
+        built = build_missing_previews(force=options['force'])
+        self.stdout.write(self.style.SUCCESS(f'Built previews for {built} files.'))
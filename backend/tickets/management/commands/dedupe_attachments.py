@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from tickets.blobs import dedupe_attachments
+from tickets.models import TicketAttachment
+
+
+class Command(BaseCommand):
+    help = "Move attachments saved before content-addressed storage into the blob store, sharing duplicate files."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, help='Process at most this many attachments; run again to continue.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the attachments still to move.')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            pending = TicketAttachment.objects.filter(blob__isnull=True).exclude(file='').count()
+            self.stdout.write(f'{pending} attachments are not in the blob store yet.')
+            return
+        moved, freed = dedupe_attachments(limit=options['limit'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {moved} attachments into the blob store; {freed / (1024 * 1024):.1f} MB of duplicates removed.'
+        ))
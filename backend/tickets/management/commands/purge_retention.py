@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+
+from tickets.retention import DEFAULT_BATCH_SIZE, RETENTION_TARGETS, purge_expired
+
+
+class Command(BaseCommand):
+    help = "Delete audit, call and escalation logs older than the RetentionPolicy allows, in resumable batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', choices=sorted(RETENTION_TARGETS),
+            help='Log to purge (repeatable). Defaults to all of them.',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only count the rows that would be deleted.')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Primary keys per delete batch.')
+        parser.add_argument('--max-batches', type=int, help='Stop after this many batches per log; rerun to resume.')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches.')
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Abandon interrupted runs and start again from the current policy.',
+        )
+
+    def handle(self, *args, **options):
+        verbosity = options['verbosity']
+
+        def progress(run):
+            if verbosity > 1:
+                self.stdout.write(
+                    f'  {run.target}: pk {run.last_pk}/{run.end_pk}, {run.deleted} deleted, '
+                    f'{run.rows_per_second:.0f} rows/s'
+                )
+
+        results = purge_expired(
+            targets=options['target'],
+            batch_size=max(1, options['batch_size']),
+            dry_run=options['dry_run'],
+            resume=not options['restart'],
+            max_batches=options['max_batches'],
+            pause=options['pause'],
+            progress=progress,
+        )
+
+        for result in results:
+            target = result['target']
+            if 'skipped' in result:
+                self.stdout.write(f'{target}: skipped ({result["skipped"]})')
+            elif 'would_delete' in result:
+                self.stdout.write(
+                    f'{target}: would delete {result["would_delete"]} rows older than {result["cutoff"]:%Y-%m-%d %H:%M}'
+                )
+            else:
+                state = 'done' if result.get('finished', True) else 'interrupted, rerun to resume'
+                self.stdout.write(self.style.SUCCESS(
+                    f'{target}: deleted {result["deleted"]} rows in {result["batches"]} batches, '
+                    f'{result["elapsed"]:.2f}s ({result["rows_per_second"]:.0f} rows/s), {state}'
+                ))
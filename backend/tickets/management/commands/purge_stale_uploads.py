@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tickets.uploads import purge_stale_uploads
+
+
+class Command(BaseCommand):
+    help = "Delete unfinished chunked uploads (and their part files) that have been idle too long."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours', type=int,
+            help='Idle time before an upload is dropped. Defaults to UPLOAD_MAX_IDLE_HOURS.',
+        )
+
+    def handle(self, *args, **options):
+        hours = options['hours'] or getattr(settings, 'UPLOAD_MAX_IDLE_HOURS', 24)
+        purged = purge_stale_uploads(timezone.timedelta(hours=hours))
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} uploads idle for over {hours}h.'))
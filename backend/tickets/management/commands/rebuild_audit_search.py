@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from tickets import audit_search
+
+
+class Command(BaseCommand):
+    help = "Create the audit log full-text index if it is missing and repopulate it."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias to rebuild.')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if not audit_search.install(connection):
+            self.stdout.write(self.style.WARNING(
+                f'No full-text index for {connection.vendor}; audit search uses icontains.'
+            ))
+            return
+        audit_search.rebuild(connection)
+        self.stdout.write(self.style.SUCCESS(f'Audit search index rebuilt ({connection.vendor}).'))
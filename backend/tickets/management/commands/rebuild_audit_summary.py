@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tickets.models import AuditSummaryBucket
+
+
+class Command(BaseCommand):
+    help = "Rebuild the audit summary counters from the audit table, or check them for drift with --check."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only compare stored counters with a fresh recompute; exits non-zero on drift.',
+        )
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='With --check, rebuild when drift is found.',
+        )
+        parser.add_argument('--limit', type=int, default=20, help='Mismatches to print with --check.')
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            count = AuditSummaryBucket.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} audit summary buckets.'))
+            return
+
+        mismatches = AuditSummaryBucket.find_drift()
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Audit summary counters are consistent.'))
+            return
+
+        for key, stored, expected in mismatches[:options['limit']]:
+            self.stdout.write(f'  {key:<60} stored={stored} expected={expected}')
+        if not options['fix']:
+            raise CommandError(f'{len(mismatches)} mismatched audit summary bucket(s); run without --check to rebuild.')
+        self.stdout.write(self.style.WARNING(f'{len(mismatches)} mismatched bucket(s).'))
+        count = AuditSummaryBucket.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} audit summary buckets.'))
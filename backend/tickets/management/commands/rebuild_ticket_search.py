@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from tickets import ticket_search
+
+
+class Command(BaseCommand):
+    help = "Create the ticket search indexes if they are missing and repopulate them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias to rebuild.')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if not ticket_search.install(connection):
+            self.stdout.write(self.style.WARNING(
+                f'No trigram index for {connection.vendor}; ticket search uses icontains.'
+            ))
+            return
+        ticket_search.rebuild(connection)
+        self.stdout.write(self.style.SUCCESS(f'Ticket search indexes rebuilt ({connection.vendor}).'))
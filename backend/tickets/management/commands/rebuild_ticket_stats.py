@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from tickets.models import TicketStatsSnapshot
+
+
+class Command(BaseCommand):
+    help = "Rebuild the ticket stats rollup from the ticket table, or check it for drift with --check."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only compare stored rows with a fresh recompute; exits non-zero on drift.',
+        )
+        parser.add_argument(
+            '--fix', action='store_true',
+            help='With --check, rebuild when drift is found.',
+        )
+        parser.add_argument('--limit', type=int, default=20, help='Mismatches to print with --check.')
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            count = TicketStatsSnapshot.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} ticket stats rows.'))
+            return
+
+        mismatches = TicketStatsSnapshot.find_drift()
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('Ticket stats are consistent.'))
+            return
+
+        for key, column, stored, expected in mismatches[:options['limit']]:
+            self.stdout.write(f'  {key:<32} {column:<28} stored={stored} expected={expected}')
+        if not options['fix']:
+            raise CommandError(f'{len(mismatches)} mismatched ticket stats counter(s); run without --check to rebuild.')
+        self.stdout.write(self.style.WARNING(f'{len(mismatches)} mismatched counter(s).'))
+        count = TicketStatsSnapshot.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} ticket stats rows.'))
@@ -0,0 +1,266 @@
+"""Authorized serving of uploaded media.
+
+Everything under ``MEDIA_URL`` goes through ``serve_media``, which checks
+who is asking before a byte leaves MEDIA_ROOT:
+
+- ``ticket_attachments/``: users who can see the attachment's ticket (the
+  same scoping as the ticket list), its uploader, or anyone signed in once
+  the attachment is published to the Knowledge Hub.
+- ``profile_pictures/`` and avatar previews: anyone signed in.
+- attachment previews (``previews/attachments/<sha256>/``): users who can
+  see an attachment with that content.
+- anything else (the audit archive, stray files): 404.
+
+Authentication uses the API's own classes, so the JWT cookie that the
+browser already sends with ``<img>`` and ``<video>`` requests is enough.
+
+Once authorized, the file is handed to the front proxy when
+``MEDIA_OFFLOAD`` is set (``x-accel-redirect`` for nginx, ``x-sendfile``
+for Apache or lighttpd); the proxy then answers ranges and revalidation
+itself. Otherwise Django streams it, honouring a single ``Range`` (206/416,
+guarded by ``If-Range``) and ``If-None-Match`` / ``If-Modified-Since``
+(304). A video player seeking through a recording only fetches the bytes it
+plays. Under WSGI the span goes out as a ``FileResponse``, which the server
+may sendfile(). Under ASGI (Daphne) nothing is zero-copy: the span is read
+in ``STREAM_BLOCK_SIZE`` blocks, one at a time as the client takes them
+(``tickets.streaming``), so a 2 GB recording never sits in memory.
+Deployments serving large media should still set ``MEDIA_OFFLOAD``.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import SuspiciousFileOperation
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .streaming import is_asgi, read_blocks, stream_body
+
+OFFLOAD_ACCEL_REDIRECT = 'x-accel-redirect'
+OFFLOAD_SENDFILE = 'x-sendfile'
+STREAM_BLOCK_SIZE = 256 * 1024
+CACHE_CONTROL = 'private, max-age=3600'
+
+ATTACHMENT_DIR = 'ticket_attachments'
+PROFILE_PICTURE_DIR = 'profile_pictures'
+PREVIEW_DIR = 'previews'
+
+# Served inline; every other type is sent as a download so an uploaded
+# HTML or SVG file never runs on the app's origin.
+_INLINE_TYPES = re.compile(r'^(image/(?!svg)|video/|audio/|application/pdf$|text/plain$)')
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """The inclusive ``(start, end)`` byte span a ``Range`` header asks for.
+
+    Returns None when the whole file should be sent: no header, another
+    unit, or several ranges, all of which a server may answer with 200.
+    Raises ``RangeNotSatisfiable`` when the range starts past the end.
+    """
+    match = _RANGE.match((header or '').replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # Suffix range: the final ``last`` bytes.
+        length = int(last)
+        if not length or not size:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+class _FileRange:
+    """Read at most ``length`` bytes of ``fh`` from its current position.
+
+    ``fileno`` and ``tell`` pass through, so a WSGI ``file_wrapper`` can
+    still sendfile() the span, bounded by Content-Length.
+    """
+
+    def __init__(self, fh, length):
+        self._fh = fh
+        self._remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._fh.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self._fh.fileno()
+
+    def tell(self):
+        return self._fh.tell()
+
+    def close(self):
+        self._fh.close()
+
+
+def _authenticated_user(request):
+    authenticators = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    drf_request = Request(request, authenticators=authenticators)
+    try:
+        return drf_request.user
+    except AuthenticationFailed:
+        # An expired access cookie is no different from none at all.
+        return AnonymousUser()
+
+
+def visible_attachments(user):
+    """TicketAttachments ``user`` may download."""
+    from django.contrib.auth import get_user_model
+
+    from .models import TicketAttachment
+
+    User = get_user_model()
+    if user.role in (User.ROLE_ADMIN, User.ROLE_SUPERADMIN):
+        return TicketAttachment.objects.all()
+    visible = Q(is_published=True) | Q(uploaded_by=user)
+    if user.role == User.ROLE_SALES:
+        visible |= Q(ticket__created_by=user)
+    elif user.role == User.ROLE_EMPLOYEE:
+        visible |= Q(ticket__assigned_to=user)
+    return TicketAttachment.objects.filter(visible)
+
+
+def authorize(user, name):
+    """The file name to present ``name`` under if ``user`` may read it, else None."""
+    parts = name.split('/')
+    basename = parts[-1]
+    if parts[0] == PROFILE_PICTURE_DIR:
+        return basename
+    if parts[0] == ATTACHMENT_DIR:
+        # Deduplicated files are shared; any visible attachment will do.
+        match = visible_attachments(user).filter(file=name).values_list('original_name', flat=True).first()
+        return None if match is None else (match or basename)
+    if parts[0] == PREVIEW_DIR and len(parts) == 5:
+        # previews/<kind>/<sha256[:2]>/<sha256>/<spec>.<ext>
+        kind, digest = parts[1], parts[3]
+        if kind == 'avatars':
+            return basename
+        if kind == 'attachments' and visible_attachments(user).filter(content_sha256=digest).exists():
+            return basename
+    return None
+
+
+def _content_headers(name, filename):
+    content_type, encoding = mimetypes.guess_type(name)
+    if encoding or not content_type:
+        content_type = 'application/octet-stream'
+    inline = bool(_INLINE_TYPES.match(content_type))
+    return {
+        'Content-Type': content_type,
+        'Content-Disposition': content_disposition_header(not inline, filename),
+    }
+
+
+def _offload(name, path, headers):
+    response = HttpResponse(headers={**headers, 'Cache-Control': CACHE_CONTROL})
+    if settings.MEDIA_OFFLOAD == OFFLOAD_ACCEL_REDIRECT:
+        response['X-Accel-Redirect'] = quote(settings.MEDIA_OFFLOAD_PREFIX.rstrip('/') + '/' + name)
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+def _if_range_matches(request, etag, last_modified):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def _stream(request, path, info, headers):
+    etag = f'"{info.st_mtime_ns:x}-{info.st_size:x}"'
+    last_modified = int(info.st_mtime)
+    headers = {
+        **headers,
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': CACHE_CONTROL,
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+    }
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=last_modified, response=HttpResponse(headers=headers),
+    )
+    if conditional.status_code != 200:
+        return conditional
+
+    size = info.st_size
+    span = None
+    if _if_range_matches(request, etag, last_modified):
+        try:
+            span = parse_range(request.headers.get('Range'), size)
+        except RangeNotSatisfiable:
+            return HttpResponse(status=416, headers={'Content-Range': f'bytes */{size}', 'Accept-Ranges': 'bytes'})
+
+    start, end = span or (0, size - 1)
+    length = end - start + 1 if size else 0
+    if span:
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    status = 206 if span else 200
+
+    if request.method == 'HEAD':
+        return HttpResponse(status=status, headers={**headers, 'Content-Length': length})
+    fh = open(path, 'rb')
+    fh.seek(start)
+    content_type = headers.pop('Content-Type')
+    if is_asgi(request):
+        # FileResponse's body is a synchronous iterator, which ASGIHandler
+        # would read to the end before sending; pull the blocks instead.
+        body = stream_body(request, read_blocks(_FileRange(fh, length), STREAM_BLOCK_SIZE))
+        response = StreamingHttpResponse(body, status=status, headers=headers, content_type=content_type)
+    else:
+        response = FileResponse(_FileRange(fh, length), status=status, headers=headers, content_type=content_type)
+        response.block_size = STREAM_BLOCK_SIZE
+    response['Content-Length'] = length
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve ``MEDIA_ROOT/<path>`` to users allowed to see it."""
+    name = posixpath.normpath(path).lstrip('/')
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, name)
+    except SuspiciousFileOperation:
+        raise Http404
+    user = _authenticated_user(request)
+    if not user.is_authenticated:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    filename = authorize(user, name)
+    if filename is None:
+        raise Http404
+
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    headers = _content_headers(name, filename)
+    if settings.MEDIA_OFFLOAD in (OFFLOAD_ACCEL_REDIRECT, OFFLOAD_SENDFILE):
+        return _offload(name, full_path, headers)
+    return _stream(request, full_path, os.stat(full_path), headers)
@@ -0,0 +1,18 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0046_product_firmware_and_software_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StfSequence',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False)),
+                ('last_value', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0047_stfsequence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['ticket', 'channel_type', 'created_at'], name='tickets_mes_ticket__51a5cd_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_stats(apps, schema_editor):
+    # The rollup rules are plain constants on the model, safe to reuse here.
+    from tickets.models.stats import TicketStatsSnapshot as CurrentSnapshot
+
+    Ticket = apps.get_model('tickets', 'Ticket')
+    TicketStatsSnapshot = apps.get_model('tickets', 'TicketStatsSnapshot')
+    rows = CurrentSnapshot.compute(Ticket.objects.all())
+    TicketStatsSnapshot.objects.bulk_create(
+        [
+            TicketStatsSnapshot(key=key, scope=scope, user_id=user_id, day=day, **counts)
+            for key, ((scope, user_id, day), counts) in rows.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0048_message_history_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketStatsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='scope:user:day', max_length=80, unique=True)),
+                ('scope', models.CharField(choices=[('all', 'All tickets'), ('creator', 'Created by user'), ('assignee', 'Assigned to user')], max_length=10)),
+                ('day', models.DateField(blank=True, help_text='Ticket creation day; empty for the all-time row', null=True)),
+                ('total', models.IntegerField(default=0)),
+                ('status_open', models.IntegerField(default=0)),
+                ('status_in_progress', models.IntegerField(default=0)),
+                ('status_closed', models.IntegerField(default=0)),
+                ('status_escalated', models.IntegerField(default=0)),
+                ('status_escalated_external', models.IntegerField(default=0)),
+                ('status_pending_closure', models.IntegerField(default=0)),
+                ('status_for_observation', models.IntegerField(default=0)),
+                ('status_unresolved', models.IntegerField(default=0)),
+                ('priority_low', models.IntegerField(default=0)),
+                ('priority_medium', models.IntegerField(default=0)),
+                ('priority_high', models.IntegerField(default=0)),
+                ('priority_critical', models.IntegerField(default=0)),
+                ('resolved_count', models.IntegerField(default=0)),
+                ('resolution_seconds', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Ticket Stats Snapshot',
+                'verbose_name_plural': 'Ticket Stats Snapshots',
+            },
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0049_ticket_stats_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RetentionPurgeRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target', models.CharField(db_index=True, max_length=30)),
+                ('cutoff', models.DateTimeField(help_text='Rows older than this are deleted.')),
+                ('first_pk', models.BigIntegerField()),
+                ('last_pk', models.BigIntegerField(help_text='Highest primary key processed so far.')),
+                ('end_pk', models.BigIntegerField(help_text='Highest expired primary key when the run started.')),
+                ('deleted', models.PositiveBigIntegerField(default=0)),
+                ('batches', models.PositiveIntegerField(default=0)),
+                ('elapsed_seconds', models.FloatField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Retention Purge Run',
+                'verbose_name_plural': 'Retention Purge Runs',
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0050_retention_purge_run'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='retentionpolicy',
+            name='audit_log_archive_days',
+            field=models.PositiveIntegerField(default=0, help_text='Move audit logs older than this many days to compressed archive files. 0 means never archive.'),
+        ),
+        migrations.CreateModel(
+            name='AuditArchiveSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(help_text='Path relative to MEDIA_ROOT', max_length=255, unique=True)),
+                ('compression', models.CharField(max_length=10)),
+                ('first_pk', models.BigIntegerField()),
+                ('last_pk', models.BigIntegerField()),
+                ('first_timestamp', models.DateTimeField(db_index=True)),
+                ('last_timestamp', models.DateTimeField(db_index=True)),
+                ('row_count', models.PositiveIntegerField()),
+                ('size_bytes', models.PositiveBigIntegerField()),
+                ('entities', models.JSONField(default=list)),
+                ('actions', models.JSONField(default=list)),
+                ('actor_ids', models.JSONField(default=list, help_text='Actor ids in the segment; null stands for system entries')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-last_timestamp'],
+            },
+        ),
+    ]
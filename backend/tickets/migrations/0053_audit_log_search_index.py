@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:40
+
+from django.db import migrations
+
+
+def install_search(apps, schema_editor):
+    # Index DDL lives with the query that must match it.
+    from tickets import audit_search
+
+    if audit_search.install(schema_editor.connection):
+        audit_search.rebuild(schema_editor.connection)
+
+
+def uninstall_search(apps, schema_editor):
+    from tickets import audit_search
+
+    audit_search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0052_auditlog_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:05
+
+from django.db import migrations, models
+
+
+def populate_buckets(apps, schema_editor):
+    # The bucketing rules are plain methods on the model, safe to reuse here.
+    from tickets.models.stats import AuditSummaryBucket as CurrentBucket
+
+    AuditLog = apps.get_model('tickets', 'AuditLog')
+    AuditSummaryBucket = apps.get_model('tickets', 'AuditSummaryBucket')
+    rows = CurrentBucket.compute(AuditLog.objects.all(), role_field='actor__role')
+    AuditSummaryBucket.objects.bulk_create(
+        [
+            AuditSummaryBucket(key=key, hour=hour, entity=entity, action=action, actor_role=actor_role, count=count)
+            for key, ((hour, entity, action, actor_role), count) in rows.items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0053_audit_log_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditSummaryBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text='hour:entity:action:role', max_length=100, unique=True)),
+                ('hour', models.DateTimeField(blank=True, db_index=True, help_text='UTC hour; empty for the all-time row', null=True)),
+                ('entity', models.CharField(max_length=30)),
+                ('action', models.CharField(max_length=20)),
+                ('actor_role', models.CharField(blank=True, default='', max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Audit Summary Bucket',
+                'verbose_name_plural': 'Audit Summary Buckets',
+            },
+        ),
+        migrations.RunPython(populate_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def reinstall_search(apps, schema_editor):
+    # SQLite rebuilds the table to add a NOT NULL column, which drops the
+    # full-text triggers on it; the FTS rows keep their rowids and stay valid.
+    from tickets import audit_search
+
+    audit_search.install(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0054_audit_summary_bucket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditlog',
+            name='actor_role',
+            field=models.CharField(blank=True, default='', help_text='Snapshot of actor role at the time of the action; empty for system entries', max_length=20),
+        ),
+        migrations.RunPython(reinstall_search, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:30
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+BATCH_SIZE = 5000
+
+
+def backfill_actor_role(apps, schema_editor):
+    """Copy each actor's current role onto their audit rows, one pk range per transaction."""
+    AuditLog = apps.get_model('tickets', 'AuditLog')
+    User = apps.get_model('users', 'User')
+    bounds = AuditLog.objects.aggregate(first=models.Min('pk'), last=models.Max('pk'))
+    if bounds['first'] is None:
+        return
+    role = Subquery(User.objects.filter(pk=OuterRef('actor_id')).values('role')[:1])
+    for start in range(bounds['first'], bounds['last'] + 1, BATCH_SIZE):
+        AuditLog.objects.filter(
+            pk__gte=start, pk__lt=start + BATCH_SIZE, actor__isnull=False, actor_role='',
+        ).update(actor_role=role)
+
+
+class Migration(migrations.Migration):
+    # Each batch commits on its own, so a large table is never locked for
+    # the whole backfill and an interrupted run resumes where it stopped.
+    atomic = False
+
+    dependencies = [
+        ('tickets', '0055_auditlog_actor_role'),
+        ('users', '0010_alter_user_role'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_actor_role, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['actor_role', '-timestamp'], name='tickets_aud_actor_r_d76ed3_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:05
+
+from django.db import migrations
+
+
+def install_search(apps, schema_editor):
+    # Index DDL lives with the query that must match it.
+    from tickets import ticket_search
+
+    if ticket_search.install(schema_editor.connection):
+        ticket_search.rebuild(schema_editor.connection)
+
+
+def uninstall_search(apps, schema_editor):
+    from tickets import ticket_search
+
+    ticket_search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0056_backfill_auditlog_actor_role'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0059_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticketattachment',
+            name='content_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='ticketattachment',
+            name='previews',
+            field=models.JSONField(blank=True, default=dict, help_text='Generated thumbnails (see tickets.previews)'),
+        ),
+    ]
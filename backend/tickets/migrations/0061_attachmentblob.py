@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0060_ticketattachment_previews'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttachmentBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('name', models.CharField(help_text='Storage name of the content-addressed file', max_length=255)),
+                ('size', models.PositiveBigIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0, help_text='TicketAttachments pointing at this blob')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ticketattachment',
+            name='original_name',
+            field=models.CharField(blank=True, default='', help_text='File name as uploaded', max_length=255),
+        ),
+        migrations.AlterField(
+            model_name='ticketattachment',
+            name='file',
+            field=models.FileField(max_length=255, upload_to='ticket_attachments/%Y/%m/%d/'),
+        ),
+        migrations.AddField(
+            model_name='ticketattachment',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='attachments', to='tickets.attachmentblob'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0061_attachmentblob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditarchivesegment',
+            name='actor_roles',
+            field=models.JSONField(blank=True, help_text="Actor roles in the segment ('' for system entries); null for segments written before roles were indexed", null=True),
+        ),
+    ]
@@ -1,23 +1,25 @@
 from .lookup import TypeOfService, Category
 from .client import Client
 from .product import Product
-from .ticket import Ticket, TicketAttachment, TicketTask
+from .ticket import Ticket, AttachmentBlob, TicketAttachment, ChunkedUpload, TicketTask, StfSequence
 from .messaging import AssignmentSession, Message, MessageReaction, MessageReadReceipt
 from .lifecycle import EscalationLog
-from .audit import AuditLog
+from .audit import AuditLog, AuditArchiveSegment
 from .support import CallLog, FeedbackRating
 from .notification import Notification
-from .config import RetentionPolicy, Announcement
+from .config import RetentionPolicy, RetentionPurgeRun, Announcement
+from .stats import TicketStatsSnapshot, AuditSummaryBucket
 
 __all__ = [
     'TypeOfService', 'Category',
     'Client',
     'Product',
-    'Ticket', 'TicketAttachment', 'TicketTask',
+    'Ticket', 'AttachmentBlob', 'TicketAttachment', 'ChunkedUpload', 'TicketTask', 'StfSequence',
     'AssignmentSession', 'Message', 'MessageReaction', 'MessageReadReceipt',
     'EscalationLog',
-    'AuditLog',
+    'AuditLog', 'AuditArchiveSegment',
     'CallLog', 'FeedbackRating',
     'Notification',
-    'RetentionPolicy', 'Announcement',
+    'RetentionPolicy', 'RetentionPurgeRun', 'Announcement',
+    'TicketStatsSnapshot', 'AuditSummaryBucket',
 ]
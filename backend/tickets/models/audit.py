@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 
 class AuditLog(models.Model):
@@ -61,7 +62,8 @@ class AuditLog(models.Model):
         (ACTION_LINK, 'Link Tickets'),
     ]
 
-    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Set when the entry is logged, not when a buffered batch is inserted.
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
     entity = models.CharField(max_length=30, choices=ENTITY_CHOICES, db_index=True)
     entity_id = models.PositiveIntegerField(null=True, blank=True)
     action = models.CharField(max_length=20, choices=ACTION_CHOICES, db_index=True)
@@ -71,6 +73,10 @@ class AuditLog(models.Model):
         on_delete=models.SET_NULL, related_name='audit_logs',
     )
     actor_email = models.EmailField(blank=True, default='', help_text='Snapshot of actor email at the time of the action')
+    actor_role = models.CharField(
+        max_length=20, blank=True, default='',
+        help_text='Snapshot of actor role at the time of the action; empty for system entries',
+    )
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     changes = models.JSONField(null=True, blank=True, help_text='JSON diff of changed fields')
 
@@ -79,6 +85,7 @@ class AuditLog(models.Model):
         indexes = [
             models.Index(fields=['-timestamp', 'entity']),
             models.Index(fields=['actor', '-timestamp']),
+            models.Index(fields=['actor_role', '-timestamp']),
         ]
 
     def __str__(self):
@@ -86,14 +93,52 @@ class AuditLog(models.Model):
 
     @classmethod
     def log(cls, *, entity, entity_id=None, action, activity, actor=None, ip_address=None, changes=None):
-        """Helper to create an audit log entry."""
-        return cls.objects.create(
+        """Helper to create an audit log entry.
+
+        Inside an ``audit_batch()`` scope (every request has one) the entry is
+        buffered and inserted with the rest of the batch; see tickets.audit_writer.
+        """
+        from ..audit_writer import record
+
+        return record(cls(
             entity=entity,
             entity_id=entity_id,
             action=action,
             activity=activity,
             actor=actor,
             actor_email=getattr(actor, 'email', '') if actor else '',
+            actor_role=getattr(actor, 'role', '') if actor else '',
             ip_address=ip_address,
             changes=changes,
-        )
+        ))
+
+
+class AuditArchiveSegment(models.Model):
+    """One append-only, compressed JSONL file of archived audit logs (see tickets.archive).
+
+    The row is the segment's index: its time and primary-key range plus the
+    entities, actions, actors and actor roles it contains, so searches can
+    skip segments without opening them.
+    """
+    path = models.CharField(max_length=255, unique=True, help_text='Path relative to MEDIA_ROOT')
+    compression = models.CharField(max_length=10)
+    first_pk = models.BigIntegerField()
+    last_pk = models.BigIntegerField()
+    first_timestamp = models.DateTimeField(db_index=True)
+    last_timestamp = models.DateTimeField(db_index=True)
+    row_count = models.PositiveIntegerField()
+    size_bytes = models.PositiveBigIntegerField()
+    entities = models.JSONField(default=list)
+    actions = models.JSONField(default=list)
+    actor_ids = models.JSONField(default=list, help_text='Actor ids in the segment; null stands for system entries')
+    actor_roles = models.JSONField(
+        null=True, blank=True,
+        help_text="Actor roles in the segment ('' for system entries); null for segments written before roles were indexed",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-last_timestamp']
+
+    def __str__(self):
+        return f"{self.path} ({self.row_count} logs, {self.first_timestamp:%Y-%m-%d} to {self.last_timestamp:%Y-%m-%d})"
@@ -11,6 +11,10 @@ class RetentionPolicy(models.Model):
         default=365,
         help_text='Number of days to retain audit logs. 0 means keep forever.',
     )
+    audit_log_archive_days = models.PositiveIntegerField(
+        default=0,
+        help_text='Move audit logs older than this many days to compressed archive files. 0 means never archive.',
+    )
     call_log_retention_days = models.PositiveIntegerField(
         default=365,
         help_text='Number of days to retain call logs. 0 means keep forever.',
@@ -44,6 +48,39 @@ class RetentionPolicy(models.Model):
         return obj
 
 
+class RetentionPurgeRun(models.Model):
+    """Progress of one retention purge over one log table (see tickets.retention).
+
+    The cutoff and primary-key range are fixed when the run starts and
+    ``last_pk`` advances with every committed batch, so an interrupted run
+    resumes where it stopped. Finished runs double as a purge history.
+    """
+    target = models.CharField(max_length=30, db_index=True)
+    cutoff = models.DateTimeField(help_text='Rows older than this are deleted.')
+    first_pk = models.BigIntegerField()
+    last_pk = models.BigIntegerField(help_text='Highest primary key processed so far.')
+    end_pk = models.BigIntegerField(help_text='Highest expired primary key when the run started.')
+    deleted = models.PositiveBigIntegerField(default=0)
+    batches = models.PositiveIntegerField(default=0)
+    elapsed_seconds = models.FloatField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-started_at']
+        verbose_name = 'Retention Purge Run'
+        verbose_name_plural = 'Retention Purge Runs'
+
+    def __str__(self):
+        state = 'finished' if self.finished_at else f'at pk {self.last_pk}/{self.end_pk}'
+        return f"Purge {self.target} before {self.cutoff:%Y-%m-%d}: {self.deleted} deleted, {state}"
+
+    @property
+    def rows_per_second(self):
+        return self.deleted / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
 class Announcement(models.Model):
     ANNOUNCEMENT_TYPE_CHOICES = [
         ('info', 'Info'),
@@ -36,6 +36,9 @@ class Message(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['ticket', 'channel_type', 'created_at']),
+        ]
 
     def __str__(self):
         return f"Msg #{self.id} by {self.sender.username} on {self.ticket.stf_no}"
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from ..dispatch import get_dispatcher
 from .ticket import Ticket
 
 
@@ -55,35 +56,58 @@ class Notification(models.Model):
     @classmethod
     def notify(cls, *, recipient, notification_type, title, message='', ticket=None):
         """Create a notification and push it via WebSocket channel layer."""
-        notif = cls.objects.create(
-            recipient=recipient,
+        return cls.notify_many(
+            [recipient],
             notification_type=notification_type,
             title=title,
             message=message,
             ticket=ticket,
-        )
-        # Push real-time via channel layer
-        try:
-            from channels.layers import get_channel_layer
-            from asgiref.sync import async_to_sync
-            channel_layer = get_channel_layer()
-            if channel_layer:
-                async_to_sync(channel_layer.group_send)(
-                    f'notifications_{recipient.id}',
-                    {
-                        'type': 'send_notification',
-                        'notification': {
-                            'id': notif.id,
-                            'notification_type': notif.notification_type,
-                            'title': notif.title,
-                            'message': notif.message,
-                            'ticket_id': notif.ticket_id,
-                            'ticket_stf_no': notif.ticket.stf_no if notif.ticket else None,
-                            'is_read': notif.is_read,
-                            'created_at': notif.created_at.isoformat(),
-                        },
-                    },
-                )
-        except Exception:
-            pass  # Don't break if channel layer isn't available
-        return notif
+        )[0]
+
+    @classmethod
+    def notify_many(cls, recipients, *, notification_type, title, message='', ticket=None):
+        """Create the same notification for many users at once.
+
+        ``recipients`` may hold users or user ids; duplicates are dropped. All
+        rows are written with one bulk insert; the real-time pushes are queued
+        for after commit (see tickets.dispatch), so cost does not grow with
+        the number of recipients.
+        """
+        recipient_ids = list(dict.fromkeys(getattr(r, 'pk', r) for r in recipients if r is not None))
+        if not recipient_ids:
+            return []
+        notifs = cls.objects.bulk_create([
+            cls(
+                recipient_id=recipient_id,
+                notification_type=notification_type,
+                title=title,
+                message=message,
+                ticket=ticket,
+            )
+            for recipient_id in recipient_ids
+        ])
+        ticket_stf_no = ticket.stf_no if ticket else None
+        get_dispatcher().enqueue([
+            (f'notifications_{notif.recipient_id}', {
+                'type': 'send_notification',
+                'notification': notif.to_payload(ticket_stf_no),
+            })
+            for notif in notifs
+        ])
+        return notifs
+
+    def to_payload(self, ticket_stf_no=None):
+        """WebSocket payload for this notification (see NotificationConsumer)."""
+        if ticket_stf_no is None and self.ticket_id:
+            ticket_stf_no = self.ticket.stf_no
+        return {
+            'id': self.id,
+            'notification_type': self.notification_type,
+            'title': self.title,
+            'message': self.message,
+            'ticket_id': self.ticket_id,
+            'ticket_stf_no': ticket_stf_no,
+            'is_read': self.is_read,
+            'created_at': self.created_at.isoformat(),
+        }
+
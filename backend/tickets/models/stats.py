@@ -0,0 +1,393 @@
+import datetime
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .ticket import Ticket
+
+
+class TicketStatsSnapshot(models.Model):
+    """Pre-aggregated ticket counts behind the dashboard stats endpoint.
+
+    One row per scope (all tickets, a creator's tickets, an assignee's
+    tickets) for all time (``day`` is null) and per creation day. Rows are
+    adjusted incrementally whenever a ticket is saved or deleted (see
+    tickets.signals), so reading a dashboard is a single-row lookup.
+    ``rebuild()`` recomputes everything and ``find_drift()`` reports drift.
+    """
+
+    SCOPE_ALL = 'all'
+    SCOPE_CREATOR = 'creator'
+    SCOPE_ASSIGNEE = 'assignee'
+    SCOPE_CHOICES = [
+        (SCOPE_ALL, 'All tickets'),
+        (SCOPE_CREATOR, 'Created by user'),
+        (SCOPE_ASSIGNEE, 'Assigned to user'),
+    ]
+
+    # Status / priority values and the counter column that holds them
+    STATUS_COLUMNS = {status: f'status_{status}' for status, _ in Ticket.STATUS_CHOICES}
+    PRIORITY_COLUMNS = {priority: f'priority_{priority}' for priority, _ in Ticket.PRIORITY_CHOICES}
+
+    key = models.CharField(max_length=80, unique=True, help_text='scope:user:day')
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    # No DB constraint: rows for a deleted user are left behind (and dropped
+    # by the next rebuild) rather than racing the ticket cascade that adjusts them.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True,
+        on_delete=models.DO_NOTHING, db_constraint=False, related_name='+',
+    )
+    day = models.DateField(null=True, blank=True, help_text='Ticket creation day; empty for the all-time row')
+
+    total = models.IntegerField(default=0)
+    status_open = models.IntegerField(default=0)
+    status_in_progress = models.IntegerField(default=0)
+    status_closed = models.IntegerField(default=0)
+    status_escalated = models.IntegerField(default=0)
+    status_escalated_external = models.IntegerField(default=0)
+    status_pending_closure = models.IntegerField(default=0)
+    status_for_observation = models.IntegerField(default=0)
+    status_unresolved = models.IntegerField(default=0)
+    priority_low = models.IntegerField(default=0)
+    priority_medium = models.IntegerField(default=0)
+    priority_high = models.IntegerField(default=0)
+    priority_critical = models.IntegerField(default=0)
+    # Closed tickets with both time_in and time_out, and their summed duration
+    resolved_count = models.IntegerField(default=0)
+    resolution_seconds = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    COUNTER_FIELDS = (
+        ['total'] + list(STATUS_COLUMNS.values()) + list(PRIORITY_COLUMNS.values())
+        + ['resolved_count', 'resolution_seconds']
+    )
+
+    class Meta:
+        verbose_name = 'Ticket Stats Snapshot'
+        verbose_name_plural = 'Ticket Stats Snapshots'
+
+    def __str__(self):
+        return f"Ticket stats [{self.key}]: {self.total}"
+
+    # ── Keys ──
+
+    @staticmethod
+    def make_key(scope, user_id=None, day=None):
+        return f"{scope}:{user_id or ''}:{day.isoformat() if day else ''}"
+
+    @classmethod
+    def key_for_user(cls, user):
+        """All-time row a user's dashboard reads (mirrors TicketViewSet scoping)."""
+        from users.models import User
+        if user.role in (User.ROLE_ADMIN, User.ROLE_SUPERADMIN):
+            return cls.make_key(cls.SCOPE_ALL)
+        if user.role == User.ROLE_SALES:
+            return cls.make_key(cls.SCOPE_CREATOR, user.id)
+        if user.role == User.ROLE_EMPLOYEE:
+            return cls.make_key(cls.SCOPE_ASSIGNEE, user.id)
+        return None
+
+    # ── Contributions ──
+
+    STATE_FIELDS = ('created_by_id', 'assigned_to_id', 'status', 'priority', 'time_in', 'time_out', 'created_at')
+
+    @classmethod
+    def ticket_state(cls, ticket):
+        """The fields of a ticket the rollup depends on."""
+        return {name: getattr(ticket, name) for name in cls.STATE_FIELDS}
+
+    @classmethod
+    def contributions(cls, state):
+        """Map row key -> ((scope, user_id, day), Counter of column deltas) for one ticket."""
+        counts = Counter(total=1)
+        column = cls.STATUS_COLUMNS.get(state['status'])
+        if column:
+            counts[column] += 1
+        column = cls.PRIORITY_COLUMNS.get(state['priority'])
+        if column:
+            counts[column] += 1
+        if state['status'] == Ticket.STATUS_CLOSED and state['time_in'] and state['time_out']:
+            counts['resolved_count'] += 1
+            counts['resolution_seconds'] += (state['time_out'] - state['time_in']).total_seconds()
+
+        created = state['created_at'] or timezone.now()
+        day = timezone.localdate(created) if timezone.is_aware(created) else created.date()
+        scopes = [(cls.SCOPE_ALL, None)]
+        if state['created_by_id']:
+            scopes.append((cls.SCOPE_CREATOR, state['created_by_id']))
+        if state['assigned_to_id']:
+            scopes.append((cls.SCOPE_ASSIGNEE, state['assigned_to_id']))
+        return {
+            cls.make_key(scope, user_id, bucket): ((scope, user_id, bucket), counts)
+            for scope, user_id in scopes
+            for bucket in (None, day)
+        }
+
+    @classmethod
+    def apply_change(cls, old_state=None, new_state=None):
+        """Move a ticket's contribution from ``old_state`` to ``new_state``.
+
+        Either side may be None (created / deleted). Each touched row gets one
+        ``F()`` UPDATE, so concurrent changes never lose increments.
+        """
+        deltas = defaultdict(Counter)
+        identities = {}
+        for state, sign in ((old_state, -1), (new_state, 1)):
+            if state is None:
+                continue
+            for key, (identity, counts) in cls.contributions(state).items():
+                identities[key] = identity
+                for column, value in counts.items():
+                    deltas[key][column] += sign * value
+
+        with transaction.atomic():
+            for key, delta in deltas.items():
+                changes = {column: value for column, value in delta.items() if value}
+                if not changes:
+                    continue
+                updates = {column: F(column) + value for column, value in changes.items()}
+                if cls.objects.filter(key=key).update(**updates):
+                    continue
+                scope, user_id, day = identities[key]
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(key=key, scope=scope, user_id=user_id, day=day, **changes)
+                except IntegrityError:
+                    # Another writer created the row first.
+                    cls.objects.filter(key=key).update(**updates)
+
+    # ── Full recompute ──
+
+    @classmethod
+    def compute(cls, tickets=None):
+        """Recompute every row from the ticket table: key -> (identity, Counter)."""
+        if tickets is None:
+            tickets = Ticket.objects.all()
+        rows = {}
+        for state in tickets.order_by().values(*cls.STATE_FIELDS).iterator(chunk_size=2000):
+            for key, (identity, counts) in cls.contributions(state).items():
+                if key in rows:
+                    rows[key][1].update(counts)
+                else:
+                    rows[key] = (identity, Counter(counts))
+        return rows
+
+    @classmethod
+    def rebuild(cls):
+        """Replace every snapshot row with freshly computed values. Returns the row count."""
+        rows = cls.compute()
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(
+                [
+                    cls(key=key, scope=scope, user_id=user_id, day=day, **counts)
+                    for key, ((scope, user_id, day), counts) in rows.items()
+                ],
+                batch_size=500,
+            )
+        return len(rows)
+
+    @classmethod
+    def find_drift(cls, tolerance=1e-3):
+        """Compare stored rows with a fresh recompute.
+
+        Returns a list of ``(key, column, stored, expected)`` mismatches; rows
+        that should not exist are reported with expected 0.
+        """
+        expected = cls.compute()
+        mismatches = []
+        stored_keys = set()
+        for row in cls.objects.all().iterator():
+            stored_keys.add(row.key)
+            counts = expected.get(row.key, (None, Counter()))[1]
+            for column in cls.COUNTER_FIELDS:
+                stored, want = getattr(row, column), counts.get(column, 0)
+                if abs(stored - want) > tolerance:
+                    mismatches.append((row.key, column, stored, want))
+        for key, (_, counts) in expected.items():
+            if key not in stored_keys:
+                mismatches.extend((key, column, 0, value) for column, value in counts.items() if value)
+        return mismatches
+
+    # ── Reading ──
+
+    def as_stats(self):
+        """Response body for TicketViewSet.stats."""
+        by_status = {
+            status: getattr(self, column)
+            for status, column in self.STATUS_COLUMNS.items() if getattr(self, column)
+        }
+        by_priority = {
+            priority: getattr(self, column)
+            for priority, column in self.PRIORITY_COLUMNS.items() if getattr(self, column)
+        }
+        avg_resolution = self.resolution_seconds / self.resolved_count / 3600 if self.resolved_count else 0
+        return {
+            'total': self.total,
+            'by_status': by_status,
+            'by_priority': by_priority,
+            'open': self.status_open,
+            'in_progress': self.status_in_progress,
+            'closed': self.status_closed,
+            'escalated': self.status_escalated + self.status_escalated_external,
+            'pending': self.status_pending_closure,
+            'avg_resolution_time': avg_resolution,
+        }
+
+
+class AuditSummaryBucket(models.Model):
+    """Pre-aggregated audit log counts behind AuditLogViewSet.summary.
+
+    One row per entity, action and actor role for each hour, plus an
+    all-time row (``hour`` is null) for each combination. Rows are adjusted
+    whenever audit logs are written (tickets.audit_writer) or deleted by the
+    retention purge and the archiver, so the summary reads a few hundred
+    rows instead of scanning the audit table. ``actor_role`` comes from
+    AuditLog.actor_role; empty for system entries.
+    """
+
+    key = models.CharField(max_length=100, unique=True, help_text='hour:entity:action:role')
+    hour = models.DateTimeField(null=True, blank=True, db_index=True, help_text='UTC hour; empty for the all-time row')
+    entity = models.CharField(max_length=30)
+    action = models.CharField(max_length=20)
+    actor_role = models.CharField(max_length=20, blank=True, default='')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Audit Summary Bucket'
+        verbose_name_plural = 'Audit Summary Buckets'
+
+    def __str__(self):
+        return f"Audit summary [{self.key}]: {self.count}"
+
+    @staticmethod
+    def make_key(hour, entity, action, actor_role):
+        return f"{hour.strftime('%Y%m%d%H') if hour else ''}:{entity}:{action}:{actor_role or ''}"
+
+    @staticmethod
+    def hour_of(moment):
+        return moment.astimezone(datetime.timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+    @classmethod
+    def contributions(cls, rows):
+        """Map key -> (identity, count) for ``(timestamp, entity, action, actor_role)`` rows."""
+        counts = Counter()
+        identities = {}
+        for timestamp, entity, action, actor_role in rows:
+            actor_role = actor_role or ''
+            for hour in (None, cls.hour_of(timestamp)):
+                key = cls.make_key(hour, entity, action, actor_role)
+                identities[key] = (hour, entity, action, actor_role)
+                counts[key] += 1
+        return {key: (identities[key], count) for key, count in counts.items()}
+
+    @classmethod
+    def _apply(cls, contributions, sign):
+        with transaction.atomic():
+            for key, ((hour, entity, action, actor_role), count) in contributions.items():
+                delta = sign * count
+                if cls.objects.filter(key=key).update(count=F('count') + delta):
+                    continue
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(
+                            key=key, hour=hour, entity=entity, action=action, actor_role=actor_role, count=delta,
+                        )
+                except IntegrityError:
+                    # Another writer created the row first.
+                    cls.objects.filter(key=key).update(count=F('count') + delta)
+
+    @classmethod
+    def add(cls, entries):
+        """Count newly saved AuditLog instances."""
+        rows = [(entry.timestamp, entry.entity, entry.action, entry.actor_role) for entry in entries]
+        cls._apply(cls.contributions(rows), 1)
+
+    @classmethod
+    def remove(cls, queryset):
+        """Uncount the AuditLog rows in ``queryset``; call before deleting them."""
+        rows = queryset.order_by().values_list('timestamp', 'entity', 'action', 'actor_role')
+        cls._apply(cls.contributions(rows.iterator(chunk_size=2000)), -1)
+
+    # ── Full recompute ──
+
+    @classmethod
+    def compute(cls, logs=None, role_field='actor_role'):
+        """Recompute every row from the audit table: key -> (identity, count).
+
+        ``logs`` and ``role_field`` let migrations pass a historical model.
+        """
+        from .audit import AuditLog
+
+        if logs is None:
+            logs = AuditLog.objects.all()
+        rows = {}
+        grouped = (
+            logs.order_by()
+            .annotate(bucket=TruncHour('timestamp', tzinfo=datetime.timezone.utc))
+            .values_list('bucket', 'entity', 'action', role_field)
+            .annotate(n=Count('id'))
+        )
+        for hour, entity, action, actor_role, n in grouped.iterator():
+            actor_role = actor_role or ''
+            for bucket in (None, hour):
+                key = cls.make_key(bucket, entity, action, actor_role)
+                identity, count = rows.get(key, ((bucket, entity, action, actor_role), 0))
+                rows[key] = (identity, count + n)
+        return rows
+
+    @classmethod
+    def rebuild(cls):
+        """Replace every bucket with freshly computed counts. Returns the row count."""
+        rows = cls.compute()
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(
+                [
+                    cls(key=key, hour=hour, entity=entity, action=action, actor_role=actor_role, count=count)
+                    for key, ((hour, entity, action, actor_role), count) in rows.items()
+                ],
+                batch_size=500,
+            )
+        return len(rows)
+
+    @classmethod
+    def find_drift(cls):
+        """Return ``(key, stored, expected)`` for every bucket that differs from a recompute."""
+        expected = {key: count for key, (_, count) in cls.compute().items()}
+        stored = dict(cls.objects.exclude(count=0).values_list('key', 'count'))
+        return [
+            (key, stored.get(key, 0), expected.get(key, 0))
+            for key in sorted(stored.keys() | expected.keys())
+            if stored.get(key, 0) != expected.get(key, 0)
+        ]
+
+    # ── Reading ──
+
+    @classmethod
+    def summary(cls, roles, now=None, hours=24):
+        """Totals, per-entity and per-action counts and an hourly trend for actor ``roles``."""
+        now = now or timezone.now()
+        rows = cls.objects.filter(actor_role__in=roles)
+        all_time = rows.filter(hour__isnull=True)
+        start = cls.hour_of(now) - datetime.timedelta(hours=hours - 1)
+        hourly = dict(
+            rows.filter(hour__gte=start).values_list('hour').annotate(n=Sum('count')).values_list('hour', 'n')
+        )
+        trend = [start + datetime.timedelta(hours=i) for i in range(hours)]
+        return {
+            'total': all_time.aggregate(n=Sum('count'))['n'] or 0,
+            'by_entity': {
+                entity: n for entity, n in
+                all_time.values_list('entity').annotate(n=Sum('count')).values_list('entity', 'n') if n
+            },
+            'by_action': {
+                action: n for action, n in
+                all_time.values_list('action').annotate(n=Sum('count')).values_list('action', 'n') if n
+            },
+            'hourly': [{'hour': hour, 'count': hourly.get(hour, 0)} for hour in trend],
+        }
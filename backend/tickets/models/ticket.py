@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.conf import settings
 from django.utils import timezone
 import datetime as dt
+import posixpath
+import uuid
 from .lookup import TypeOfService
 from .client import Client
 from .product import Product
@@ -78,6 +81,9 @@ class Ticket(models.Model):
         (CASCADE_EXTERNAL, 'External'),
     ]
 
+    # Statuses that count toward an employee's queue when assigning work.
+    ACTIVE_STATUSES = (STATUS_OPEN, STATUS_IN_PROGRESS, STATUS_ESCALATED)
+
     # ---- Original fields ----
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_OPEN)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='created_tickets', on_delete=models.CASCADE)
@@ -152,14 +158,31 @@ class Ticket(models.Model):
     # Current active assignment session (for messaging scope)
     current_session = models.ForeignKey('AssignmentSession', null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
 
+    class Meta:
+        # One index per list access path: each role scope (and the status
+        # filter) is an equality prefix followed by the list's
+        # (-created_at, id) order, so a page is read straight off the index.
+        indexes = [
+            models.Index(fields=['-created_at', 'id']),
+            models.Index(fields=['created_by', '-created_at', 'id']),
+            models.Index(fields=['assigned_to', '-created_at', 'id']),
+            models.Index(fields=['status', '-created_at', 'id']),
+            # Queue sizes for list_employees, counted from the index alone.
+            models.Index(fields=['assigned_to', 'status']),
+        ]
+
     def save(self, *args, **kwargs):
         # Coerce date to a plain date if it's a datetime
         import datetime as _dt
         if isinstance(self.date, _dt.datetime):
             self.date = self.date.date()
-        if not self.stf_no:
-            self.stf_no = self.get_next_stf_no(self.date)
-        super().save(*args, **kwargs)
+        if self.stf_no:
+            super().save(*args, **kwargs)
+            return
+        # Allocate and insert together so a failed insert gives the number back.
+        with transaction.atomic():
+            self.stf_no = self.allocate_stf_no(self.date)
+            super().save(*args, **kwargs)
 
     @property
     def sla_estimated_days(self):
@@ -192,39 +215,113 @@ class Ticket(models.Model):
         return 5
 
     @classmethod
-    def _get_stf_prefix(cls, for_date=None):
+    def _get_stf_date(cls, for_date=None):
         if isinstance(for_date, dt.datetime):
             for_date = timezone.localtime(for_date).date()
         if for_date is None:
             for_date = timezone.localdate()
-        return f"STF-MT-{for_date.strftime('%Y%m%d')}"
+        return for_date
 
     @classmethod
-    def get_next_stf_no(cls, for_date=None):
-        """Generate the next STF number for the given date using a daily sequence."""
+    def _get_stf_prefix(cls, for_date=None):
+        return f"STF-MT-{cls._get_stf_date(for_date).strftime('%Y%m%d')}"
+
+    @classmethod
+    def _format_stf_no(cls, for_date, seq):
+        return f'{cls._get_stf_prefix(for_date)}{seq:0{cls.STF_SEQUENCE_WIDTH}d}'
+
+    @classmethod
+    def _scan_stf_sequence(cls, for_date):
+        """Highest sequence already used on ``for_date``, read from the tickets.
+
+        Only used to seed a day's StfSequence row, so tickets numbered before
+        the counter existed are never handed out again.
+        """
         prefix = cls._get_stf_prefix(for_date)
-        seq = 1
+        seq = 0
         for stf_no in cls.objects.filter(stf_no__startswith=prefix).values_list('stf_no', flat=True):
             suffix = str(stf_no)[len(prefix):]
             if suffix.isdigit():
-                seq = max(seq, int(suffix) + 1)
-        return f'{prefix}{seq:0{cls.STF_SEQUENCE_WIDTH}d}'
+                seq = max(seq, int(suffix))
+        return seq
+
+    @classmethod
+    def get_next_stf_no(cls, for_date=None):
+        """Preview the next STF number for the given date without reserving it."""
+        for_date = cls._get_stf_date(for_date)
+        last = StfSequence.objects.filter(pk=for_date).values_list('last_value', flat=True).first()
+        if last is None:
+            last = cls._scan_stf_sequence(for_date)
+        return cls._format_stf_no(for_date, last + 1)
+
+    @classmethod
+    def allocate_stf_no(cls, for_date=None):
+        """Reserve the next STF number for the given date."""
+        for_date = cls._get_stf_date(for_date)
+        return cls._format_stf_no(for_date, StfSequence.allocate(for_date))
 
     @classmethod
     def _generate_stf_no(cls):
-        return cls.get_next_stf_no()
+        return cls.allocate_stf_no()
 
     def __str__(self):
         return f"{self.stf_no} ({self.status})"
 
 
+class StfSequence(models.Model):
+    """Per-day STF counter.
+
+    Allocating a number is a single ``F()`` increment of one row, which the
+    database serializes, instead of scanning every ticket created that day.
+    """
+    date = models.DateField(primary_key=True)
+    last_value = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"STF sequence {self.date:%Y-%m-%d}: {self.last_value}"
+
+    @classmethod
+    def allocate(cls, for_date):
+        """Increment the counter for ``for_date`` and return the new value.
+
+        The ``F()`` update is the block's first statement, so it takes the
+        write lock (the row lock on Postgres, the database's on SQLite)
+        before anything is read, and concurrent allocations queue behind it.
+        """
+        with transaction.atomic():
+            if not cls.objects.filter(pk=for_date).update(last_value=F('last_value') + 1):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(date=for_date, last_value=Ticket._scan_stf_sequence(for_date) + 1)
+                except IntegrityError:
+                    # Another request created the day's row first.
+                    cls.objects.filter(pk=for_date).update(last_value=F('last_value') + 1)
+            return cls.objects.values_list('last_value', flat=True).get(pk=for_date)
+
+
+class AttachmentBlob(models.Model):
+    """One stored copy of an attachment's bytes, shared by every attachment with that content (see tickets.blobs)."""
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, help_text='Storage name of the content-addressed file')
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0, help_text='TicketAttachments pointing at this blob')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count} refs)"
+
+
 class TicketAttachment(models.Model):
     """File attachments for tickets (images, videos, documents)."""
     ticket = models.ForeignKey(Ticket, related_name='attachments', on_delete=models.CASCADE)
-    file = models.FileField(upload_to='ticket_attachments/%Y/%m/%d/')
+    file = models.FileField(upload_to='ticket_attachments/%Y/%m/%d/', max_length=255)
+    original_name = models.CharField(max_length=255, blank=True, default='', help_text='File name as uploaded')
+    blob = models.ForeignKey(AttachmentBlob, null=True, blank=True, on_delete=models.PROTECT, related_name='attachments')
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name='uploaded_attachments')
     uploaded_at = models.DateTimeField(auto_now_add=True)
     is_resolution_proof = models.BooleanField(default=False)
+    content_sha256 = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    previews = models.JSONField(default=dict, blank=True, help_text='Generated thumbnails (see tickets.previews)')
 
     # ── Knowledge Hub publish fields ──
     is_published = models.BooleanField(default=False)
@@ -238,7 +335,39 @@ class TicketAttachment(models.Model):
     is_archived = models.BooleanField(default=False)
 
     def __str__(self):
-        return f"Attachment for {self.ticket.stf_no}: {self.file.name}"
+        return f"Attachment for {self.ticket.stf_no}: {self.display_name}"
+
+    @property
+    def display_name(self):
+        """The name the file was uploaded under; older rows fall back to the stored name."""
+        return self.original_name or posixpath.basename(self.file.name or '')
+
+
+class ChunkedUpload(models.Model):
+    """A resumable attachment upload; chunks land in a part file until finalized (see tickets.uploads)."""
+    STATUS_UPLOADING = 'uploading'
+    STATUS_COMPLETE = 'complete'
+    STATUS_CHOICES = [
+        (STATUS_UPLOADING, 'Uploading'),
+        (STATUS_COMPLETE, 'Complete'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    ticket = models.ForeignKey(Ticket, related_name='chunked_uploads', on_delete=models.CASCADE)
+    uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chunked_uploads')
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True, default='')
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0, help_text='Bytes received and verified so far')
+    sha256 = models.CharField(max_length=64, blank=True, default='', help_text='Expected digest of the whole file')
+    is_resolution_proof = models.BooleanField(default=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_UPLOADING)
+    attachment = models.OneToOneField(TicketAttachment, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Upload of {self.filename} for {self.ticket.stf_no} ({self.offset}/{self.size})"
 
 
 class TicketTask(models.Model):
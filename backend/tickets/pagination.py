@@ -0,0 +1,20 @@
+"""Pagination classes for list endpoints."""
+from rest_framework.pagination import CursorPagination
+
+
+class TicketCursorPagination(CursorPagination):
+    """Keyset pagination for the ticket list, newest first.
+
+    Pagination is opt-in: it only applies when the client sends ``cursor`` or
+    ``page_size``, so callers that expect a bare JSON array keep working.
+    """
+    ordering = ('-created_at', 'id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
@@ -0,0 +1,296 @@
+"""Thumbnails and preview images for uploaded media.
+
+Lists that show attachments or avatars should not load the original files.
+After an attachment or profile picture is saved, its id is queued with
+``request_previews`` once the transaction commits. The builder then renders
+downscaled copies with Pillow: WebP when Pillow was built with it, JPEG
+otherwise. Videos get a poster frame when ``ffmpeg`` is installed
+(``FFMPEG_BINARY``). Other files get no previews.
+
+Derivatives are content-addressed: they are stored under
+``previews/<kind>/<sha256[:2]>/<sha256>/<spec>.<ext>``, keyed by the digest
+of the source bytes. A file uploaded twice is rendered once, and a rebuild
+only renders what is missing. The generated names are recorded on the row
+(``TicketAttachment.previews``, ``User.profile_picture_previews``) next to
+the source name they were built from, so a replaced file never shows stale
+previews. ``preview_urls`` turns that record into URLs for serializers.
+
+The backend is chosen with the ``MEDIA_PREVIEW_BUILDER`` setting:
+``SyncPreviewBuilder`` renders on the committing thread and
+``BackgroundPreviewBuilder`` on a worker thread. The worker drops requests
+when its queue is full. The ``build_previews`` command fills in anything
+missing, including files uploaded before previews existed.
+"""
+import hashlib
+import io
+import logging
+import mimetypes
+import queue
+import shutil
+import subprocess
+import threading
+from functools import partial
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from PIL import Image, ImageOps, features
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_DIR = 'previews'
+# spec -> longest edge in pixels
+ATTACHMENT_SPECS = {'thumb': 320, 'preview': 1280}
+AVATAR_SPECS = {'small': 64, 'medium': 256}
+QUALITY = 80
+POSTER_TIMEOUT = 30
+
+# model label -> (file field, previews field, kind, specs)
+TARGETS = {
+    'tickets.ticketattachment': ('file', 'previews', 'attachments', ATTACHMENT_SPECS),
+    'users.user': ('profile_picture', 'profile_picture_previews', 'avatars', AVATAR_SPECS),
+}
+
+
+def _image_format():
+    return ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+
+
+def _digest(fh):
+    digest = hashlib.sha256()
+    while data := fh.read(1024 * 1024):
+        digest.update(data)
+    return digest.hexdigest()
+
+
+def preview_name(kind, digest, spec, ext):
+    return f'{PREVIEW_DIR}/{kind}/{digest[:2]}/{digest}/{spec}.{ext}'
+
+
+def _poster_frame(path):
+    """A PNG still from the video at ``path``, or None without ffmpeg."""
+    ffmpeg = getattr(settings, 'FFMPEG_BINARY', None) or shutil.which('ffmpeg')
+    if not ffmpeg:
+        return None
+    # One second in skips fade-ins; clips shorter than that use the first frame.
+    for seek in ('1', '0'):
+        try:
+            result = subprocess.run(
+                [ffmpeg, '-v', 'error', '-ss', seek, '-i', path, '-frames:v', '1',
+                 '-f', 'image2pipe', '-vcodec', 'png', '-'],
+                capture_output=True, timeout=POSTER_TIMEOUT, check=False,
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.warning(f'Could not extract a poster frame from {path}: {e}')
+            return None
+        if result.stdout:
+            return io.BytesIO(result.stdout)
+    return None
+
+
+def render(source, specs):
+    """Downscale the image in ``source`` to every spec; returns ``{spec: bytes}`` and the extension."""
+    image_format, ext = _image_format()
+    rendered = {}
+    with Image.open(source) as image:
+        largest = max(specs.values())
+        # JPEGs can decode straight to a fraction of their size.
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        transparent = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+        image = image.convert('RGBA' if transparent and image_format == 'WEBP' else 'RGB')
+        options = {'quality': QUALITY}
+        options.update({'method': 4} if image_format == 'WEBP' else {'optimize': True})
+        # Largest first, each one scaled down from the previous.
+        for spec, edge in sorted(specs.items(), key=lambda item: item[1], reverse=True):
+            image.thumbnail((edge, edge), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            out = io.BytesIO()
+            image.save(out, image_format, **options)
+            rendered[spec] = out.getvalue()
+    return rendered, ext
+
+
+def _source_image(field_file):
+    """An open image source for ``field_file``: the file itself, or a video's poster frame."""
+    content_type = mimetypes.guess_type(field_file.name)[0] or ''
+    if content_type.startswith('video/'):
+        try:
+            return _poster_frame(field_file.path)
+        except NotImplementedError:
+            # Remote storage: no local path for ffmpeg to read.
+            return None
+    if content_type.startswith('image/') and content_type != 'image/svg+xml':
+        return field_file.open('rb')
+    return None
+
+
+def build_previews(instance):
+    """Render and record the previews for one attachment or user; returns the record."""
+    file_field, previews_field, kind, specs = TARGETS[instance._meta.label_lower]
+    field_file = getattr(instance, file_field)
+    if not field_file:
+        return {}
+
+    digest = getattr(instance, 'content_sha256', '')
+    if not digest:
+        with field_file.open('rb') as fh:
+            digest = _digest(fh)
+    record = {'source': field_file.name, 'sha256': digest}
+    ext = _image_format()[1]
+    names = {spec: preview_name(kind, digest, spec, ext) for spec in specs}
+    if all(default_storage.exists(name) for name in names.values()):
+        record.update(names)
+    else:
+        source = None
+        try:
+            source = _source_image(field_file)
+            if source is not None:
+                rendered, ext = render(source, specs)
+                for spec, data in rendered.items():
+                    name = preview_name(kind, digest, spec, ext)
+                    if not default_storage.exists(name):
+                        name = default_storage.save(name, ContentFile(data))
+                    record[spec] = name
+        except Exception as e:
+            # Corrupt or unsupported images just get no previews.
+            logger.warning(f'Could not build previews for {field_file.name}: {e}')
+        finally:
+            if source is not None:
+                source.close()
+
+    updates = {previews_field: record}
+    if hasattr(instance, 'content_sha256'):
+        updates['content_sha256'] = digest
+    # Only record them if the file was not replaced in the meantime.
+    type(instance).objects.filter(pk=instance.pk, **{file_field: field_file.name}).update(**updates)
+    for name, value in updates.items():
+        setattr(instance, name, value)
+    return record
+
+
+def needs_previews(instance):
+    file_field, previews_field, _, _ = TARGETS[instance._meta.label_lower]
+    field_file = getattr(instance, file_field)
+    return bool(field_file) and getattr(instance, previews_field).get('source') != field_file.name
+
+
+def preview_urls(instance, request=None):
+    """``{spec: url}`` for the instance's current file; empty until its previews are built."""
+    file_field, previews_field, _, specs = TARGETS[instance._meta.label_lower]
+    field_file = getattr(instance, file_field)
+    record = getattr(instance, previews_field) or {}
+    if not field_file or record.get('source') != field_file.name:
+        return {}
+    urls = {}
+    for spec in specs:
+        if record.get(spec):
+            url = default_storage.url(record[spec])
+            urls[spec] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+def build_missing_previews(force=False):
+    """Build previews for every file without current ones (all files with ``force``); returns the count."""
+    built = 0
+    for label, (file_field, _, _, _) in TARGETS.items():
+        files = apps.get_model(label).objects.exclude(**{file_field: ''}).exclude(**{f'{file_field}__isnull': True})
+        for instance in files.iterator():
+            if force or needs_previews(instance):
+                build_previews(instance)
+                built += 1
+    return built
+
+
+def _build(label, pk):
+    instance = apps.get_model(label).objects.filter(pk=pk).first()
+    if instance is not None and needs_previews(instance):
+        build_previews(instance)
+
+
+class SyncPreviewBuilder:
+    """Render on the thread that commits the upload."""
+
+    def submit(self, label, pk):
+        _build(label, pk)
+
+    def flush(self, timeout=None):
+        """Block until everything submitted so far is rendered."""
+        return True
+
+
+class BackgroundPreviewBuilder(SyncPreviewBuilder):
+    """Hand requests to a bounded queue drained by one worker thread."""
+
+    def __init__(self, maxsize=None):
+        if maxsize is None:
+            maxsize = getattr(settings, 'MEDIA_PREVIEW_QUEUE_SIZE', 1000)
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def submit(self, label, pk):
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((label, pk))
+        except queue.Full:
+            logger.warning(f'Preview queue full; skipped {label} {pk} (build_previews will catch up)')
+
+    def flush(self, timeout=None):
+        self._ensure_worker()
+        done = threading.Event()
+        self._queue.put(done, timeout=timeout)
+        return done.wait(timeout)
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='media-previews', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if isinstance(item, threading.Event):
+                    item.set()
+                else:
+                    _build(*item)
+            except Exception as e:
+                logger.warning(f'Failed to build previews for {item}: {e}')
+            finally:
+                self._queue.task_done()
+
+
+_builder = None
+_builder_lock = threading.Lock()
+
+
+def get_preview_builder():
+    """Return the process-wide builder configured by MEDIA_PREVIEW_BUILDER."""
+    global _builder
+    if _builder is None:
+        with _builder_lock:
+            if _builder is None:
+                path = getattr(settings, 'MEDIA_PREVIEW_BUILDER', 'tickets.previews.BackgroundPreviewBuilder')
+                _builder = import_string(path)()
+    return _builder
+
+
+def request_previews(instance):
+    """Queue previews for ``instance`` once the current transaction commits."""
+    if needs_previews(instance):
+        transaction.on_commit(partial(get_preview_builder().submit, instance._meta.label_lower, instance.pk))
+
+
+@receiver(setting_changed)
+def _reset_builder(setting, **kwargs):
+    global _builder
+    if setting in ('MEDIA_PREVIEW_BUILDER', 'MEDIA_PREVIEW_QUEUE_SIZE'):
+        _builder = None
@@ -0,0 +1,125 @@
+"""Retention purge engine for the audit, call and escalation logs.
+
+``RetentionPolicy`` decides how many days each log keeps. Expired rows are
+deleted in primary-key windows of ``batch_size``, one short transaction per
+window, so the table is never locked for long and memory stays bounded. Each
+purge is tracked by a ``RetentionPurgeRun`` whose checkpoint advances with
+every batch; an interrupted purge resumes from it with the same cutoff.
+
+Schedulers (cron, a systemd timer, Celery beat) should call
+``python manage.py purge_retention`` or ``purge_expired()`` directly.
+"""
+import logging
+import time
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+
+# target -> (model, date field, RetentionPolicy field)
+RETENTION_TARGETS = {
+    'audit_log': ('tickets.AuditLog', 'timestamp', 'audit_log_retention_days'),
+    'call_log': ('tickets.CallLog', 'created_at', 'call_log_retention_days'),
+    'escalation_log': ('tickets.EscalationLog', 'created_at', 'escalation_log_retention_days'),
+}
+
+
+def _expired(target, cutoff):
+    model_label, date_field, _ = RETENTION_TARGETS[target]
+    model = apps.get_model(model_label)
+    return model, model.objects.filter(**{f'{date_field}__lt': cutoff})
+
+
+def purge_target(target, policy=None, *, batch_size=DEFAULT_BATCH_SIZE, dry_run=False, resume=True,
+                 max_batches=None, pause=0, now=None, progress=None):
+    """Delete one log's expired rows; returns a metrics dict.
+
+    ``dry_run`` only counts what would be deleted. With ``resume`` an
+    unfinished run for the target is continued; otherwise it is abandoned
+    and a new run starts from the current policy. ``max_batches`` stops
+    early (leaving the run resumable) and ``pause`` sleeps between batches
+    to throttle I/O. ``progress`` is called with the run after every batch.
+    """
+    from .models import AuditSummaryBucket, RetentionPolicy, RetentionPurgeRun
+
+    policy = policy or RetentionPolicy.get_policy()
+    days = getattr(policy, RETENTION_TARGETS[target][2])
+    result = {'target': target, 'deleted': 0, 'batches': 0, 'elapsed': 0.0, 'rows_per_second': 0.0}
+
+    unfinished = RetentionPurgeRun.objects.filter(target=target, finished_at__isnull=True)
+    run = unfinished.first() if resume else None
+    if run is None and not days:
+        return {**result, 'skipped': 'keep forever'}
+
+    if run is None:
+        cutoff = (now or timezone.now()) - timezone.timedelta(days=days)
+        model, expired = _expired(target, cutoff)
+        if dry_run:
+            return {**result, 'cutoff': cutoff, 'would_delete': expired.count()}
+        bounds = expired.aggregate(first=Min('pk'), last=Max('pk'))
+        if bounds['first'] is None:
+            return {**result, 'cutoff': cutoff}
+        if not resume:
+            unfinished.update(finished_at=timezone.now())
+        run = RetentionPurgeRun.objects.create(
+            target=target, cutoff=cutoff, first_pk=bounds['first'],
+            last_pk=bounds['first'] - 1, end_pk=bounds['last'],
+        )
+    else:
+        model, expired = _expired(target, run.cutoff)
+        if dry_run:
+            remaining = expired.filter(pk__gt=run.last_pk, pk__lte=run.end_pk).count()
+            return {**result, 'cutoff': run.cutoff, 'would_delete': remaining, 'resuming': run.pk}
+
+    started = time.perf_counter()
+    deleted = batches = 0
+    while run.last_pk < run.end_pk and (max_batches is None or batches < max_batches):
+        batch_start = time.perf_counter()
+        upper = min(run.last_pk + batch_size, run.end_pk)
+        with transaction.atomic():
+            batch = expired.filter(pk__gt=run.last_pk, pk__lte=upper)
+            if target == 'audit_log':
+                AuditSummaryBucket.remove(batch)
+            _, per_model = batch.delete()
+            count = per_model.get(model._meta.label, 0)
+            run.last_pk = upper
+            run.deleted += count
+            run.batches += 1
+            run.elapsed_seconds += time.perf_counter() - batch_start
+            if run.last_pk >= run.end_pk:
+                run.finished_at = timezone.now()
+            run.save(update_fields=[
+                'last_pk', 'deleted', 'batches', 'elapsed_seconds', 'finished_at', 'updated_at',
+            ])
+        deleted += count
+        batches += 1
+        if progress:
+            progress(run)
+        if pause and run.last_pk < run.end_pk:
+            time.sleep(pause)
+
+    elapsed = time.perf_counter() - started
+    logger.info(f'Retention purge {target}: deleted {deleted} rows in {batches} batches ({elapsed:.2f}s)')
+    return {
+        **result,
+        'cutoff': run.cutoff,
+        'deleted': deleted,
+        'batches': batches,
+        'elapsed': elapsed,
+        'rows_per_second': deleted / elapsed if elapsed else 0.0,
+        'finished': run.finished_at is not None,
+        'run': run.pk,
+    }
+
+
+def purge_expired(targets=None, **options):
+    """Scheduler hook: purge every target (or ``targets``) under the current policy."""
+    from .models import RetentionPolicy
+
+    policy = RetentionPolicy.get_policy()
+    return [purge_target(target, policy, **options) for target in (targets or RETENTION_TARGETS)]
@@ -8,7 +8,7 @@ from .messaging import (
 )
 from .audit import EscalationLogSerializer, AuditLogSerializer
 from .ticket import (
-    TicketSerializer, TicketTaskSerializer, TicketAttachmentSerializer,
+    TicketSerializer, TicketSummarySerializer, TicketTaskSerializer, TicketAttachmentSerializer,
     AdminCreateTicketSerializer, EmployeeTicketActionSerializer,
 )
 from .knowledge import KnowledgeHubAttachmentSerializer, PublishedArticleSerializer
@@ -23,7 +23,7 @@ __all__ = [
     'AssignmentSessionSerializer', 'MessageSerializer',
     'MessageReactionSerializer', 'MessageReadReceiptSerializer',
     'EscalationLogSerializer', 'AuditLogSerializer',
-    'TicketSerializer', 'TicketTaskSerializer', 'TicketAttachmentSerializer',
+    'TicketSerializer', 'TicketSummarySerializer', 'TicketTaskSerializer', 'TicketAttachmentSerializer',
     'AdminCreateTicketSerializer', 'EmployeeTicketActionSerializer',
     'KnowledgeHubAttachmentSerializer', 'PublishedArticleSerializer',
     'NotificationSerializer',
@@ -19,7 +19,7 @@ class AuditLogSerializer(serializers.ModelSerializer):
         model = AuditLog
         fields = [
             'id', 'timestamp', 'entity', 'entity_id', 'action',
-            'activity', 'actor', 'actor_email', 'actor_name',
+            'activity', 'actor', 'actor_email', 'actor_name', 'actor_role',
             'ip_address', 'changes',
         ]
 
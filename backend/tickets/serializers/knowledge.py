@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from ..models import TicketAttachment
 from users.serializers import UserSerializer
+from tickets.previews import preview_urls
 
 
 class KnowledgeHubAttachmentSerializer(serializers.ModelSerializer):
@@ -14,11 +15,13 @@ class KnowledgeHubAttachmentSerializer(serializers.ModelSerializer):
     description_of_problem = serializers.CharField(source='ticket.description_of_problem', read_only=True)
     type_of_service_name = serializers.SerializerMethodField()
     assigned_to_name = serializers.SerializerMethodField()
+    file_name = serializers.CharField(source='display_name', read_only=True)
+    previews = serializers.SerializerMethodField()
 
     class Meta:
         model = TicketAttachment
         fields = [
-            'id', 'file', 'uploaded_by', 'uploaded_at', 'is_resolution_proof',
+            'id', 'file', 'file_name', 'previews', 'uploaded_by', 'uploaded_at', 'is_resolution_proof',
             'ticket_id', 'stf_no', 'ticket_status', 'client',
             'description_of_problem', 'type_of_service_name', 'assigned_to_name',
             # Publish fields
@@ -33,6 +36,9 @@ class KnowledgeHubAttachmentSerializer(serializers.ModelSerializer):
             return obj.ticket.client_record.client_name
         return ''
 
+    def get_previews(self, obj):
+        return preview_urls(obj, self.context.get('request'))
+
     def get_type_of_service_name(self, obj):
         tos = obj.ticket.type_of_service
         if not tos:
@@ -50,6 +56,8 @@ class KnowledgeHubAttachmentSerializer(serializers.ModelSerializer):
 class PublishedArticleSerializer(serializers.ModelSerializer):
     """Employee-facing serializer: only published knowledge hub items."""
     file_url = serializers.SerializerMethodField()
+    file_name = serializers.CharField(source='display_name', read_only=True)
+    previews = serializers.SerializerMethodField()
     stf_no = serializers.CharField(source='ticket.stf_no', read_only=True)
     uploaded_by_name = serializers.SerializerMethodField()
     published_by_name = serializers.SerializerMethodField()
@@ -58,7 +66,7 @@ class PublishedArticleSerializer(serializers.ModelSerializer):
         model = TicketAttachment
         fields = [
             'id', 'published_title', 'published_description', 'published_tags',
-            'file_url', 'stf_no', 'uploaded_by_name', 'published_by_name',
+            'file_url', 'file_name', 'previews', 'stf_no', 'uploaded_by_name', 'published_by_name',
             'published_at', 'uploaded_at',
         ]
 
@@ -68,6 +76,9 @@ class PublishedArticleSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.file.url)
         return obj.file.url if obj.file else ''
 
+    def get_previews(self, obj):
+        return preview_urls(obj, self.context.get('request'))
+
     def get_uploaded_by_name(self, obj):
         if obj.uploaded_by:
             name = obj.uploaded_by.get_full_name()
@@ -34,4 +34,8 @@ class CategorySerializer(serializers.ModelSerializer):
         return super().to_internal_value(sanitize_payload(data, self.text_field_rules))
 
     def get_product_count(self, obj):
+        # Use the annotated count when the queryset provides one.
+        count = getattr(obj, 'product_count', None)
+        if count is not None:
+            return count
         return obj.products.count()
@@ -1,11 +1,14 @@
 from rest_framework import serializers
+from django.db.models import Count, Exists, OuterRef, Prefetch
 from django.utils import timezone
+from django.utils.functional import cached_property
 import re
 from ..models import (
-    Ticket, TicketTask, TicketAttachment, EscalationLog, AuditLog,
+    Ticket, TicketTask, TicketAttachment, EscalationLog, AuditLog, Category,
 )
 from tickets.input_security import sanitize_payload
-from users.serializers import UserSerializer
+from tickets.previews import preview_urls
+from users.serializers import UserSerializer, UserSummarySerializer
 from .lookup import TypeOfServiceSerializer
 from .client import ClientSerializer
 from .product import ProductSerializer
@@ -27,10 +30,47 @@ class TicketTaskSerializer(serializers.ModelSerializer):
 
 class TicketAttachmentSerializer(serializers.ModelSerializer):
     uploaded_by = UserSerializer(read_only=True)
+    file_name = serializers.CharField(source='display_name', read_only=True)
+    previews = serializers.SerializerMethodField()
 
     class Meta:
         model = TicketAttachment
-        fields = ['id', 'file', 'uploaded_by', 'uploaded_at', 'is_resolution_proof']
+        fields = ['id', 'file', 'file_name', 'previews', 'uploaded_by', 'uploaded_at', 'is_resolution_proof']
+
+    def get_previews(self, obj):
+        return preview_urls(obj, self.context.get('request'))
+
+
+# Read-only ticket fields mirrored from the linked Client / Product records:
+# serializer field name -> (ticket relation, attribute on the related record).
+VIRTUAL_FIELD_SOURCES = {
+    'client': ('client_record', 'client_name'),
+    **{name: ('client_record', name) for name in (
+        'contact_person', 'address', 'designation', 'landline',
+        'department_organization', 'mobile_no', 'email_address',
+    )},
+    'product': ('product_record', 'product_name'),
+    **{name: ('product_record', name) for name in (
+        'brand', 'model_name', 'device_equipment', 'version_no',
+        'firmware_version', 'software_name', 'software_version', 'software_vendor',
+        'software_license_key', 'software_metadata', 'date_purchased', 'serial_no',
+        'sales_no', 'others', 'client_purchase_no', 'maptech_dr', 'maptech_sales_invoice',
+        'maptech_sales_order_no', 'supplier_purchase_no', 'supplier_sales_invoice',
+        'supplier_delivery_receipt',
+    )},
+}
+
+# Ticket columns each non-column serializer field reads, used to build `.only()`.
+TICKET_FIELD_COLUMNS = {
+    **{name: (relation,) for name, (relation, _attr) in VIRTUAL_FIELD_SOURCES.items()},
+    'client_record_detail': ('client_record',),
+    'product_record_detail': ('product_record',),
+    'type_of_service_detail': ('type_of_service',),
+    'type_of_service_others': ('type_of_service',),
+    'progress_percentage': ('status', 'time_in', 'assigned_to', 'confirmed_by_admin'),
+    'sla_estimated_days': ('confirmed_by_admin', 'priority', 'estimated_resolution_days_override', 'type_of_service'),
+    'was_for_observation': ('status', 'observation'),
+}
 
 
 class TicketSerializer(serializers.ModelSerializer):
@@ -65,63 +105,39 @@ class TicketSerializer(serializers.ModelSerializer):
         'external_escalation_notes': {'max_length': None, 'allow_newlines': True},
     }
 
-    # ── Client fields: read-only virtual fields from client_record FK ──
-    client = serializers.SerializerMethodField()
-    contact_person = serializers.SerializerMethodField()
-    address = serializers.SerializerMethodField()
-    designation = serializers.SerializerMethodField()
-    landline = serializers.SerializerMethodField()
-    department_organization = serializers.SerializerMethodField()
-    mobile_no = serializers.SerializerMethodField()
-    email_address = serializers.SerializerMethodField()
-
-    def get_client(self, obj):
-        return obj.client_record.client_name if obj.client_record else ''
-
-    def get_contact_person(self, obj):
-        return obj.client_record.contact_person if obj.client_record else ''
-
-    def get_address(self, obj):
-        return obj.client_record.address if obj.client_record else ''
-
-    def get_designation(self, obj):
-        return obj.client_record.designation if obj.client_record else ''
-
-    def get_landline(self, obj):
-        return obj.client_record.landline if obj.client_record else ''
-
-    def get_department_organization(self, obj):
-        return obj.client_record.department_organization if obj.client_record else ''
-
-    def get_mobile_no(self, obj):
-        return obj.client_record.mobile_no if obj.client_record else ''
-
-    def get_email_address(self, obj):
-        return obj.client_record.email_address if obj.client_record else ''
-
-    # ── Product fields: read-only views of linked `product_record` (Product)
-    product = serializers.SerializerMethodField()
-    brand = serializers.SerializerMethodField()
-    model_name = serializers.SerializerMethodField()
-    device_equipment = serializers.SerializerMethodField()
-    version_no = serializers.SerializerMethodField()
-    firmware_version = serializers.SerializerMethodField()
-    software_name = serializers.SerializerMethodField()
-    software_version = serializers.SerializerMethodField()
-    software_vendor = serializers.SerializerMethodField()
-    software_license_key = serializers.SerializerMethodField()
-    software_metadata = serializers.SerializerMethodField()
-    date_purchased = serializers.SerializerMethodField()
-    serial_no = serializers.SerializerMethodField()
-    sales_no = serializers.SerializerMethodField()
-    others = serializers.SerializerMethodField()
-    client_purchase_no = serializers.SerializerMethodField()
-    maptech_dr = serializers.SerializerMethodField()
-    maptech_sales_invoice = serializers.SerializerMethodField()
-    maptech_sales_order_no = serializers.SerializerMethodField()
-    supplier_purchase_no = serializers.SerializerMethodField()
-    supplier_sales_invoice = serializers.SerializerMethodField()
-    supplier_delivery_receipt = serializers.SerializerMethodField()
+    # ── Client / product fields: read-only views of `client_record` and
+    # `product_record`. Values are filled in one pass by to_representation()
+    # using VIRTUAL_FIELD_SOURCES instead of one method dispatch per field.
+    client = serializers.ReadOnlyField()
+    contact_person = serializers.ReadOnlyField()
+    address = serializers.ReadOnlyField()
+    designation = serializers.ReadOnlyField()
+    landline = serializers.ReadOnlyField()
+    department_organization = serializers.ReadOnlyField()
+    mobile_no = serializers.ReadOnlyField()
+    email_address = serializers.ReadOnlyField()
+    product = serializers.ReadOnlyField()
+    brand = serializers.ReadOnlyField()
+    model_name = serializers.ReadOnlyField()
+    device_equipment = serializers.ReadOnlyField()
+    version_no = serializers.ReadOnlyField()
+    firmware_version = serializers.ReadOnlyField()
+    software_name = serializers.ReadOnlyField()
+    software_version = serializers.ReadOnlyField()
+    software_vendor = serializers.ReadOnlyField()
+    software_license_key = serializers.ReadOnlyField()
+    software_metadata = serializers.ReadOnlyField()
+    date_purchased = serializers.ReadOnlyField()
+    serial_no = serializers.ReadOnlyField()
+    sales_no = serializers.ReadOnlyField()
+    others = serializers.ReadOnlyField()
+    client_purchase_no = serializers.ReadOnlyField()
+    maptech_dr = serializers.ReadOnlyField()
+    maptech_sales_invoice = serializers.ReadOnlyField()
+    maptech_sales_order_no = serializers.ReadOnlyField()
+    supplier_purchase_no = serializers.ReadOnlyField()
+    supplier_sales_invoice = serializers.ReadOnlyField()
+    supplier_delivery_receipt = serializers.ReadOnlyField()
 
     # Role-based writable fields
     TICKET_FIELDS = {
@@ -141,6 +157,15 @@ class TicketSerializer(serializers.ModelSerializer):
         'cascade_type', 'observation', 'signature', 'signed_by_name',
     }
 
+    # Columns rendered by the ticket list grids (`?view=summary`).
+    SUMMARY_FIELDS = (
+        'id', 'status', 'stf_no', 'created_by', 'assigned_to', 'created_at',
+        'time_in', 'client', 'contact_person', 'type_of_service_detail',
+        'type_of_service_others', 'priority', 'confirmed_by_admin',
+        'description_of_problem', 'job_status', 'progress_percentage',
+        'sla_estimated_days',
+    )
+
     class Meta:
         model = Ticket
         fields = [
@@ -182,90 +207,94 @@ class TicketSerializer(serializers.ModelSerializer):
     def to_internal_value(self, data):
         return super().to_internal_value(sanitize_payload(data, self.text_field_rules))
 
-    def get_linked_ticket_stfs(self, obj):
-        return list(obj.linked_tickets.values_list('stf_no', flat=True))
-
-    # Product field accessors (read from linked `product_record`)
-    def _product_field(self, obj, field_name):
-        pr = getattr(obj, 'product_record', None)
-        if not pr:
-            return ''
-        val = getattr(pr, field_name, None)
-        if val is None:
-            return ''
-        return val
-
-    def get_product(self, obj):
-        return self._product_field(obj, 'product_name')
-
-    def get_brand(self, obj):
-        return self._product_field(obj, 'brand')
-
-    def get_model_name(self, obj):
-        return self._product_field(obj, 'model_name')
-
-    def get_device_equipment(self, obj):
-        return self._product_field(obj, 'device_equipment')
-
-    def get_version_no(self, obj):
-        return self._product_field(obj, 'version_no')
-
-    def get_firmware_version(self, obj):
-        return self._product_field(obj, 'firmware_version')
-
-    def get_software_name(self, obj):
-        return self._product_field(obj, 'software_name')
-
-    def get_software_version(self, obj):
-        return self._product_field(obj, 'software_version')
-
-    def get_software_vendor(self, obj):
-        return self._product_field(obj, 'software_vendor')
-
-    def get_software_license_key(self, obj):
-        return self._product_field(obj, 'software_license_key')
-
-    def get_software_metadata(self, obj):
-        return self._product_field(obj, 'software_metadata')
-
-    def get_date_purchased(self, obj):
-        return self._product_field(obj, 'date_purchased')
-
-    def get_serial_no(self, obj):
-        return self._product_field(obj, 'serial_no')
-
-    def get_sales_no(self, obj):
-        return self._product_field(obj, 'sales_no')
-
-    def get_others(self, obj):
-        return self._product_field(obj, 'others')
-
-    def get_client_purchase_no(self, obj):
-        return self._product_field(obj, 'client_purchase_no')
-
-    def get_maptech_dr(self, obj):
-        return self._product_field(obj, 'maptech_dr')
-
-    def get_maptech_sales_invoice(self, obj):
-        return self._product_field(obj, 'maptech_sales_invoice')
-
-    def get_maptech_sales_order_no(self, obj):
-        return self._product_field(obj, 'maptech_sales_order_no')
-
-    def get_supplier_purchase_no(self, obj):
-        return self._product_field(obj, 'supplier_purchase_no')
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sparse fieldset: drop every field the caller did not ask for.
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None):
+        """Load every relation this serializer reads in a fixed number of queries.
+
+        Without this each ticket row triggers its own lookups for users, tasks,
+        attachments, escalation logs, linked tickets and the observation audit
+        check, so list cost grows with the page size. When ``fields`` is given
+        only the joins and columns those fields need are fetched.
+        """
+        names = set(cls.Meta.fields if fields is None else fields)
+        concrete = {f.name for f in Ticket._meta.concrete_fields}
+        columns = {'id', 'created_at'}
+        for name in names:
+            columns.update(TICKET_FIELD_COLUMNS.get(name, (name,) if name in concrete else ()))
+
+        select = [
+            name for name in ('created_by', 'supervisor', 'assigned_to', 'type_of_service', 'client_record', 'product_record')
+            if name in columns
+        ]
+        prefetch = []
+        if 'product_record_detail' in names:
+            select.append('product_record__client')
+            prefetch.append(Prefetch('product_record__category', queryset=Category.objects.annotate(product_count=Count('products'))))
+        if 'feedback_rating' in names:
+            select += ['feedback_rating', 'feedback_rating__admin', 'feedback_rating__employee']
+        if 'tasks' in names:
+            prefetch.append(Prefetch('tasks', queryset=TicketTask.objects.select_related('assigned_to')))
+        if 'attachments' in names:
+            prefetch.append(Prefetch('attachments', queryset=TicketAttachment.objects.select_related('uploaded_by')))
+        if 'escalation_logs' in names:
+            prefetch.append(Prefetch('escalation_logs', queryset=EscalationLog.objects.select_related('from_user', 'to_user')))
+        if names & {'linked_ticket_ids', 'linked_ticket_stfs'}:
+            prefetch.append(Prefetch('linked_tickets', queryset=Ticket.objects.only('id', 'stf_no')))
+
+        queryset = queryset.select_related(*select).prefetch_related(*prefetch)
+        if 'was_for_observation' in names:
+            observed = AuditLog.objects.filter(
+                entity=AuditLog.ENTITY_TICKET,
+                entity_id=OuterRef('pk'),
+                action=AuditLog.ACTION_OBSERVE,
+            )
+            queryset = queryset.annotate(observed_in_audit=Exists(observed))
+        if fields is not None:
+            queryset = queryset.only(*columns)
+        return queryset
+
+    @cached_property
+    def _virtual_fields(self):
+        return [
+            (name, *VIRTUAL_FIELD_SOURCES[name])
+            for name in self.fields if name in VIRTUAL_FIELD_SOURCES
+        ]
 
-    def get_supplier_sales_invoice(self, obj):
-        return self._product_field(obj, 'supplier_sales_invoice')
+    @property
+    def _readable_fields(self):
+        # Virtual client/product fields are filled in bulk by to_representation().
+        for field in super()._readable_fields:
+            if field.field_name not in VIRTUAL_FIELD_SOURCES:
+                yield field
+
+    def to_representation(self, instance):
+        ret = super().to_representation(instance)
+        records = {}
+        for name, relation, attr in self._virtual_fields:
+            if relation not in records:
+                records[relation] = getattr(instance, relation)
+            value = getattr(records[relation], attr, None)
+            ret[name] = '' if value is None else value
+        return ret
 
-    def get_supplier_delivery_receipt(self, obj):
-        return self._product_field(obj, 'supplier_delivery_receipt')
+    def get_linked_ticket_stfs(self, obj):
+        return [linked.stf_no for linked in obj.linked_tickets.all()]
 
     def get_was_for_observation(self, obj):
         if obj.status == Ticket.STATUS_FOR_OBSERVATION:
             return True
         if obj.observation:
             return True
+        observed = getattr(obj, 'observed_in_audit', None)
+        if observed is not None:
+            return observed
         return AuditLog.objects.filter(
             entity=AuditLog.ENTITY_TICKET, entity_id=str(obj.id), action=AuditLog.ACTION_OBSERVE
         ).exists()
@@ -319,6 +348,21 @@ class TicketSerializer(serializers.ModelSerializer):
         return ticket
 
 
+class TicketSummarySerializer(TicketSerializer):
+    """Compact, read-only ticket row for dashboards, kanban boards and list grids."""
+    created_by = UserSummarySerializer(read_only=True)
+    assigned_to = UserSummarySerializer(read_only=True)
+
+    class Meta(TicketSerializer.Meta):
+        fields = list(TicketSerializer.SUMMARY_FIELDS)
+        read_only_fields = fields
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None):
+        # Summary rows never need the wide columns (signatures, notes, ...).
+        return super().setup_eager_loading(queryset, fields=cls.Meta.fields if fields is None else fields)
+
+
 class AdminCreateTicketSerializer(serializers.ModelSerializer):
     """Form shown to admins when creating a new ticket.
     Includes priority and assign_to so the admin can set them during the call flow."""
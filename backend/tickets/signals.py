@@ -88,44 +88,72 @@ def audit_user_save(sender, instance, created, **kwargs):
         logger.error(f'Failed to log user create audit: {e}')
 
 
+# ── Media previews ──
+
+@receiver(post_save, sender='tickets.TicketAttachment')
+@receiver(post_save, sender='users.User')
+def queue_media_previews(sender, instance, raw=False, **kwargs):
+    """Build thumbnails for new attachments and changed profile pictures."""
+    if raw:
+        return
+    try:
+        from .previews import request_previews
+        request_previews(instance)
+    except Exception as e:
+        logger.error(f'Failed to queue media previews: {e}')
+
+
+@receiver(post_delete, sender='tickets.TicketAttachment')
+def release_attachment_blob(sender, instance, **kwargs):
+    """Drop the deleted attachment's reference to its stored content."""
+    if instance.blob_id:
+        from .blobs import release_blob
+        release_blob(instance.blob_id)
+
+
 # ── Notification signals ──
 
+def _active_admin_ids():
+    User = get_user_model()
+    return User.objects.filter(
+        role__in=[User.ROLE_ADMIN, User.ROLE_SUPERADMIN],
+        is_active=True,
+    ).values_list('id', flat=True)
+
+
 @receiver(post_save, sender='tickets.Ticket')
 def notify_ticket_changes(sender, instance, created, **kwargs):
     """Generate notifications when tickets are created or significant fields change."""
     try:
-        from .models import Notification, Ticket
-        User = get_user_model()
+        from .models import Notification
 
         if created:
             # Notify all admins/superadmins about new ticket
-            admin_users = User.objects.filter(
-                role__in=[User.ROLE_ADMIN, User.ROLE_SUPERADMIN],
-                is_active=True,
-            ).exclude(id=instance.created_by_id)
-            for admin_user in admin_users:
-                Notification.notify(
-                    recipient=admin_user,
-                    notification_type=Notification.TYPE_NEW_TICKET,
-                    title='New Ticket Created',
-                    message=f'Ticket {instance.stf_no} has been created by {instance.created_by.username}.',
-                    ticket=instance,
-                )
+            admin_ids = _active_admin_ids().exclude(id=instance.created_by_id)
+            Notification.notify_many(
+                admin_ids,
+                notification_type=Notification.TYPE_NEW_TICKET,
+                title='New Ticket Created',
+                message=f'Ticket {instance.stf_no} has been created by {instance.created_by.username}.',
+                ticket=instance,
+            )
     except Exception as e:
         logger.error(f'Failed to send ticket notification: {e}')
 
 
 @receiver(pre_save, sender='tickets.Ticket')
 def capture_ticket_old_values(sender, instance, **kwargs):
-    """Capture old values before save for notification comparison."""
+    """Capture old values before save for notification comparison and stats."""
+    instance._old_stats_state = None
     if instance.pk:
         try:
-            from .models import Ticket
+            from .models import Ticket, TicketStatsSnapshot
             old = Ticket.objects.filter(pk=instance.pk).values(
-                'assigned_to_id', 'status'
+                *TicketStatsSnapshot.STATE_FIELDS
             ).first()
             instance._old_assigned_to_id = old['assigned_to_id'] if old else None
             instance._old_status = old['status'] if old else None
+            instance._old_stats_state = old
         except Exception as e:
             logger.warning(f'Failed to capture old ticket values: {e}')
             instance._old_assigned_to_id = None
@@ -135,6 +163,36 @@ def capture_ticket_old_values(sender, instance, **kwargs):
         instance._old_status = None
 
 
+@receiver(post_save, sender='tickets.Ticket')
+def update_ticket_stats(sender, instance, created, update_fields=None, **kwargs):
+    """Move the ticket's contribution in the stats rollup from its old to its new values."""
+    try:
+        from .models import Ticket, TicketStatsSnapshot
+        if update_fields is not None and not {
+            name.removesuffix('_id') for name in update_fields
+        } & {name.removesuffix('_id') for name in TicketStatsSnapshot.STATE_FIELDS}:
+            return
+        if created:
+            new_state = TicketStatsSnapshot.ticket_state(instance)
+        else:
+            # A partial save of a stale instance only wrote some columns; the
+            # row, not the instance, holds the ticket's state now.
+            new_state = Ticket.objects.filter(pk=instance.pk).values(*TicketStatsSnapshot.STATE_FIELDS).first()
+        TicketStatsSnapshot.apply_change(getattr(instance, '_old_stats_state', None), new_state)
+    except Exception as e:
+        logger.error(f'Failed to update ticket stats: {e}')
+
+
+@receiver(post_delete, sender='tickets.Ticket')
+def remove_ticket_stats(sender, instance, **kwargs):
+    """Subtract a deleted ticket from the stats rollup."""
+    try:
+        from .models import TicketStatsSnapshot
+        TicketStatsSnapshot.apply_change(TicketStatsSnapshot.ticket_state(instance), None)
+    except Exception as e:
+        logger.error(f'Failed to update ticket stats: {e}')
+
+
 @receiver(post_save, sender='tickets.Ticket')
 def notify_ticket_assignment_and_status(sender, instance, created, **kwargs):
     """Notify on assignment changes and status changes."""
@@ -142,7 +200,6 @@ def notify_ticket_assignment_and_status(sender, instance, created, **kwargs):
         return  # Handled by notify_ticket_changes above
     try:
         from .models import Notification
-        User = get_user_model()
 
         old_assigned = getattr(instance, '_old_assigned_to_id', None)
         old_status = getattr(instance, '_old_status', None)
@@ -150,7 +207,7 @@ def notify_ticket_assignment_and_status(sender, instance, created, **kwargs):
         # ── Assignment notification ──
         if instance.assigned_to_id and instance.assigned_to_id != old_assigned:
             Notification.notify(
-                recipient=instance.assigned_to,
+                recipient=instance.assigned_to_id,
                 notification_type=Notification.TYPE_ASSIGNMENT,
                 title='Ticket Assigned to You',
                 message=f'You have been assigned to ticket {instance.stf_no}.',
@@ -162,7 +219,7 @@ def notify_ticket_assignment_and_status(sender, instance, created, **kwargs):
             # Notify the ticket creator
             if instance.created_by_id:
                 Notification.notify(
-                    recipient=instance.created_by,
+                    recipient=instance.created_by_id,
                     notification_type=Notification.TYPE_STATUS_CHANGE,
                     title='Ticket Status Updated',
                     message=f'Ticket {instance.stf_no} status changed from {old_status} to {instance.status}.',
@@ -171,38 +228,28 @@ def notify_ticket_assignment_and_status(sender, instance, created, **kwargs):
 
             # If escalated, notify all admins
             if instance.status in ('escalated', 'escalated_external'):
-                admin_users = User.objects.filter(
-                    role__in=[User.ROLE_ADMIN, User.ROLE_SUPERADMIN],
-                    is_active=True,
+                Notification.notify_many(
+                    _active_admin_ids(),
+                    notification_type=Notification.TYPE_ESCALATION,
+                    title='Ticket Escalated',
+                    message=f'Ticket {instance.stf_no} has been escalated.',
+                    ticket=instance,
                 )
-                for admin_user in admin_users:
-                    Notification.notify(
-                        recipient=admin_user,
-                        notification_type=Notification.TYPE_ESCALATION,
-                        title='Ticket Escalated',
-                        message=f'Ticket {instance.stf_no} has been escalated.',
-                        ticket=instance,
-                    )
 
             # If pending closure, notify admins
             if instance.status == 'pending_closure':
-                admin_users = User.objects.filter(
-                    role__in=[User.ROLE_ADMIN, User.ROLE_SUPERADMIN],
-                    is_active=True,
+                Notification.notify_many(
+                    _active_admin_ids(),
+                    notification_type=Notification.TYPE_CLOSURE,
+                    title='Ticket Pending Closure',
+                    message=f'Ticket {instance.stf_no} is pending closure review.',
+                    ticket=instance,
                 )
-                for admin_user in admin_users:
-                    Notification.notify(
-                        recipient=admin_user,
-                        notification_type=Notification.TYPE_CLOSURE,
-                        title='Ticket Pending Closure',
-                        message=f'Ticket {instance.stf_no} is pending closure review.',
-                        ticket=instance,
-                    )
 
             # If closed, notify the assigned employee
             if instance.status == 'closed' and instance.assigned_to_id:
                 Notification.notify(
-                    recipient=instance.assigned_to,
+                    recipient=instance.assigned_to_id,
                     notification_type=Notification.TYPE_CLOSURE,
                     title='Ticket Closed',
                     message=f'Ticket {instance.stf_no} has been closed.',
@@ -220,9 +267,9 @@ def notify_escalation_log(sender, instance, created, **kwargs):
     try:
         from .models import Notification
         # Notify the target user (for internal escalations)
-        if instance.to_user:
+        if instance.to_user_id:
             Notification.notify(
-                recipient=instance.to_user,
+                recipient=instance.to_user_id,
                 notification_type=Notification.TYPE_ESCALATION,
                 title='Ticket Escalated to You',
                 message=f'Ticket {instance.ticket.stf_no} has been escalated to you. Notes: {instance.notes[:100]}',
@@ -230,3 +277,19 @@ def notify_escalation_log(sender, instance, created, **kwargs):
             )
     except Exception as e:
         logger.error(f'Failed to send escalation notification: {e}')
+
+
+# ── Chat signals ──
+
+@receiver(post_save, sender='tickets.AssignmentSession')
+def broadcast_session_change(sender, instance, **kwargs):
+    """Tell open chat sockets to drop their cached ticket/session context."""
+    try:
+        from .dispatch import get_dispatcher
+        from .models import Message
+        get_dispatcher().enqueue([(
+            f'chat_{instance.ticket_id}_{Message.CHANNEL_ADMIN_EMPLOYEE}',
+            {'type': 'session_changed', 'session_id': instance.id, 'is_active': instance.is_active},
+        )])
+    except Exception as e:
+        logger.error(f'Failed to broadcast session change: {e}')
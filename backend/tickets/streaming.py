@@ -0,0 +1,57 @@
+"""Streaming response bodies that stay streamed under ASGI.
+
+Production serves the app with Daphne, through Django's ``ASGIHandler``.
+Given a synchronous iterator as a ``StreamingHttpResponse`` body, the
+handler consumes it whole with ``sync_to_async(list)`` before sending the
+first byte. ``stream_body`` gives ASGI requests an asynchronous iterator
+instead. It pulls one chunk at a time from the synchronous one, on the
+request's own thread, so database cursors stay valid and memory holds one
+chunk. WSGI requests keep the synchronous iterator.
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+_DONE = object()
+
+
+def _next(iterator):
+    return next(iterator, _DONE)
+
+
+async def _pull(iterator):
+    pull = sync_to_async(_next)
+    try:
+        while True:
+            chunk = await pull(iterator)
+            if chunk is _DONE:
+                return
+            yield chunk
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close)()
+
+
+def is_asgi(request):
+    """Whether ``request`` (a Django or DRF request) is being served over ASGI."""
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def stream_body(request, chunks):
+    """``chunks`` as a streaming body suited to the server handling ``request``."""
+    iterator = iter(chunks)
+    if is_asgi(request):
+        return _pull(iterator)
+    return iterator
+
+
+def read_blocks(fileobj, block_size):
+    """Yield ``fileobj`` in blocks of ``block_size`` bytes, closing it at the end."""
+    try:
+        while True:
+            block = fileobj.read(block_size)
+            if not block:
+                return
+            yield block
+    finally:
+        fileobj.close()
@@ -1,6 +1,7 @@
+from io import StringIO
 from types import SimpleNamespace
 
-from django.test import TestCase, SimpleTestCase
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
 
 from users.models import User
 from users.serializers import AdminUserCreateSerializer
@@ -61,3 +62,2519 @@ class SerializerSanitizationTests(TestCase):
         self.assertTrue(serializer.is_valid(), serializer.errors)
         self.assertEqual(serializer.validated_data['client_name'], 'Acme Corp')
         self.assertEqual(serializer.validated_data['additional_sales_reps'], ['Alice', 'Bob'])
+
+
+class TicketListQueryPlanTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+
+        from .models import (
+            AuditLog, Category, Client, EscalationLog, FeedbackRating, Product,
+            Ticket, TicketAttachment, TicketTask, TypeOfService,
+        )
+
+        self.admin = User.objects.create_user(
+            username='planner', email='planner@example.com', password='password123', role=User.ROLE_ADMIN,
+        )
+        self.employee = User.objects.create_user(
+            username='tech', email='tech@example.com', password='password123', role=User.ROLE_EMPLOYEE,
+        )
+        self.service = TypeOfService.objects.create(name='Repair', estimated_resolution_days=3)
+        self.category = Category.objects.create(name='Servers')
+        self.client_record = Client.objects.create(client_name='Acme Corp')
+        self.product = Product.objects.create(
+            project_title='Rollout', client=self.client_record, category=self.category, product_name='NAS',
+        )
+        self.models = {
+            'AuditLog': AuditLog, 'EscalationLog': EscalationLog, 'FeedbackRating': FeedbackRating,
+            'Ticket': Ticket, 'TicketAttachment': TicketAttachment, 'TicketTask': TicketTask,
+        }
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def _make_tickets(self, count):
+        m = self.models
+        previous = None
+        for _ in range(count):
+            ticket = m['Ticket'].objects.create(
+                created_by=self.admin, supervisor=self.admin, assigned_to=self.employee,
+                type_of_service=self.service, client_record=self.client_record, product_record=self.product,
+                priority=m['Ticket'].PRIORITY_HIGH, confirmed_by_admin=True,
+            )
+            m['TicketTask'].objects.create(ticket=ticket, description='Check logs', assigned_to=self.employee)
+            m['TicketAttachment'].objects.create(ticket=ticket, file='ticket_attachments/proof.png', uploaded_by=self.employee)
+            m['EscalationLog'].objects.create(
+                ticket=ticket, escalation_type=m['EscalationLog'].ESCALATION_INTERNAL,
+                from_user=self.employee, to_user=self.admin,
+            )
+            m['FeedbackRating'].objects.create(ticket=ticket, employee=self.employee, admin=self.admin, rating=5)
+            m['AuditLog'].log(
+                entity=m['AuditLog'].ENTITY_TICKET, entity_id=ticket.id,
+                action=m['AuditLog'].ACTION_OBSERVE, activity='observed', actor=self.employee,
+            )
+            if previous:
+                ticket.linked_tickets.add(previous)
+            previous = ticket
+
+    def _list_query_count(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.get('/api/tickets/')
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()
+
+    def test_list_query_count_is_independent_of_page_size(self):
+        self._make_tickets(3)
+        small_count, _ = self._list_query_count()
+        self._make_tickets(12)
+        large_count, data = self._list_query_count()
+
+        self.assertEqual(len(data), 15)
+        self.assertEqual(small_count, large_count)
+        self.assertLessEqual(large_count, 8)
+
+    def test_list_serializes_prefetched_relations(self):
+        self._make_tickets(2)
+        _, data = self._list_query_count()
+
+        newest = data[0]
+        self.assertTrue(newest['was_for_observation'])
+        self.assertEqual(len(newest['linked_ticket_stfs']), 1)
+        self.assertEqual(newest['product_record_detail']['category_detail']['product_count'], 1)
+        self.assertEqual(newest['feedback_rating']['rating'], 5)
+        self.assertEqual(newest['client'], 'Acme Corp')
+
+
+class TicketListPaginationTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+
+        from .models import Client, Ticket
+
+        self.admin = User.objects.create_user(
+            username='pager', email='pager@example.com', password='password123', role=User.ROLE_ADMIN,
+        )
+        client_record = Client.objects.create(client_name='Acme Corp')
+        for _ in range(7):
+            Ticket.objects.create(
+                created_by=self.admin, client_record=client_record, signature='data:image/png;base64,AAAA',
+            )
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def test_list_without_pagination_params_returns_plain_array(self):
+        response = self.api.get('/api/tickets/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.json(), list)
+        self.assertEqual(len(response.json()), 7)
+
+    def test_cursor_pages_cover_every_ticket_once(self):
+        seen = []
+        url = '/api/tickets/?page_size=3&view=summary'
+        while url:
+            body = self.api.get(url).json()
+            self.assertLessEqual(len(body['results']), 3)
+            seen.extend(row['id'] for row in body['results'])
+            url = body['next']
+
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+
+    def test_summary_view_emits_and_fetches_only_grid_columns(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .serializers import TicketSerializer
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.get('/api/tickets/?view=summary&page_size=5')
+
+        row = response.json()['results'][0]
+        self.assertEqual(set(row), set(TicketSerializer.SUMMARY_FIELDS))
+        self.assertEqual(row['client'], 'Acme Corp')
+        ticket_sql = [q['sql'] for q in ctx.captured_queries if 'FROM "tickets_ticket"' in q['sql']]
+        self.assertTrue(ticket_sql)
+        self.assertFalse(any('"signature"' in sql for sql in ticket_sql))
+        self.assertLessEqual(len(ctx.captured_queries), 2)
+
+    def test_fields_param_limits_output(self):
+        response = self.api.get('/api/tickets/?fields=stf_no,status')
+
+        self.assertEqual(set(response.json()[0]), {'id', 'stf_no', 'status'})
+
+
+class TicketSummarySerializerTests(TestCase):
+    def setUp(self):
+        from .models import Client, Product, Ticket
+
+        self.admin = User.objects.create_user(
+            username='summary', email='summary@example.com', password='password123', role=User.ROLE_ADMIN,
+        )
+        self.client_record = Client.objects.create(client_name='Acme Corp', contact_person='Jane Doe')
+        product = Product.objects.create(
+            project_title='Rollout', client=self.client_record, product_name='Firewall', brand='Acme',
+        )
+        self.with_links = Ticket.objects.create(
+            created_by=self.admin, client_record=self.client_record, product_record=product,
+        )
+        self.bare = Ticket.objects.create(created_by=self.admin)
+
+    def test_virtual_fields_are_filled_from_linked_records(self):
+        from .serializers import TicketSerializer
+
+        data = TicketSerializer(self.with_links).data
+
+        self.assertEqual(data['client'], 'Acme Corp')
+        self.assertEqual(data['contact_person'], 'Jane Doe')
+        self.assertEqual(data['product'], 'Firewall')
+        self.assertEqual(data['brand'], 'Acme')
+        self.assertEqual(data['date_purchased'], '')
+
+    def test_virtual_fields_default_to_blank_without_links(self):
+        from .serializers import TicketSerializer
+        from .serializers.ticket import VIRTUAL_FIELD_SOURCES
+
+        data = TicketSerializer(self.bare).data
+
+        for name in VIRTUAL_FIELD_SOURCES:
+            self.assertEqual(data[name], '', name)
+
+    def test_client_tickets_action_uses_summary_rows(self):
+        from rest_framework.test import APIClient
+
+        from .serializers import TicketSerializer
+
+        api = APIClient()
+        api.force_authenticate(self.admin)
+        response = api.get(f'/api/clients/{self.client_record.id}/tickets/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.json()], [self.with_links.id])
+        self.assertEqual(set(response.json()[0]), set(TicketSerializer.SUMMARY_FIELDS))
+        self.assertEqual(response.json()[0]['created_by']['username'], 'summary')
+
+
+class StfSequenceTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='stf', email='stf@example.com', password='password123', role=User.ROLE_ADMIN,
+        )
+
+    def test_numbers_follow_the_daily_counter(self):
+        import datetime as dt
+
+        from .models import StfSequence, Ticket
+
+        day = dt.date(2026, 3, 14)
+        first = Ticket.objects.create(created_by=self.admin, date=day)
+        second = Ticket.objects.create(created_by=self.admin, date=day)
+
+        self.assertEqual(first.stf_no, 'STF-MT-202603140001')
+        self.assertEqual(second.stf_no, 'STF-MT-202603140002')
+        self.assertEqual(StfSequence.objects.get(pk=day).last_value, 2)
+        self.assertEqual(Ticket.get_next_stf_no(day), 'STF-MT-202603140003')
+        self.assertEqual(StfSequence.objects.get(pk=day).last_value, 2)
+
+    def test_counter_is_seeded_from_tickets_numbered_before_it_existed(self):
+        import datetime as dt
+
+        from .models import StfSequence, Ticket
+
+        day = dt.date(2026, 3, 15)
+        Ticket.objects.create(created_by=self.admin, date=day, stf_no='STF-MT-202603150007')
+        self.assertFalse(StfSequence.objects.filter(pk=day).exists())
+
+        self.assertEqual(Ticket.get_next_stf_no(day), 'STF-MT-202603150008')
+        self.assertEqual(Ticket.objects.create(created_by=self.admin, date=day).stf_no, 'STF-MT-202603150008')
+
+    def test_failed_insert_returns_the_number(self):
+        import datetime as dt
+
+        from django.db import IntegrityError
+
+        from .models import Ticket
+
+        day = dt.date(2026, 3, 16)
+        Ticket.objects.create(created_by=self.admin, date=day)
+        with self.assertRaises(IntegrityError):
+            Ticket.objects.create(created_by=self.admin, date=day, status=None)
+
+        self.assertEqual(Ticket.objects.create(created_by=self.admin, date=day).stf_no, 'STF-MT-202603160002')
+
+
+class StfSequenceConcurrencyTests(TransactionTestCase):
+    def test_concurrent_creates_get_distinct_numbers(self):
+        import threading
+
+        from django.db import connection
+
+        from .models import Ticket
+
+        admin = User.objects.create_user(
+            username='stf-threads', email='stf-threads@example.com', password='password123', role=User.ROLE_ADMIN,
+        )
+        workers, per_worker = 8, 5
+        barrier = threading.Barrier(workers)
+        numbers, errors = [], []
+
+        def create_tickets():
+            try:
+                barrier.wait()
+                for _ in range(per_worker):
+                    numbers.append(Ticket.objects.create(created_by=admin).stf_no)
+            except Exception as exc:  # surfaced by the assertion below
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=create_tickets) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(numbers), workers * per_worker)
+        self.assertEqual(len(set(numbers)), workers * per_worker)
+        prefix = Ticket._get_stf_prefix()
+        self.assertEqual(
+            sorted(numbers),
+            [f'{prefix}{seq:04d}' for seq in range(1, workers * per_worker + 1)],
+        )
+
+
+class NotificationFanOutTests(TestCase):
+    def setUp(self):
+        self.creator = User.objects.create_user(
+            username='creator', email='creator@example.com', password='password123', role=User.ROLE_SALES,
+        )
+
+    def _make_admins(self, count, start=0):
+        return User.objects.bulk_create([
+            User(username=f'notify-admin-{i}', email=f'notify-admin-{i}@example.com', role=User.ROLE_ADMIN)
+            for i in range(start, start + count)
+        ])
+
+    def _ticket_create_queries(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .models import Ticket
+
+        with CaptureQueriesContext(connection) as ctx:
+            ticket = Ticket.objects.create(created_by=self.creator)
+        return ticket, len(ctx.captured_queries)
+
+    def test_new_ticket_fan_out_cost_is_independent_of_admin_count(self):
+        from .models import Notification
+
+        self._make_admins(2)
+        self._ticket_create_queries()  # opens today's STF counter row
+        _, few = self._ticket_create_queries()
+        self._make_admins(20, start=2)
+        ticket, many = self._ticket_create_queries()
+
+        self.assertEqual(few, many)
+        admins = User.objects.filter(role__in=[User.ROLE_ADMIN, User.ROLE_SUPERADMIN], is_active=True)
+        self.assertEqual(Notification.objects.filter(ticket=ticket).count(), admins.count())
+        # Includes the fixed cost of the ticket stats rollup rows.
+        self.assertLessEqual(many, 16)
+
+    def test_notify_many_pushes_one_event_per_recipient(self):
+        from asgiref.sync import async_to_sync
+        from channels.layers import get_channel_layer
+
+        from .dispatch import get_dispatcher
+        from .models import Notification, Ticket
+
+        admins = self._make_admins(3)
+        ticket = Ticket.objects.create(created_by=self.creator)
+        layer = get_channel_layer()
+        channel = async_to_sync(layer.new_channel)()
+        async_to_sync(layer.group_add)(f'notifications_{admins[1].id}', channel)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notifs = Notification.notify_many(
+                admins + [admins[1].id],
+                notification_type=Notification.TYPE_GENERAL,
+                title='Heads up',
+                ticket=ticket,
+            )
+        self.assertTrue(get_dispatcher().flush(timeout=5))
+
+        self.assertEqual([n.recipient_id for n in notifs], [a.id for a in admins])
+        event = async_to_sync(layer.receive)(channel)
+        self.assertEqual(event['notification']['id'], notifs[1].id)
+        self.assertEqual(event['notification']['ticket_stf_no'], ticket.stf_no)
+
+
+class NotificationDispatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='dispatch', email='dispatch@example.com', password='password123', role=User.ROLE_ADMIN,
+        )
+
+    def test_pushes_wait_for_commit(self):
+        from django.db import transaction
+
+        from . import dispatch
+        from .dispatch import NotificationDispatcher
+        from .models import Notification
+
+        class RecordingDispatcher(NotificationDispatcher):
+            def __init__(self):
+                self.sent = []
+
+            def dispatch(self, messages):
+                self.sent.extend(messages)
+
+        recorder = RecordingDispatcher()
+        original, dispatch._dispatcher = dispatch._dispatcher, recorder
+        try:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                Notification.notify(recipient=self.user, notification_type=Notification.TYPE_GENERAL, title='Kept')
+                try:
+                    with transaction.atomic():
+                        Notification.notify(recipient=self.user, notification_type=Notification.TYPE_GENERAL, title='Gone')
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                self.assertEqual(recorder.sent, [])
+        finally:
+            dispatch._dispatcher = original
+
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual([event['notification']['title'] for _, event in recorder.sent], ['Kept'])
+
+    def test_in_process_queue_drops_pushes_when_full(self):
+        from .dispatch import InProcessDispatcher
+
+        dispatcher = InProcessDispatcher(maxsize=1)
+        dispatcher._ensure_worker = lambda: None  # no worker: nothing drains the queue
+        message = [('notifications_1', {'type': 'send_notification', 'notification': {}})]
+
+        with self.assertLogs('tickets.dispatch', 'WARNING'):
+            dispatcher.dispatch(message)
+            dispatcher.dispatch(message)
+
+        self.assertEqual(dispatcher._queue.qsize(), 1)
+
+
+class MultiProcessChannelLayerTests(TransactionTestCase):
+    """Consumers in this process receive events published by another process."""
+
+    PUBLISH_SCRIPT = (
+        'import asyncio, json, sys\n'
+        'from tickets.channel_layers import SQLiteChannelLayer\n'
+        'layer = SQLiteChannelLayer(sys.argv[1])\n'
+        'asyncio.run(layer.group_send(sys.argv[2], json.loads(sys.argv[3])))\n'
+    )
+
+    def setUp(self):
+        import tempfile
+
+        from .models import Ticket
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.layer_path = f'{tmp.name}/layer.sqlite3'
+        layers = {'default': {
+            'BACKEND': 'tickets.channel_layers.SQLiteChannelLayer',
+            'CONFIG': {'path': self.layer_path},
+        }}
+        override = self.settings(CHANNEL_LAYERS=layers)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.admin = User.objects.create_user(
+            username='mp-admin', email='mp-admin@example.com', password='password123', role=User.ROLE_ADMIN,
+        )
+        self.employee = User.objects.create_user(
+            username='mp-tech', email='mp-tech@example.com', password='password123', role=User.ROLE_EMPLOYEE,
+        )
+        self.ticket = Ticket.objects.create(created_by=self.admin, assigned_to=self.employee)
+
+    def _publish_from_other_process(self, group, event):
+        import json
+        import subprocess
+        import sys
+
+        from django.conf import settings
+
+        subprocess.run(
+            [sys.executable, '-c', self.PUBLISH_SCRIPT, self.layer_path, group, json.dumps(event)],
+            cwd=settings.BASE_DIR, check=True, timeout=60,
+        )
+
+    async def _connect(self, consumer, path, user, **url_kwargs):
+        from channels.testing import WebsocketCommunicator
+
+        communicator = WebsocketCommunicator(consumer.as_asgi(), path)
+        communicator.scope['user'] = user
+        communicator.scope['url_route'] = {'kwargs': url_kwargs}
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    def test_notification_consumer_receives_cross_process_push(self):
+        from asgiref.sync import async_to_sync, sync_to_async
+
+        from .consumers import NotificationConsumer
+
+        async def scenario():
+            communicator = await self._connect(NotificationConsumer, '/ws/notifications/', self.admin)
+            self.assertEqual((await communicator.receive_json_from())['type'], 'unread_count')
+            await sync_to_async(self._publish_from_other_process)(
+                f'notifications_{self.admin.id}',
+                {'type': 'send_notification', 'notification': {'id': 1, 'title': 'From worker 2'}},
+            )
+            event = await communicator.receive_json_from(timeout=5)
+            await communicator.disconnect()
+            return event
+
+        event = async_to_sync(scenario)()
+        self.assertEqual(event, {'type': 'new_notification', 'notification': {'id': 1, 'title': 'From worker 2'}})
+
+    def test_group_send_honours_per_channel_capacity(self):
+        from asgiref.sync import async_to_sync
+
+        from .channel_layers import SQLiteChannelLayer
+
+        layer = SQLiteChannelLayer(self.layer_path, capacity=5, channel_capacity={'small.*': 1})
+
+        async def scenario():
+            await layer.group_add('fanout', 'small.one')
+            await layer.group_add('fanout', 'large.one')
+            for i in range(3):
+                await layer.group_send('fanout', {'type': 'tick', 'n': i})
+            return layer._conn.execute(
+                'SELECT channel, COUNT(*) FROM channel_message GROUP BY channel ORDER BY channel'
+            ).fetchall()
+
+        self.assertEqual(async_to_sync(scenario)(), [('large.one', 3), ('small.one', 1)])
+
+    def test_unknown_config_options_are_rejected_by_name(self):
+        from django.core.exceptions import ImproperlyConfigured
+
+        from .channel_layers import SQLiteChannelLayer
+
+        with self.assertRaisesMessage(ImproperlyConfigured, 'hosts, prefix'):
+            SQLiteChannelLayer(self.layer_path, prefix='maptech', hosts=['redis://localhost'])
+
+    def test_chat_force_disconnect_only_closes_the_targeted_user(self):
+        from asgiref.sync import async_to_sync, sync_to_async
+
+        from .consumers import TicketChatConsumer
+
+        group = f'chat_{self.ticket.id}_admin_employee'
+        kwargs = {'ticket_id': self.ticket.id, 'channel_type': 'admin_employee'}
+
+        async def scenario():
+            path = f'/ws/chat/{self.ticket.id}/admin_employee/'
+            admin_ws = await self._connect(TicketChatConsumer, path, self.admin, **kwargs)
+            employee_ws = await self._connect(TicketChatConsumer, path, self.employee, **kwargs)
+            for ws in (admin_ws, employee_ws):
+                self.assertEqual((await ws.receive_json_from())['type'], 'message_history')
+
+            await sync_to_async(self._publish_from_other_process)(
+                group, {'type': 'force_disconnect', 'user_id': self.employee.id, 'reason': 'Reassigned'},
+            )
+            employee_event = await employee_ws.receive_json_from(timeout=5)
+            self.assertEqual((await employee_ws.receive_output(timeout=5))['type'], 'websocket.close')
+
+            await sync_to_async(self._publish_from_other_process)(
+                group, {'type': 'chat_message', 'message': {'id': 7, 'content': 'still here'}},
+            )
+            admin_event = await admin_ws.receive_json_from(timeout=5)
+            await admin_ws.disconnect()
+            return employee_event, admin_event
+
+        employee_event, admin_event = async_to_sync(scenario)()
+        self.assertEqual(employee_event['type'], 'force_disconnect')
+        self.assertEqual(admin_event, {'type': 'new_message', 'message': {'id': 7, 'content': 'still here'}})
+
+
+class ChatHistoryPagingTests(TransactionTestCase):
+    def setUp(self):
+        from .models import Message, Ticket
+
+        self.admin = User.objects.create_user(
+            username='history-admin', email='history-admin@example.com', password='password123', role=User.ROLE_ADMIN,
+        )
+        self.ticket = Ticket.objects.create(created_by=self.admin)
+        self.messages = [
+            Message.objects.create(
+                ticket=self.ticket, channel_type='admin_employee', sender=self.admin, content=f'msg {i}',
+            )
+            for i in range(7)
+        ]
+        self.ids = [m.id for m in self.messages]
+
+    def _run(self, query_string, actions=()):
+        from unittest import mock
+
+        from asgiref.sync import async_to_sync
+        from channels.testing import WebsocketCommunicator
+
+        from .consumers import TicketChatConsumer
+
+        async def scenario():
+            communicator = WebsocketCommunicator(
+                TicketChatConsumer.as_asgi(), f'/ws/chat/{self.ticket.id}/admin_employee/?{query_string}',
+            )
+            communicator.scope['user'] = self.admin
+            communicator.scope['url_route'] = {
+                'kwargs': {'ticket_id': self.ticket.id, 'channel_type': 'admin_employee'},
+            }
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            frames = [await communicator.receive_json_from()]
+            for action in actions:
+                await communicator.send_json_to(action)
+                frames.append(await communicator.receive_json_from())
+            await communicator.disconnect()
+            return frames
+
+        with mock.patch.object(TicketChatConsumer, 'HISTORY_PAGE_SIZE', 3):
+            return async_to_sync(scenario)()
+
+    def test_connect_sends_latest_page_and_load_history_walks_back(self):
+        frames = self._run('', actions=[
+            {'action': 'load_history', 'before_id': self.ids[4]},
+            {'action': 'load_history', 'before_id': self.ids[1], 'limit': 5},
+        ])
+
+        first, older, oldest = frames
+        self.assertEqual(first['type'], 'message_history')
+        self.assertEqual([m['id'] for m in first['messages']], self.ids[4:])
+        self.assertTrue(first['has_more'])
+        self.assertFalse(first['incremental'])
+        self.assertEqual(older['type'], 'history_page')
+        self.assertEqual([m['id'] for m in older['messages']], self.ids[1:4])
+        self.assertTrue(older['has_more'])
+        self.assertEqual([m['id'] for m in oldest['messages']], self.ids[:1])
+        self.assertFalse(oldest['has_more'])
+
+    def test_since_id_resumes_with_only_missed_messages(self):
+        (frame,) = self._run(f'since_id={self.ids[4]}')
+
+        self.assertTrue(frame['incremental'])
+        self.assertFalse(frame['has_more'])
+        self.assertEqual([m['id'] for m in frame['messages']], self.ids[5:])
+
+    def test_since_id_too_far_back_falls_back_to_latest_page(self):
+        (frame,) = self._run(f'since_id={self.ids[0]}')
+
+        self.assertFalse(frame['incremental'])
+        self.assertTrue(frame['has_more'])
+        self.assertEqual([m['id'] for m in frame['messages']], self.ids[4:])
+
+
+class ChatReadReceiptBatchingTests(TransactionTestCase):
+    def setUp(self):
+        from .models import Message, Ticket
+
+        self.admin = User.objects.create_user(
+            username='receipt-admin', email='receipt-admin@example.com', password='password123', role=User.ROLE_ADMIN,
+        )
+        self.reader = User.objects.create_user(
+            username='receipt-reader', email='receipt-reader@example.com', password='password123', role=User.ROLE_ADMIN,
+        )
+        self.ticket = Ticket.objects.create(created_by=self.admin)
+        other_ticket = Ticket.objects.create(created_by=self.admin)
+        self.ids = [
+            m.id for m in Message.objects.bulk_create([
+                Message(ticket=self.ticket, channel_type='admin_employee', sender=self.admin, content=f'msg {i}')
+                for i in range(200)
+            ])
+        ]
+        self.foreign_id = Message.objects.create(
+            ticket=other_ticket, channel_type='admin_employee', sender=self.admin, content='elsewhere',
+        ).id
+
+    def _consumer(self):
+        from .consumers import TicketChatConsumer
+
+        consumer = TicketChatConsumer()
+        consumer.user, consumer.ticket_id, consumer.channel_type = self.reader, self.ticket.id, 'admin_employee'
+        return consumer
+
+    def test_mark_read_is_one_fetch_and_one_bulk_insert(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .consumers import TicketChatConsumer
+        from .models import MessageReadReceipt
+
+        MessageReadReceipt.objects.create(message_id=self.ids[0], user=self.reader)
+        mark_read = TicketChatConsumer.__dict__['_mark_messages_read'].func
+
+        with CaptureQueriesContext(connection) as ctx:
+            receipts = mark_read(self._consumer(), self.ids + [self.foreign_id])
+
+        statements = [
+            q['sql'] for q in ctx.captured_queries
+            if q['sql'] not in ('BEGIN', 'COMMIT') and not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))
+        ]
+        self.assertEqual(len(statements), 2)  # one validated id__in fetch, one bulk insert
+
+        self.assertEqual(sorted(r['message_id'] for r in receipts), self.ids[1:])
+        self.assertEqual(MessageReadReceipt.objects.filter(user=self.reader).count(), 200)
+        self.assertFalse(MessageReadReceipt.objects.filter(message_id=self.foreign_id).exists())
+
+    def test_receipts_written_by_another_socket_are_not_broadcast_again(self):
+        from unittest import mock
+
+        from django.db import transaction
+
+        from .consumers import TicketChatConsumer
+        from .models import MessageReadReceipt
+
+        mark_read = TicketChatConsumer.__dict__['_mark_messages_read'].func
+        atomic = transaction.atomic
+        raced = []
+
+        def racing_atomic(*args, **kwargs):
+            # The reader's other tab marks two of them read after the unread fetch.
+            if not raced:
+                raced.append(True)
+                for mid in self.ids[1:3]:
+                    MessageReadReceipt.objects.create(message_id=mid, user=self.reader)
+            return atomic(*args, **kwargs)
+
+        with mock.patch.object(transaction, 'atomic', racing_atomic):
+            receipts = mark_read(self._consumer(), self.ids[:5])
+
+        self.assertEqual(sorted(r['message_id'] for r in receipts), [self.ids[0], *self.ids[3:5]])
+        self.assertEqual(MessageReadReceipt.objects.filter(user=self.reader, message_id__in=self.ids[:5]).count(), 5)
+
+    def test_rapid_mark_read_frames_are_coalesced_into_one_event(self):
+        from unittest import mock
+
+        from asgiref.sync import async_to_sync
+        from channels.testing import WebsocketCommunicator
+
+        from .consumers import TicketChatConsumer
+
+        mark_read = TicketChatConsumer.__dict__['_mark_messages_read']
+
+        async def scenario():
+            communicator = WebsocketCommunicator(
+                TicketChatConsumer.as_asgi(), f'/ws/chat/{self.ticket.id}/admin_employee/',
+            )
+            communicator.scope['user'] = self.reader
+            communicator.scope['url_route'] = {
+                'kwargs': {'ticket_id': self.ticket.id, 'channel_type': 'admin_employee'},
+            }
+            await communicator.connect()
+            await communicator.receive_json_from()  # message_history
+            await communicator.send_json_to({'action': 'mark_read', 'message_ids': self.ids[:120]})
+            await communicator.send_json_to({'action': 'mark_read', 'message_ids': self.ids[100:] + ['x']})
+            event = await communicator.receive_json_from(timeout=5)
+            self.assertTrue(await communicator.receive_nothing(timeout=TicketChatConsumer.READ_RECEIPT_WINDOW * 2))
+            await communicator.disconnect()
+            return event
+
+        calls = []
+
+        async def counting_mark_read(consumer, message_ids):
+            calls.append(message_ids)
+            return await mark_read(consumer, message_ids)
+
+        with mock.patch.object(TicketChatConsumer, '_mark_messages_read', counting_mark_read):
+            event = async_to_sync(scenario)()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(event['type'], 'read_receipt')
+        self.assertEqual(sorted(r['message_id'] for r in event['data']), self.ids)
+
+
+class ChatConnectionContextTests(TestCase):
+    def setUp(self):
+        from .models import AssignmentSession, Message, Ticket
+
+        self.admin = User.objects.create_user(
+            username='ctx-admin', email='ctx-admin@example.com', password='password123', role=User.ROLE_ADMIN,
+        )
+        self.employee = User.objects.create_user(
+            username='ctx-tech', email='ctx-tech@example.com', password='password123', role=User.ROLE_EMPLOYEE,
+        )
+        self.ticket = Ticket.objects.create(created_by=self.admin, assigned_to=self.employee)
+        self.session = AssignmentSession.objects.create(ticket=self.ticket, employee=self.employee)
+        self.earlier = Message.objects.create(
+            ticket=self.ticket, assignment_session=self.session, channel_type='admin_employee',
+            sender=self.admin, content='Please check the firewall logs.',
+        )
+
+    def _consumer(self, user):
+        from .consumers import TicketChatConsumer
+
+        consumer = TicketChatConsumer()
+        consumer.user, consumer.ticket_id, consumer.channel_type = user, self.ticket.id, 'admin_employee'
+        consumer._context, consumer._reply_cache = None, {}
+        return consumer
+
+    def _save(self, consumer, content, reply_to=None):
+        from .consumers import TicketChatConsumer
+
+        return TicketChatConsumer.__dict__['_save_message'].func(consumer, content, reply_to)
+
+    def test_message_costs_one_insert_once_the_connection_is_set_up(self):
+        consumer = self._consumer(self.employee)
+        consumer._load_context()
+        self._save(consumer, 'warm-up')  # resolves the assignment session once
+        consumer._remember_messages([consumer._serialize_message(self.earlier)])
+
+        with self.assertNumQueries(1):
+            payload = self._save(consumer, 'Logs attached.', reply_to=self.earlier.id)
+
+        self.assertEqual(payload['sender_id'], self.employee.id)
+        self.assertEqual(payload['reply_to']['id'], self.earlier.id)
+        self.assertEqual(payload['reply_to']['sender_username'], 'ctx-admin')
+        self.assertEqual((payload['reactions'], payload['read_by']), ({}, []))
+
+    def test_reply_to_a_message_outside_the_room_is_dropped(self):
+        from .models import Message, Ticket
+
+        other = Ticket.objects.create(created_by=self.admin)
+        foreign = Message.objects.create(ticket=other, channel_type='admin_employee', sender=self.admin, content='x')
+
+        payload = self._save(self._consumer(self.admin), 'hello', reply_to=foreign.id)
+
+        self.assertIsNone(payload['reply_to'])
+
+    def test_session_change_reloads_context_and_rechecks_access(self):
+        from asgiref.sync import async_to_sync
+
+        consumer = self._consumer(self.employee)
+        self.assertTrue(consumer._load_context()['allowed'])
+        self.ticket.assigned_to = self.admin
+        self.ticket.save(update_fields=['assigned_to'])
+
+        self.assertIsNotNone(self._save(consumer, 'still cached'))
+        async_to_sync(consumer.session_changed)({'type': 'session_changed'})
+        self.assertIsNone(self._save(consumer, 'no longer assigned'))
+
+    def test_auto_created_session_does_not_resave_the_cached_ticket(self):
+        from .models import AssignmentSession, Notification, Ticket, TicketStatsSnapshot
+
+        legacy = Ticket.objects.create(created_by=self.admin, assigned_to=self.employee)
+        consumer = self._consumer(self.employee)
+        consumer.ticket_id = legacy.id
+        consumer._load_context()
+        fresh = Ticket.objects.get(pk=legacy.pk)
+        fresh.status = Ticket.STATUS_ESCALATED
+        fresh.save()
+
+        notifications = Notification.objects.count()
+
+        self.assertIsNotNone(self._save(consumer, 'first message'))
+
+        # No status-change notifications from the cached, pre-escalation copy.
+        self.assertEqual(Notification.objects.count(), notifications)
+        legacy.refresh_from_db()
+        self.assertEqual(legacy.status, Ticket.STATUS_ESCALATED)
+        self.assertEqual(legacy.current_session, AssignmentSession.objects.get(ticket=legacy))
+        self.assertEqual(TicketStatsSnapshot.find_drift(), [])
+
+    def test_session_save_broadcasts_session_changed_on_commit(self):
+        from . import dispatch
+        from .models import AssignmentSession
+
+        sent = []
+        recorder = dispatch.NotificationDispatcher()
+        recorder.dispatch = sent.extend
+        original, dispatch._dispatcher = dispatch._dispatcher, recorder
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                AssignmentSession.objects.create(ticket=self.ticket, employee=self.admin)
+        finally:
+            dispatch._dispatcher = original
+
+        self.assertEqual([group for group, _ in sent], [f'chat_{self.ticket.id}_admin_employee'])
+        self.assertEqual(sent[0][1]['type'], 'session_changed')
+
+
+class TicketStatsSnapshotTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='stats-admin', email='stats-admin@example.com', password='password123', role=User.ROLE_ADMIN,
+        )
+        self.sales = User.objects.create_user(
+            username='stats-sales', email='stats-sales@example.com', password='password123', role=User.ROLE_SALES,
+        )
+        self.employee = User.objects.create_user(
+            username='stats-tech', email='stats-tech@example.com', password='password123', role=User.ROLE_EMPLOYEE,
+        )
+
+    def _stats(self, user, **params):
+        from rest_framework.test import APIClient
+
+        api = APIClient()
+        api.force_authenticate(user)
+        response = api.get('/api/tickets/stats/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_counters_follow_ticket_changes(self):
+        import datetime as dt
+
+        from django.utils import timezone
+
+        from .models import Ticket, TicketStatsSnapshot
+
+        first = Ticket.objects.create(created_by=self.sales, priority=Ticket.PRIORITY_HIGH)
+        second = Ticket.objects.create(created_by=self.admin, assigned_to=self.employee)
+        third = Ticket.objects.create(created_by=self.sales, assigned_to=self.employee)
+
+        second.status = Ticket.STATUS_CLOSED
+        second.time_in = timezone.now() - dt.timedelta(hours=3)
+        second.time_out = timezone.now()
+        second.save()
+        first.assigned_to = self.employee
+        first.status = Ticket.STATUS_ESCALATED
+        first.save()
+        third.delete()
+
+        admin_stats = self._stats(self.admin)
+        self.assertEqual(admin_stats['total'], 2)
+        self.assertEqual(admin_stats['by_status'], {'closed': 1, 'escalated': 1})
+        self.assertEqual(admin_stats['by_priority'], {'high': 1})
+        self.assertEqual(admin_stats['escalated'], 1)
+        self.assertAlmostEqual(admin_stats['avg_resolution_time'], 3, places=2)
+
+        self.assertEqual(self._stats(self.sales)['total'], 1)
+        self.assertEqual(self._stats(self.employee)['by_status'], {'closed': 1, 'escalated': 1})
+        today = timezone.localdate().isoformat()
+        self.assertEqual(self._stats(self.admin, day=today)['total'], 2)
+        self.assertEqual(self._stats(self.admin, day='2000-01-01')['total'], 0)
+        self.assertEqual(TicketStatsSnapshot.find_drift(), [])
+
+    def test_partial_save_of_a_stale_ticket_leaves_the_rollup_alone(self):
+        from .models import AssignmentSession, Ticket, TicketStatsSnapshot
+
+        ticket = Ticket.objects.create(created_by=self.sales)
+        stale = Ticket.objects.get(pk=ticket.pk)
+        ticket.assigned_to = self.employee
+        ticket.status = Ticket.STATUS_ESCALATED
+        ticket.save()
+        before = list(TicketStatsSnapshot.objects.order_by('key').values())
+
+        stale.current_session = AssignmentSession.objects.create(ticket=ticket, employee=self.employee)
+        stale.save(update_fields=['current_session'])
+        self.assertEqual(list(TicketStatsSnapshot.objects.order_by('key').values()), before)
+
+        # A partial save that does touch the state uses the row's other columns.
+        stale.priority = Ticket.PRIORITY_HIGH
+        stale.save(update_fields=['priority'])
+        self.assertEqual(TicketStatsSnapshot.find_drift(), [])
+        self.assertEqual(self._stats(self.employee)['by_status'], {'escalated': 1})
+
+    def test_stats_reads_one_row(self):
+        from .models import Ticket
+
+        for _ in range(3):
+            Ticket.objects.create(created_by=self.sales)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self._stats(self.sales)['open'], 3)
+
+    def test_rebuild_repairs_drift(self):
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+
+        from .models import Ticket, TicketStatsSnapshot
+
+        Ticket.objects.create(created_by=self.sales, assigned_to=self.employee)
+        # Writes that bypass signals leave the rollup stale.
+        Ticket.objects.update(status=Ticket.STATUS_CLOSED)
+
+        self.assertIn(('all::', 'status_open', 1, 0), TicketStatsSnapshot.find_drift())
+        with self.assertRaises(CommandError):
+            call_command('rebuild_ticket_stats', '--check', stdout=StringIO())
+
+        call_command('rebuild_ticket_stats', stdout=StringIO())
+        self.assertEqual(TicketStatsSnapshot.find_drift(), [])
+        self.assertEqual(self._stats(self.employee)['closed'], 1)
+
+
+def _asgi_get(client, path, query_string='', headers=None, on_body=None):
+    """GET ``path`` through Django's ASGIHandler, as Daphne serves it, with ``client``'s cookies.
+
+    ``on_body`` sees each body chunk as it is sent. Returns ``(status, body)``.
+    """
+    import asyncio
+
+    from asgiref.sync import async_to_sync
+    from django.core.handlers.asgi import ASGIHandler
+    from django.core.signals import request_finished, request_started
+    from django.db import close_old_connections
+
+    cookie = '; '.join(f'{key}={morsel.value}' for key, morsel in client.cookies.items())
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': query_string.encode(),
+        'headers': [(b'cookie', cookie.encode())] + [
+            (name.lower().encode(), value.encode()) for name, value in (headers or {}).items()
+        ],
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 50000),
+    }
+    requests = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    status, body = [], []
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        await asyncio.sleep(3600)  # the client never disconnects; the handler cancels this
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        elif message.get('body'):
+            if on_body:
+                on_body(message['body'])
+            body.append(message['body'])
+
+    # Like the test client, keep the test's connection (and its transaction) open.
+    request_started.disconnect(close_old_connections)
+    request_finished.disconnect(close_old_connections)
+    try:
+        async_to_sync(ASGIHandler())(scope, receive, send)
+    finally:
+        request_started.connect(close_old_connections)
+        request_finished.connect(close_old_connections)
+    return status[0], b''.join(body)
+
+
+class StreamingExportTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+
+        self.superadmin = User.objects.create_user(
+            username='export-root', email='export-root@example.com', password='password123',
+            role=User.ROLE_SUPERADMIN,
+        )
+        self.employee = User.objects.create_user(
+            username='export-tech', email='export-tech@example.com', password='password123',
+            role=User.ROLE_EMPLOYEE, first_name='Ada', last_name='Tech',
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.superadmin)
+
+    def _make_logs(self, count):
+        import datetime as dt
+
+        from django.utils import timezone
+
+        from .models import AuditLog
+
+        start = timezone.now() - dt.timedelta(days=90)
+        logs = AuditLog.objects.bulk_create([
+            AuditLog(
+                entity=AuditLog.ENTITY_TICKET, entity_id=i, action=AuditLog.ACTION_UPDATE,
+                activity=f'update {i}', actor=self.employee, actor_email=self.employee.email,
+                changes={'n': i} if i % 2 else None,
+            )
+            for i in range(count)
+        ])
+        # auto_now_add ignores explicit values; spread the rows over 90 days afterwards.
+        for i, log in enumerate(logs):
+            log.timestamp = start + dt.timedelta(minutes=i * 90 * 24 * 60 // count)
+        AuditLog.objects.bulk_update(logs, ['timestamp'], batch_size=1000)
+
+    def _body(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_audit_csv_is_not_capped(self):
+        import csv
+        import io
+
+        self._make_logs(5200)
+        response = self.api.get('/api/audit-logs/export/', {'entity': 'Ticket'})
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(io.StringIO(self._body(response).decode())))
+        self.assertEqual(rows[0][0], 'Timestamp')
+        self.assertEqual(len(rows), 5201)
+        self.assertEqual(rows[1][5], 'Ada Tech')
+
+    def test_asgi_export_sends_the_first_chunk_before_reading_every_row(self):
+        from unittest import mock
+
+        from .exports import StreamingExport
+
+        self._make_logs(5200)
+        csv_lines = StreamingExport.csv_lines
+        produced, at_first_chunk = [], []
+
+        def counting_lines(export, rows):
+            for line in csv_lines(export, rows):
+                produced.append(line)
+                yield line
+
+        def on_body(chunk):
+            if not at_first_chunk:
+                at_first_chunk.append(len(produced))
+
+        self.client.force_login(self.superadmin)
+        with mock.patch.object(StreamingExport, 'csv_lines', counting_lines):
+            status, body = _asgi_get(self.client, '/api/audit-logs/export/', 'entity=Ticket', on_body=on_body)
+
+        self.assertEqual(status, 200)
+        self.assertEqual(len(produced), 5201)
+        self.assertEqual(body.decode(), ''.join(produced))
+        self.assertLess(at_first_chunk[0], len(produced))
+
+    def test_jsonl_gzip_and_shards_match_plain_export(self):
+        import gzip
+        import json
+
+        self._make_logs(300)
+        plain = self._body(self.api.get('/api/audit-logs/export/', {'entity': 'Ticket', 'format': 'jsonl'}))
+        sharded = self._body(self.api.get('/api/audit-logs/export/', {'entity': 'Ticket', 'format': 'jsonl', 'shard': 'week'}))
+        response = self.api.get('/api/audit-logs/export/', {'entity': 'Ticket', 'format': 'jsonl', 'shard': 'month', 'compress': 'gzip'})
+
+        records = [json.loads(line) for line in plain.decode().splitlines()]
+        self.assertEqual(len(records), 300)
+        self.assertEqual(records[0]['changes'], {'n': 299})
+        self.assertEqual(sharded, plain)
+        self.assertTrue(response['Content-Disposition'].endswith('.jsonl.gz"'))
+        self.assertEqual(gzip.decompress(self._body(response)), plain)
+        self.assertEqual(self.api.get('/api/audit-logs/export/', {'shard': 'year'}).status_code, 400)
+
+    def test_escalation_export_accepts_format_and_date_range(self):
+        import csv
+        import io
+
+        from django.utils import timezone
+
+        from .models import EscalationLog, Ticket
+
+        ticket = Ticket.objects.create(created_by=self.superadmin)
+        EscalationLog.objects.create(
+            ticket=ticket, escalation_type='internal', from_user=self.employee, notes='needs help',
+        )
+        today = timezone.localdate().isoformat()
+
+        rows = list(csv.reader(io.StringIO(self._body(self.api.get(
+            '/api/escalation-logs/export/', {'format': 'csv', 'date_from': today, 'date_to': today},
+        )).decode())))
+        self.assertEqual(rows[1][:3], [ticket.stf_no, 'internal', 'Ada Tech'])
+
+        empty = self._body(self.api.get('/api/escalation-logs/export/', {'date_to': '2000-01-01'}))
+        self.assertEqual(len(empty.decode().splitlines()), 1)
+
+
+class RetentionPurgeTests(TestCase):
+    def setUp(self):
+        import datetime as dt
+
+        from django.utils import timezone
+
+        from .models import AuditLog, CallLog, RetentionPolicy
+
+        self.admin = User.objects.create_user(
+            username='purge', email='purge@example.com', password='password123', role=User.ROLE_ADMIN,
+        )
+        AuditLog.objects.all().delete()
+        old = timezone.now() - dt.timedelta(days=40)
+        logs = AuditLog.objects.bulk_create([
+            AuditLog(entity=AuditLog.ENTITY_USER, action=AuditLog.ACTION_LOGIN, activity=f'login {i}')
+            for i in range(25)
+        ])
+        AuditLog.objects.filter(pk__in=[log.pk for log in logs[:20]]).update(timestamp=old)
+        call = CallLog.objects.create(admin=self.admin, call_start=old)
+        CallLog.objects.filter(pk=call.pk).update(created_at=old)
+
+        policy = RetentionPolicy.get_policy()
+        policy.audit_log_retention_days = 30
+        policy.call_log_retention_days = 0
+        policy.save()
+
+    def test_dry_run_only_counts(self):
+        from .models import AuditLog
+        from .retention import purge_target
+
+        result = purge_target('audit_log', dry_run=True)
+
+        self.assertEqual(result['would_delete'], 20)
+        self.assertEqual(AuditLog.objects.count(), 25)
+
+    def test_purges_expired_rows_in_batches_and_respects_keep_forever(self):
+        from .models import AuditLog, CallLog
+        from .retention import purge_expired
+
+        results = {r['target']: r for r in purge_expired(batch_size=6)}
+
+        self.assertEqual(results['audit_log']['deleted'], 20)
+        self.assertEqual(results['audit_log']['batches'], 4)
+        self.assertTrue(results['audit_log']['finished'])
+        self.assertEqual(results['call_log']['skipped'], 'keep forever')
+        self.assertEqual(AuditLog.objects.count(), 5)
+        self.assertEqual(CallLog.objects.count(), 1)
+
+    def test_interrupted_run_resumes_with_its_cutoff(self):
+        from django.core.management import call_command
+
+        from .models import AuditLog, RetentionPolicy, RetentionPurgeRun
+        from .retention import purge_target
+
+        first = purge_target('audit_log', batch_size=5, max_batches=2)
+        self.assertEqual(first['deleted'], 10)
+        self.assertFalse(first['finished'])
+
+        # A stricter policy must not change the cutoff of the run in progress.
+        policy = RetentionPolicy.get_policy()
+        policy.audit_log_retention_days = 1
+        policy.save()
+        self.assertEqual(purge_target('audit_log', dry_run=True)['would_delete'], 10)
+
+        out = StringIO()
+        call_command('purge_retention', '--target', 'audit_log', '--batch-size', '5', stdout=out)
+        self.assertIn('deleted 10 rows in 2 batches', out.getvalue())
+        self.assertEqual(AuditLog.objects.count(), 5)
+        run = RetentionPurgeRun.objects.get()
+        self.assertEqual((run.deleted, run.batches), (20, 4))
+        self.assertIsNotNone(run.finished_at)
+
+
+class AuditArchiveTests(TestCase):
+    def setUp(self):
+        import datetime as dt
+        import tempfile
+
+        from django.utils import timezone
+        from rest_framework.test import APIClient
+
+        from .models import AuditLog
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = self.settings(MEDIA_ROOT=tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.superadmin = User.objects.create_user(
+            username='archive-root', email='archive-root@example.com', password='password123',
+            role=User.ROLE_SUPERADMIN,
+        )
+        self.employee = User.objects.create_user(
+            username='archive-tech', email='archive-tech@example.com', password='password123',
+            role=User.ROLE_EMPLOYEE, first_name='Ada', last_name='Tech',
+        )
+        AuditLog.objects.all().delete()
+        logs = AuditLog.objects.bulk_create([
+            AuditLog(
+                entity=AuditLog.ENTITY_TICKET if i % 2 else AuditLog.ENTITY_USER, entity_id=i,
+                action=AuditLog.ACTION_UPDATE, activity=f'update {i}',
+                actor=self.employee, actor_email=self.employee.email, actor_role=self.employee.role,
+            )
+            for i in range(12)
+        ])
+        self.old = timezone.now() - dt.timedelta(days=100)
+        for i, log in enumerate(logs[:10]):
+            log.timestamp = self.old + dt.timedelta(hours=i)
+        AuditLog.objects.bulk_update(logs[:10], ['timestamp'])
+
+        self.api = APIClient()
+        self.api.force_authenticate(self.superadmin)
+
+    def test_archives_aged_rows_into_indexed_segments(self):
+        from pathlib import Path
+
+        from django.conf import settings
+
+        from .archive import archive_audit_logs, read_segment
+        from .models import AuditArchiveSegment, AuditLog
+
+        self.assertEqual(archive_audit_logs(30, dry_run=True)['would_archive'], 10)
+        result = archive_audit_logs(30, segment_size=4)
+
+        self.assertEqual((result['archived'], result['segments']), (10, 3))
+        self.assertEqual(AuditLog.objects.count(), 2)
+        segments = list(AuditArchiveSegment.objects.order_by('first_pk'))
+        self.assertEqual([s.row_count for s in segments], [4, 4, 2])
+        self.assertEqual(segments[0].actor_ids, [self.employee.pk])
+        self.assertEqual(segments[0].actor_roles, [User.ROLE_EMPLOYEE])
+        self.assertEqual(segments[0].entities, [AuditLog.ENTITY_TICKET, AuditLog.ENTITY_USER])
+        self.assertTrue(Path(settings.MEDIA_ROOT, segments[0].path).exists())
+        records = list(read_segment(segments[0]))
+        self.assertEqual(records[0]['activity'], 'update 0')
+        self.assertEqual(records[0]['actor_name'], 'Ada Tech')
+
+        # Nothing left to move; a rerun writes no new segment.
+        self.assertEqual(archive_audit_logs(30)['segments'], 0)
+
+    def test_list_searches_archive_only_for_ranges_outside_the_hot_table(self):
+        from .archive import archive_audit_logs
+
+        archive_audit_logs(30, segment_size=4)
+
+        hot_only = self.api.get('/api/audit-logs/')
+        self.assertEqual(len(hot_only.json()), 2)
+
+        date_from = f'{self.old:%Y-%m-%d}'
+        both = self.api.get('/api/audit-logs/', {'date_from': date_from}).json()
+        self.assertEqual(len(both), 12)
+        self.assertEqual(both[2]['activity'], 'update 9')
+        self.assertEqual(both[-1]['activity'], 'update 0')
+        self.assertEqual(both[-1]['actor_name'], 'Ada Tech')
+
+        users = self.api.get('/api/audit-logs/', {'date_from': date_from, 'entity': 'User', 'search': 'update 4'})
+        self.assertEqual([r['activity'] for r in users.json()], ['update 4'])
+
+    def test_archived_tail_is_paged_with_a_link_to_the_rest(self):
+        import re
+        from unittest import mock
+
+        from . import archive
+        from .archive import archive_audit_logs
+        from .views.audit import AuditLogViewSet
+
+        archive_audit_logs(30, segment_size=2)  # five segments
+        read_segment = archive.read_segment
+        opened = []
+
+        def counting_read(segment):
+            opened.append(segment.pk)
+            return read_segment(segment)
+
+        pages = []
+        url, params = '/api/audit-logs/', {'date_from': f'{self.old:%Y-%m-%d}'}
+        with mock.patch.object(AuditLogViewSet, 'archive_page_size', 3), \
+                mock.patch.object(archive, 'read_segment', counting_read):
+            while url:
+                opened.clear()
+                response = self.api.get(url, params)
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(len(opened), 3)  # never the whole archive
+                pages.append([r['activity'] for r in response.json()])
+                link = re.match(r'<([^>]+)>; rel="next"', response.get('Link', ''))
+                url, params = (link.group(1), None) if link else (None, None)
+
+        self.assertEqual(pages[0][:2], ['update 11', 'update 10'])  # the hot rows come first, once
+        self.assertEqual([len(page) for page in pages], [5, 3, 3, 1])
+        self.assertEqual(sum(pages, [])[2:], [f'update {i}' for i in range(9, -1, -1)])
+
+        bad = self.api.get('/api/audit-logs/', {'date_from': f'{self.old:%Y-%m-%d}', 'archive_cursor': 'x'})
+        self.assertEqual(bad.status_code, 400)
+
+    def test_archived_logs_are_scoped_by_the_actor_role_snapshot(self):
+        from rest_framework.test import APIClient
+
+        from .archive import archive_audit_logs
+        from .models import AuditLog
+
+        system = AuditLog.objects.create(
+            entity=AuditLog.ENTITY_USER, entity_id=0, action=AuditLog.ACTION_UPDATE, activity='system sweep',
+        )
+        AuditLog.objects.filter(pk=system.pk).update(timestamp=self.old)
+        archive_audit_logs(30, segment_size=4)
+        # A later promotion does not change which entries the employee's work shows up in.
+        self.employee.role = User.ROLE_ADMIN
+        self.employee.save(update_fields=['role'])
+
+        admin = User.objects.create_user(
+            username='archive-admin', email='archive-admin@example.com', password='password123', role=User.ROLE_ADMIN,
+        )
+        api = APIClient()
+        api.force_authenticate(admin)
+        date_from = f'{self.old:%Y-%m-%d}'
+        activities = [r['activity'] for r in api.get('/api/audit-logs/', {'date_from': date_from}).json()]
+        self.assertEqual(len(activities), 12)
+        self.assertNotIn('system sweep', activities)
+
+        everything = self.api.get('/api/audit-logs/', {'date_from': date_from}).json()
+        self.assertIn('system sweep', [r['activity'] for r in everything])
+
+    def test_archived_search_matches_word_prefixes_like_the_index(self):
+        from .archive import archive_audit_logs
+
+        archive_audit_logs(30, segment_size=4)
+        date_from = f'{self.old:%Y-%m-%d}'
+
+        def search(text):
+            response = self.api.get('/api/audit-logs/', {'date_from': date_from, 'search': text})
+            return sorted(r['activity'] for r in response.json())
+
+        self.assertEqual(len(search('UPD')), 12)
+        self.assertEqual(len(search('archive-tech')), 12)
+        # Both sides of the cutoff: 'update 1', 'update 10' (archived), 'update 11' (hot).
+        self.assertEqual(search('upd 1'), ['update 1', 'update 10', 'update 11'])
+        # Substrings inside a word match neither the index nor the archive.
+        self.assertEqual(search('pdate'), [])
+
+
+class AuditBatchWriterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='auditor', email='auditor@example.com', password='password123', role=User.ROLE_ADMIN,
+        )
+
+    def _log(self, activity):
+        from .models import AuditLog
+
+        return AuditLog.log(
+            entity=AuditLog.ENTITY_USER, entity_id=self.user.id, action=AuditLog.ACTION_UPDATE,
+            activity=activity, actor=self.user,
+        )
+
+    def test_scope_inserts_its_entries_in_one_batch(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .audit_writer import audit_batch
+        from .models import AuditLog
+
+        AuditLog.objects.all().delete()
+        with CaptureQueriesContext(connection) as ctx:
+            with audit_batch():
+                for i in range(5):
+                    self._log(f'edit {i}')
+                self.assertEqual(len(ctx.captured_queries), 0)
+
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "tickets_auditlog"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            list(AuditLog.objects.order_by('id').values_list('activity', flat=True)),
+            [f'edit {i}' for i in range(5)],
+        )
+
+    def test_entries_follow_their_transaction(self):
+        from django.db import transaction
+
+        from .audit_writer import audit_batch
+        from .models import AuditLog
+
+        AuditLog.objects.all().delete()
+        with audit_batch():
+            self._log('kept')
+            try:
+                with transaction.atomic():
+                    self._log('rolled back')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        self.assertEqual(list(AuditLog.objects.values_list('activity', flat=True)), ['kept'])
+
+    def test_rolled_back_savepoints_drop_only_their_own_entries(self):
+        from django.db import transaction
+
+        from .audit_writer import audit_batch
+        from .models import AuditLog
+
+        AuditLog.objects.all().delete()
+        with audit_batch():
+            with transaction.atomic():
+                self._log('outer')
+                with transaction.atomic():
+                    self._log('released savepoint')
+                try:
+                    with transaction.atomic():
+                        self._log('rolled back savepoint')
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+            self._log('after')
+
+        self.assertEqual(
+            list(AuditLog.objects.order_by('pk').values_list('activity', flat=True)),
+            ['outer', 'released savepoint', 'after'],
+        )
+
+    def test_committed_entries_are_handed_to_the_writer(self):
+        from unittest import mock
+
+        from .audit_writer import AuditBatch, SyncAuditWriter
+
+        batch = AuditBatch()
+        with mock.patch.object(SyncAuditWriter, 'write') as write:
+            with self.captureOnCommitCallbacks(execute=True):
+                batch.add('committed')
+            batch.flush()
+        write.assert_called_once_with(['committed'])
+
+    def test_failed_bulk_insert_falls_back_to_single_rows(self):
+        from unittest import mock
+
+        from .audit_writer import write_entries
+        from .models import AuditLog
+
+        AuditLog.objects.all().delete()
+        entries = [AuditLog(entity=AuditLog.ENTITY_USER, action=AuditLog.ACTION_LOGIN, activity=f'login {i}')
+                   for i in range(3)]
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=RuntimeError('boom')):
+            with self.assertLogs('tickets.audit_writer', 'WARNING'):
+                write_entries(entries)
+
+        self.assertEqual(AuditLog.objects.count(), 3)
+
+    def test_request_logs_are_written_by_the_middleware(self):
+        from rest_framework.test import APIClient
+
+        from .models import AuditLog
+
+        AuditLog.objects.all().delete()
+        self.user.role = User.ROLE_SUPERADMIN
+        self.user.save()
+        api = APIClient()
+        api.force_authenticate(self.user)
+        employee = User.objects.create_user(
+            username='audited', email='audited@example.com', password='password123', role=User.ROLE_EMPLOYEE,
+        )
+
+        response = api.post(f'/api/users/{employee.id}/toggle_active/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(AuditLog.objects.filter(entity_id=employee.id, actor=self.user).exists())
+
+
+class BackgroundAuditWriterTests(TransactionTestCase):
+    def test_worker_inserts_queued_batches(self):
+        from .audit_writer import BackgroundAuditWriter
+        from .models import AuditLog
+
+        writer = BackgroundAuditWriter(maxsize=10)
+        writer.write([AuditLog(entity=AuditLog.ENTITY_USER, action=AuditLog.ACTION_LOGIN, activity='a')])
+        writer.write([AuditLog(entity=AuditLog.ENTITY_USER, action=AuditLog.ACTION_LOGIN, activity='b')])
+
+        self.assertTrue(writer.flush(timeout=5))
+        self.assertEqual(sorted(AuditLog.objects.filter(activity__in=['a', 'b']).values_list('activity', flat=True)), ['a', 'b'])
+
+
+class AuditSearchTests(TestCase):
+    def setUp(self):
+        from .models import AuditLog
+
+        AuditLog.objects.all().delete()
+        for activity, email in [
+            ('tech@maptechisi.com resolved STF-0042 firewall outage', 'tech@maptechisi.com'),
+            ('admin@maptechisi.com assigned STF-0043 to printer queue', 'admin@maptechisi.com'),
+            ('Backup license renewed', ''),
+        ]:
+            AuditLog.objects.create(
+                entity=AuditLog.ENTITY_TICKET, action=AuditLog.ACTION_UPDATE, activity=activity, actor_email=email,
+            )
+
+    def _search(self, text):
+        from .audit_search import search_audit_logs
+        from .models import AuditLog
+
+        return sorted(search_audit_logs(AuditLog.objects.all(), text).values_list('activity', flat=True))
+
+    def test_matches_every_word_as_a_prefix(self):
+        self.assertEqual(self._search('firew'), ['tech@maptechisi.com resolved STF-0042 firewall outage'])
+        self.assertEqual(self._search('maptech'), [
+            'admin@maptechisi.com assigned STF-0043 to printer queue',
+            'tech@maptechisi.com resolved STF-0042 firewall outage',
+        ])
+        self.assertEqual(self._search('stf-0043 printer'), ['admin@maptechisi.com assigned STF-0043 to printer queue'])
+        self.assertEqual(self._search('license renewed'), ['Backup license renewed'])
+        self.assertEqual(len(self._search('ticket')), 3)
+
+    def test_index_follows_deletes_and_updates(self):
+        from .models import AuditLog
+
+        AuditLog.objects.filter(activity__startswith='Backup').update(activity='Archive rotated')
+        AuditLog.objects.filter(activity__contains='firewall').delete()
+
+        self.assertEqual(self._search('license'), [])
+        self.assertEqual(self._search('rotated'), ['Archive rotated'])
+        self.assertEqual(self._search('firewall'), [])
+
+    def test_search_uses_the_index_on_sqlite(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite FTS5 check')
+        with CaptureQueriesContext(connection) as ctx:
+            self._search('printer')
+        self.assertIn('MATCH', ctx.captured_queries[-1]['sql'])
+
+
+class AuditSummaryBucketTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+
+        from .models import AuditLog, AuditSummaryBucket
+
+        self.superadmin = User.objects.create_user(
+            username='summary-root', email='summary-root@example.com', password='password123',
+            role=User.ROLE_SUPERADMIN,
+        )
+        self.admin = User.objects.create_user(
+            username='summary-admin', email='summary-admin@example.com', password='password123',
+            role=User.ROLE_ADMIN,
+        )
+        self.employee = User.objects.create_user(
+            username='summary-tech', email='summary-tech@example.com', password='password123',
+            role=User.ROLE_EMPLOYEE,
+        )
+        AuditLog.objects.all().delete()
+        AuditSummaryBucket.objects.all().delete()
+        self.api = APIClient()
+
+    def _log(self, actor, action, entity='Ticket'):
+        from .models import AuditLog
+
+        AuditLog.log(entity=entity, action=action, activity=f'{action} by {actor}', actor=actor)
+
+    def _summary(self, user):
+        self.api.force_authenticate(user)
+        response = self.api.get('/api/audit-logs/summary/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_counters_follow_writes_and_role_scoping(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .audit_writer import audit_batch
+        from .models import AuditSummaryBucket
+
+        with audit_batch():
+            self._log(self.employee, 'UPDATE')
+            self._log(self.employee, 'CLOSE')
+            self._log(self.admin, 'ASSIGN')
+        self._log(None, 'LOGIN', entity='Session')
+
+        root = self._summary(self.superadmin)
+        self.assertEqual(root['total'], 4)
+        self.assertEqual(root['last_24h'], 4)
+        self.assertEqual(root['by_entity'], {'Ticket': 3, 'Session': 1})
+        self.assertEqual(root['by_action'], {'UPDATE': 1, 'CLOSE': 1, 'ASSIGN': 1, 'LOGIN': 1})
+        self.assertEqual(len(root['hourly']), 24)
+        self.assertEqual(root['hourly'][-1]['count'], 4)
+
+        admin = self._summary(self.admin)
+        self.assertEqual((admin['total'], admin['by_action']), (2, {'UPDATE': 1, 'CLOSE': 1}))
+
+        self.api.force_authenticate(self.superadmin)
+        with CaptureQueriesContext(connection) as ctx:
+            self.api.get('/api/audit-logs/summary/')
+        audit_scans = [q for q in ctx.captured_queries if 'FROM "tickets_auditlog"' in q['sql']]
+        self.assertEqual(len(audit_scans), 1)  # only the partial first hour of the 24h window
+        self.assertEqual(AuditSummaryBucket.find_drift(), [])
+
+    def test_purge_and_archive_uncount_deleted_rows(self):
+        import datetime as dt
+        import tempfile
+
+        from django.utils import timezone
+
+        from .archive import archive_audit_logs
+        from .models import AuditLog, AuditSummaryBucket, RetentionPolicy
+        from .retention import purge_target
+
+        for _ in range(3):
+            self._log(self.employee, 'UPDATE')
+        self._log(self.employee, 'CLOSE')
+        AuditLog.objects.filter(action='UPDATE').update(timestamp=timezone.now() - dt.timedelta(days=60))
+        AuditSummaryBucket.rebuild()
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with self.settings(MEDIA_ROOT=tmp.name):
+            archive_audit_logs(50, segment_size=2)
+        self.assertEqual(self._summary(self.admin)['total'], 1)
+
+        self._log(self.employee, 'CLOSE')
+        AuditLog.objects.filter(action='CLOSE').update(timestamp=timezone.now() - dt.timedelta(days=40))
+        AuditSummaryBucket.rebuild()
+        policy = RetentionPolicy.get_policy()
+        policy.audit_log_retention_days = 30
+        policy.save()
+        purge_target('audit_log')
+
+        self.assertEqual(self._summary(self.admin)['total'], 0)
+        self.assertEqual(AuditSummaryBucket.find_drift(), [])
+
+
+class AuditActorRoleTests(TestCase):
+    def setUp(self):
+        from rest_framework.test import APIClient
+
+        from .models import AuditLog
+
+        self.admin = User.objects.create_user(
+            username='role-admin', email='role-admin@example.com', password='password123', role=User.ROLE_ADMIN,
+        )
+        self.employee = User.objects.create_user(
+            username='role-tech', email='role-tech@example.com', password='password123', role=User.ROLE_EMPLOYEE,
+        )
+        AuditLog.objects.all().delete()
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def test_role_is_snapshotted_and_scoping_skips_the_user_join(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .models import AuditLog
+
+        AuditLog.log(entity=AuditLog.ENTITY_TICKET, action=AuditLog.ACTION_UPDATE, activity='as tech', actor=self.employee)
+        self.employee.role = User.ROLE_ADMIN
+        self.employee.save()
+        AuditLog.log(entity=AuditLog.ENTITY_TICKET, action=AuditLog.ACTION_UPDATE, activity='as admin', actor=self.employee)
+
+        self.assertEqual(
+            dict(AuditLog.objects.values_list('activity', 'actor_role')),
+            {'as tech': User.ROLE_EMPLOYEE, 'as admin': User.ROLE_ADMIN},
+        )
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.get('/api/audit-logs/')
+        self.assertEqual([row['activity'] for row in response.json()], ['as tech'])
+        listing = next(q['sql'] for q in ctx.captured_queries if 'FROM "tickets_auditlog"' in q['sql'])
+        self.assertIn('"actor_role" IN', listing)
+        self.assertNotIn('JOIN', listing)
+
+
+class TicketSearchFilterTests(TestCase):
+    def setUp(self):
+        from django.utils import timezone
+        from rest_framework.test import APIClient
+
+        from .models import Category, Client, Product, Ticket, TypeOfService
+
+        self.admin = User.objects.create_user(
+            username='finder', email='finder@example.com', password='password123', role=User.ROLE_ADMIN,
+        )
+        self.tech = User.objects.create_user(
+            username='finder-tech', email='finder-tech@example.com', password='password123', role=User.ROLE_EMPLOYEE,
+        )
+        service = TypeOfService.objects.create(name='Repair', estimated_resolution_days=1)
+        acme = Client.objects.create(client_name='Acme Corp')
+        globex = Client.objects.create(client_name='Globex')
+        self.router = Product.objects.create(
+            project_title='Network', client=acme, category=Category.objects.create(name='Net'),
+            product_name='Edge Router', brand='Mikrotik',
+        )
+        now = timezone.now()
+        self.now = now
+        common = {'created_by': self.admin, 'type_of_service': service, 'confirmed_by_admin': True}
+        self.breached = Ticket.objects.create(
+            **common, client_record=acme, product_record=self.router, priority=Ticket.PRIORITY_HIGH,
+            status=Ticket.STATUS_IN_PROGRESS, assigned_to=self.tech, time_in=now - timezone.timedelta(hours=30),
+            description_of_problem='Router drops packets',
+        )
+        self.urgent = Ticket.objects.create(
+            **common, client_record=globex, priority=Ticket.PRIORITY_CRITICAL, status=Ticket.STATUS_IN_PROGRESS,
+            assigned_to=self.tech, time_in=now - timezone.timedelta(hours=20), action_taken='Replaced fan',
+        )
+        self.waiting = Ticket.objects.create(
+            **common, client_record=globex, priority=Ticket.PRIORITY_LOW, remarks='Awaiting spare parts',
+        )
+        self.unconfirmed = Ticket.objects.create(
+            created_by=self.admin, client_record=acme, description_of_problem='Printer jam',
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.admin)
+
+    def _ids(self, query):
+        response = self.api.get(f'/api/tickets/?fields=id&{query}')
+        self.assertEqual(response.status_code, 200)
+        return {row['id'] for row in response.json()}
+
+    def test_field_filters(self):
+        self.assertEqual(self._ids('status=in_progress'), {self.breached.id, self.urgent.id})
+        self.assertEqual(self._ids('priority=low,critical'), {self.urgent.id, self.waiting.id})
+        self.assertEqual(self._ids(f'assigned_to={self.tech.id}&priority=high'), {self.breached.id})
+        self.assertEqual(self._ids('assigned_to=none'), {self.waiting.id, self.unconfirmed.id})
+        self.assertEqual(self._ids(f'client={self.breached.client_record_id}'), {self.breached.id, self.unconfirmed.id})
+        self.assertEqual(self._ids(f'product={self.router.id}'), {self.breached.id})
+        self.assertEqual(self._ids('client=abc&sla=bogus'), self._ids(''))
+        self.assertEqual(self._ids('date_from=2000-01-01&date_to=2000-01-31'), set())
+
+    def test_sla_states_match_the_timer(self):
+        from .ticket_search import filter_sla
+        from .models import Ticket
+
+        states = {
+            state: set(filter_sla(Ticket.objects.all(), state, now=self.now).values_list('id', flat=True))
+            for state in ('none', 'on_track', 'warning', 'urgent', 'breached')
+        }
+        self.assertEqual(states, {
+            'none': {self.unconfirmed.id},
+            'on_track': {self.waiting.id},
+            'warning': set(),
+            'urgent': {self.urgent.id},
+            'breached': {self.breached.id},
+        })
+        Ticket.objects.filter(pk=self.breached.pk).update(status=Ticket.STATUS_CLOSED)
+        self.assertFalse(filter_sla(Ticket.objects.all(), 'breached', now=self.now).exists())
+
+    def test_search_covers_ticket_text_and_linked_names(self):
+        from .models import Client
+
+        stf_tail = self.waiting.stf_no[-6:]
+        self.assertEqual(self._ids('search=drops'), {self.breached.id})
+        self.assertEqual(self._ids('search=mikrotik'), {self.breached.id})
+        self.assertEqual(self._ids('search=acme'), {self.breached.id, self.unconfirmed.id})
+        self.assertEqual(self._ids('search=globex fan'), {self.urgent.id})
+        self.assertEqual(self._ids(f'search={stf_tail}'), {self.waiting.id})
+        self.assertEqual(self._ids('search=spare&status=open'), {self.waiting.id})
+        self.assertEqual(self._ids('search=jam'), {self.unconfirmed.id})
+
+        Client.objects.filter(client_name='Globex').update(client_name='Initech')
+        self.assertEqual(self._ids('search=globex'), set())
+        self.assertEqual(self._ids('search=initech'), {self.urgent.id, self.waiting.id})
+
+    def test_search_uses_the_trigram_index_on_sqlite(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite FTS5 check')
+        with CaptureQueriesContext(connection) as ctx:
+            self._ids('search=router')
+        listing = next(q['sql'] for q in ctx.captured_queries if 'FROM "tickets_ticket"' in q['sql'])
+        self.assertIn('tickets_ticket_fts MATCH', listing)
+        self.assertIn('tickets_client_fts MATCH', listing)
+        self.assertNotIn('LIKE', listing)
+
+
+class TicketIndexPlanTests(TestCase):
+    """EXPLAIN the SQL the hot endpoints actually run and check which index serves it."""
+
+    def setUp(self):
+        from rest_framework.test import APIClient
+
+        from .models import Ticket
+
+        self.admin = User.objects.create_user(
+            username='planner', email='planner@example.com', password='password123', role=User.ROLE_ADMIN,
+        )
+        self.sales = User.objects.create_user(
+            username='planner-sales', email='planner-sales@example.com', password='password123', role=User.ROLE_SALES,
+        )
+        self.tech = User.objects.create_user(
+            username='planner-tech', email='planner-tech@example.com', password='password123',
+            role=User.ROLE_EMPLOYEE,
+        )
+        for i in range(40):
+            Ticket.objects.create(
+                created_by=self.sales if i % 2 else self.admin,
+                assigned_to=self.tech if i % 3 else None,
+                status=Ticket.STATUS_OPEN if i % 4 else Ticket.STATUS_CLOSED,
+            )
+        self.api = APIClient()
+
+    def _index(self, *fields):
+        from .models import Ticket
+
+        return next(index.name for index in Ticket._meta.indexes if tuple(index.fields) == fields)
+
+    def _plan(self, user, url, table='tickets_ticket'):
+        """Plan of the first query ``url`` runs against ``table``."""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self.api.force_authenticate(user)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.api.get(url).status_code, 200)
+        sql = next(q['sql'] for q in ctx.captured_queries if f'"{table}"' in q['sql'])
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # The test tables are tiny; make the planner show what it would use at volume.
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute(f'EXPLAIN {sql}')
+            else:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return '\n'.join(str(row) for row in cursor.fetchall())
+
+    def test_role_scoped_pages_read_the_scope_index(self):
+        for user, fields in [
+            (self.sales, ('created_by', '-created_at', 'id')),
+            (self.tech, ('assigned_to', '-created_at', 'id')),
+            (self.admin, ('-created_at', 'id')),
+        ]:
+            with self.subTest(role=user.role):
+                plan = self._plan(user, '/api/tickets/?view=summary&page_size=20')
+                self.assertIn(self._index(*fields), plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_list_filters_use_their_index(self):
+        plan = self._plan(self.admin, '/api/tickets/?view=summary&page_size=20&status=open')
+        self.assertIn(self._index('status', '-created_at', 'id'), plan)
+        plan = self._plan(self.admin, '/api/tickets/?view=summary&page_size=20&assigned_to=none')
+        self.assertIn(self._index('assigned_to', '-created_at', 'id'), plan)
+
+    def test_employee_queue_counts_use_the_assignee_status_index(self):
+        plan = self._plan(self.admin, '/api/employees/')
+        self.assertIn(self._index('assigned_to', 'status'), plan)
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        import tempfile
+
+        from rest_framework.test import APIClient
+
+        from .models import Ticket
+
+        for setting in ('MEDIA_ROOT', 'FILE_UPLOAD_TEMP_DIR'):
+            tmp = tempfile.TemporaryDirectory()
+            self.addCleanup(tmp.cleanup)
+            override = self.settings(**{setting: tmp.name})
+            override.enable()
+            self.addCleanup(override.disable)
+
+        self.tech = User.objects.create_user(
+            username='uploader', email='uploader@example.com', password='password123', role=User.ROLE_EMPLOYEE,
+        )
+        self.ticket = Ticket.objects.create(created_by=self.tech, assigned_to=self.tech)
+        self.base = f'/api/tickets/{self.ticket.id}/uploads/'
+        self.api = APIClient()
+        self.api.force_authenticate(self.tech)
+        self.content = b'\x00\x00\x00\x18ftypmp42' + bytes(range(256)) * 40
+
+    def _start(self, **extra):
+        import hashlib
+
+        body = {'filename': 'proof.mp4', 'size': len(self.content), 'content_type': 'video/mp4',
+                'sha256': hashlib.sha256(self.content).hexdigest(), **extra}
+        response = self.api.post(self.base, body, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+
+    def _put(self, upload_id, offset, data, checksum=None):
+        import hashlib
+
+        return self.api.generic(
+            'PUT', f'{self.base}{upload_id}/', data, content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset), HTTP_UPLOAD_CHECKSUM=checksum or hashlib.sha256(data).hexdigest(),
+        )
+
+    def test_chunks_resume_from_the_stored_offset_and_finalize_once(self):
+        from .models import AuditLog, TicketAttachment
+
+        upload = self._start()
+        first, second = self.content[:4000], self.content[4000:]
+        self.assertEqual(self._put(upload['id'], 0, first).json()['offset'], 4000)
+
+        # A retried chunk after a lost response is refused with the offset to resume from.
+        retry = self._put(upload['id'], 0, first)
+        self.assertEqual((retry.status_code, retry.json()['offset']), (409, 4000))
+        self.assertEqual(self.api.get(f'{self.base}{upload["id"]}/').json()['offset'], 4000)
+        self.assertEqual(self.api.post(f'{self.base}{upload["id"]}/finalize/').status_code, 409)
+
+        self.assertEqual(self._put(upload['id'], 4000, second).json()['offset'], len(self.content))
+        response = self.api.post(f'{self.base}{upload["id"]}/finalize/')
+        self.assertEqual(response.status_code, 201)
+        attachment = TicketAttachment.objects.get(ticket=self.ticket)
+        self.assertTrue(attachment.is_resolution_proof)
+        with attachment.file.open('rb') as fh:
+            self.assertEqual(fh.read(), self.content)
+
+        again = self.api.post(f'{self.base}{upload["id"]}/finalize/')
+        self.assertEqual((again.status_code, again.json()[0]['id']), (200, attachment.id))
+        self.assertEqual(TicketAttachment.objects.filter(ticket=self.ticket).count(), 1)
+        self.assertEqual(AuditLog.objects.filter(action=AuditLog.ACTION_UPLOAD, entity_id=self.ticket.id).count(), 1)
+
+    def test_bad_chunks_are_rejected_without_moving_the_offset(self):
+        from . import uploads
+        from .models import ChunkedUpload
+
+        upload = self._start()
+        bad = self._put(upload['id'], 0, self.content[:1000], checksum='0' * 64)
+        self.assertEqual((bad.status_code, bad.json()['offset']), (400, 0))
+        with self.settings(UPLOAD_CHUNK_SIZE=100):
+            self.assertEqual(self._put(upload['id'], 0, self.content[:1000]).status_code, 413)
+        self.assertEqual(self._put(upload['id'], 0, self.content + b'x').status_code, 400)
+        self.assertEqual(uploads.part_path(ChunkedUpload.objects.get()).stat().st_size, 0)
+
+        self._put(upload['id'], 0, self.content)
+        ChunkedUpload.objects.update(sha256='f' * 64)
+        self.assertEqual(self.api.post(f'{self.base}{upload["id"]}/finalize/').status_code, 422)
+
+    def test_start_validates_type_size_and_owner(self):
+        from .models import ChunkedUpload
+
+        bad_type = self.api.post(self.base, {'filename': 'run.exe', 'size': 10}, format='json')
+        self.assertEqual(bad_type.status_code, 400)
+        too_big = self.api.post(self.base, {'filename': 'a.png', 'size': 600 * 1024 * 1024}, format='json')
+        self.assertEqual(too_big.status_code, 400)
+        upload = self._start(filename='../../etc/proof.mp4')
+        self.assertEqual(upload['filename'], 'proof.mp4')
+
+        admin = User.objects.create_user(
+            username='upload-admin', email='upload-admin@example.com', password='password123', role=User.ROLE_ADMIN,
+        )
+        self.api.force_authenticate(admin)
+        self.assertEqual(self.api.get(f'{self.base}{upload["id"]}/').status_code, 404)
+        self.api.force_authenticate(self.tech)
+        self.assertEqual(self.api.delete(f'{self.base}{upload["id"]}/').status_code, 204)
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+    def test_finalize_stays_idempotent_after_a_purge(self):
+        from django.utils import timezone
+
+        from . import uploads
+        from .models import ChunkedUpload
+
+        upload = self._start()
+        self._put(upload['id'], 0, self.content)
+        first = self.api.post(f'{self.base}{upload["id"]}/finalize/')
+        self.assertEqual(first.status_code, 201)
+
+        self.assertEqual(uploads.purge_stale_uploads(now=timezone.now() + timezone.timedelta(days=2)), 0)
+        again = self.api.post(f'{self.base}{upload["id"]}/finalize/')
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json()[0]['id'], first.json()[0]['id'])
+        self.assertEqual(ChunkedUpload.objects.get().status, ChunkedUpload.STATUS_COMPLETE)
+
+    def test_finalize_rejects_content_that_is_not_the_claimed_type(self):
+        import hashlib
+
+        from django.core.files.storage import default_storage
+
+        from .models import ChunkedUpload, TicketAttachment
+
+        self.content = b'<html><script>alert(1)</script></html>'
+        upload = self._start(sha256=hashlib.sha256(self.content).hexdigest())
+        self._put(upload['id'], 0, self.content)
+        response = self.api.post(f'{self.base}{upload["id"]}/finalize/')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('proof.mp4', response.json()['detail'])
+        self.assertFalse(TicketAttachment.objects.exists())
+        self.assertFalse(default_storage.exists('ticket_attachments'))
+        self.assertEqual(ChunkedUpload.objects.get().status, ChunkedUpload.STATUS_UPLOADING)
+
+    def test_stale_uploads_are_purged_with_their_part_files(self):
+        from django.utils import timezone
+
+        from . import uploads
+        from .models import ChunkedUpload
+
+        upload = self._start()
+        path = uploads.part_path(ChunkedUpload.objects.get(pk=upload['id']))
+        self.assertEqual(uploads.purge_stale_uploads(now=timezone.now()), 0)
+        self.assertEqual(uploads.purge_stale_uploads(now=timezone.now() + timezone.timedelta(days=2)), 1)
+        self.assertFalse(path.exists())
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+
+class MediaServingTests(TestCase):
+    def setUp(self):
+        import tempfile
+
+        from django.core.files.base import ContentFile
+
+        from .models import Ticket, TicketAttachment
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = self.settings(MEDIA_ROOT=tmp.name, MEDIA_OFFLOAD='')
+        override.enable()
+        self.addCleanup(override.disable)
+
+        def make(name, role):
+            return User.objects.create_user(
+                username=name, email=f'{name}@example.com', password='password123', role=role,
+            )
+
+        self.tech = make('media-tech', User.ROLE_EMPLOYEE)
+        self.other = make('media-other', User.ROLE_EMPLOYEE)
+        self.admin = make('media-admin', User.ROLE_ADMIN)
+        ticket = Ticket.objects.create(created_by=self.admin, assigned_to=self.tech)
+        self.content = bytes(range(256)) * 40
+        self.attachment = TicketAttachment.objects.create(
+            ticket=ticket, file=ContentFile(self.content, name='proof.mp4'), uploaded_by=self.tech,
+        )
+        self.url = self.attachment.file.url
+
+    def _get(self, user, url=None, **headers):
+        if user:
+            self.client.force_login(user)
+        else:
+            self.client.logout()
+        return self.client.get(url or self.url, headers=headers)
+
+    def test_asgi_streams_large_files_a_block_at_a_time(self):
+        from unittest import mock
+
+        from django.core.files.base import ContentFile
+
+        from . import media
+        from .models import TicketAttachment
+
+        content = bytes(range(256)) * (32 * 1024)  # 8 MiB
+        recording = TicketAttachment.objects.create(
+            ticket=self.attachment.ticket, file=ContentFile(content, name='long.mp4'), uploaded_by=self.tech,
+        )
+        read = media._FileRange.read
+        progress = {'read': 0}
+        at_first_chunk = []
+
+        def counting_read(file_range, size=-1):
+            data = read(file_range, size)
+            progress['read'] += len(data)
+            return data
+
+        def on_body(chunk):
+            if not at_first_chunk:
+                at_first_chunk.append(progress['read'])
+
+        self.client.force_login(self.tech)
+        with mock.patch.object(media._FileRange, 'read', counting_read):
+            status, body = _asgi_get(self.client, recording.file.url, on_body=on_body)
+            self.assertEqual((status, body), (200, content))
+            self.assertLessEqual(at_first_chunk[0], media.STREAM_BLOCK_SIZE)
+
+            at_first_chunk.clear()
+            progress['read'] = 0
+            status, body = _asgi_get(self.client, recording.file.url, headers={'Range': 'bytes=1000-'}, on_body=on_body)
+            self.assertEqual((status, body), (206, content[1000:]))
+            self.assertLessEqual(at_first_chunk[0], media.STREAM_BLOCK_SIZE)
+
+    def test_attachments_are_served_to_ticket_participants_only(self):
+        import os
+
+        from django.conf import settings
+
+        response = self._get(self.tech)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        self.assertEqual(self._get(self.admin).status_code, 200)
+        self.assertEqual(self._get(self.other).status_code, 404)
+        self.assertEqual(self._get(None).status_code, 401)
+
+        self.attachment.is_published = True
+        self.attachment.save(update_fields=['is_published'])
+        self.assertEqual(self._get(self.other).status_code, 200)
+
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, 'audit_archive'))
+        with open(os.path.join(settings.MEDIA_ROOT, 'audit_archive', 'segment.jsonl.gz'), 'wb') as fh:
+            fh.write(b'private')
+        self.assertEqual(self._get(self.admin, '/media/audit_archive/segment.jsonl.gz').status_code, 404)
+        self.assertEqual(self._get(self.admin, '/media/../tickets/tests.py').status_code, 404)
+
+    def test_range_requests_return_only_the_requested_bytes(self):
+        response = self._get(self.tech, Range='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:200])
+
+        response = self._get(self.tech, Range='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-10:])
+        response = self._get(self.tech, Range=f'bytes={len(self.content) - 5}-')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-5:])
+
+        response = self._get(self.tech, Range=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+        # A stale If-Range gets the whole, current file.
+        response = self._get(self.tech, Range='bytes=0-9', **{'If-Range': '"stale"'})
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        response = self._get(self.tech, Range='bytes=0-9', **{'If-Range': etag})
+        self.assertEqual(response.status_code, 206)
+
+    def test_conditional_requests_revalidate_without_a_body(self):
+        etag = self._get(self.tech)['ETag']
+        response = self._get(self.tech, **{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_offload_hands_the_file_to_the_proxy(self):
+        import os
+
+        from django.conf import settings
+
+        with self.settings(MEDIA_OFFLOAD='x-accel-redirect', MEDIA_OFFLOAD_PREFIX='/protected-media/'):
+            response = self._get(self.tech, Range='bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.attachment.file.name}')
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertEqual(response.content, b'')
+
+        with self.settings(MEDIA_OFFLOAD='x-sendfile'):
+            response = self._get(self.tech)
+            self.assertEqual(self._get(self.other).status_code, 404)
+        self.assertEqual(response['X-Sendfile'], os.path.join(settings.MEDIA_ROOT, self.attachment.file.name))
+
+
+class MediaPreviewTests(TestCase):
+    def setUp(self):
+        import tempfile
+
+        from .models import Ticket
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = self.settings(
+            MEDIA_ROOT=tmp.name, MEDIA_OFFLOAD='', MEDIA_PREVIEW_BUILDER='tickets.previews.SyncPreviewBuilder',
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.tech = User.objects.create_user(
+            username='preview-tech', email='preview-tech@example.com', password='password123', role=User.ROLE_EMPLOYEE,
+        )
+        self.other = User.objects.create_user(
+            username='preview-other', email='preview-other@example.com', password='password123', role=User.ROLE_EMPLOYEE,
+        )
+        self.ticket = Ticket.objects.create(created_by=self.tech, assigned_to=self.tech)
+
+    @staticmethod
+    def _png(size=(2000, 1000)):
+        import io
+
+        from PIL import Image
+
+        out = io.BytesIO()
+        Image.new('RGBA', size, (200, 30, 30, 128)).save(out, 'PNG')
+        return out.getvalue()
+
+    def _attach(self, data, name):
+        from django.core.files.base import ContentFile
+
+        from .models import TicketAttachment
+
+        with self.captureOnCommitCallbacks(execute=True):
+            attachment = TicketAttachment.objects.create(
+                ticket=self.ticket, file=ContentFile(data, name=name), uploaded_by=self.tech,
+            )
+        attachment.refresh_from_db()
+        return attachment
+
+    def test_image_attachments_get_sized_thumbnails_after_commit(self):
+        from django.core.files.storage import default_storage
+        from PIL import Image
+
+        from .serializers.ticket import TicketAttachmentSerializer
+
+        attachment = self._attach(self._png(), 'screenshot.png')
+        self.assertEqual(len(attachment.content_sha256), 64)
+        with default_storage.open(attachment.previews['thumb']) as fh, Image.open(fh) as thumb:
+            self.assertEqual(thumb.size, (320, 160))
+            self.assertEqual(thumb.format, 'WEBP')
+            self.assertEqual(thumb.mode, 'RGBA')
+        with default_storage.open(attachment.previews['preview']) as fh, Image.open(fh) as preview:
+            self.assertEqual(preview.size, (1280, 640))
+
+        previews = TicketAttachmentSerializer(attachment).data['previews']
+        self.assertEqual(set(previews), {'thumb', 'preview'})
+        self.client.force_login(self.tech)
+        self.assertEqual(self.client.get(previews['thumb'])['Content-Type'], 'image/webp')
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(previews['thumb']).status_code, 404)
+
+    def test_derivatives_are_shared_by_identical_files(self):
+        import os
+
+        from django.conf import settings
+
+        from .serializers.ticket import TicketAttachmentSerializer
+
+        data = self._png()
+        first = self._attach(data, 'first.png')
+        second = self._attach(data, 'second.png')
+        self.assertNotEqual(first.file.name, second.file.name)
+        self.assertEqual(first.previews['thumb'], second.previews['thumb'])
+        preview_files = sum(len(files) for _, _, files in os.walk(os.path.join(settings.MEDIA_ROOT, 'previews')))
+        self.assertEqual(preview_files, 2)
+
+        document = self._attach(b'%PDF-1.4 not an image', 'report.pdf')
+        self.assertEqual(document.previews['source'], document.file.name)
+        self.assertEqual(TicketAttachmentSerializer(document).data['previews'], {})
+
+    def test_profile_pictures_get_avatar_sizes_and_drop_stale_ones(self):
+        from django.core.files.base import ContentFile
+
+        from users.serializers import UserSerializer
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tech.profile_picture = ContentFile(self._png((600, 600)), name='me.png')
+            self.tech.save(update_fields=['profile_picture'])
+        self.tech.refresh_from_db()
+        self.assertEqual(set(UserSerializer(self.tech).data['profile_picture_previews']), {'small', 'medium'})
+
+        # Until the new picture is processed, the old previews are not offered.
+        self.tech.profile_picture = ContentFile(self._png((300, 300)), name='new.png')
+        self.tech.save(update_fields=['profile_picture'])
+        self.assertEqual(UserSerializer(self.tech).data['profile_picture_previews'], {})
+
+
+class AttachmentBlobTests(TestCase):
+    def setUp(self):
+        import tempfile
+
+        from rest_framework.test import APIClient
+
+        from .models import Ticket
+
+        for setting in ('MEDIA_ROOT', 'FILE_UPLOAD_TEMP_DIR'):
+            tmp = tempfile.TemporaryDirectory()
+            self.addCleanup(tmp.cleanup)
+            override = self.settings(**{setting: tmp.name})
+            override.enable()
+            self.addCleanup(override.disable)
+
+        self.tech = User.objects.create_user(
+            username='blob-tech', email='blob-tech@example.com', password='password123', role=User.ROLE_EMPLOYEE,
+        )
+        self.tickets = [Ticket.objects.create(created_by=self.tech, assigned_to=self.tech) for _ in range(2)]
+        self.api = APIClient()
+        self.api.force_authenticate(self.tech)
+        self.content = b'%PDF-1.4 service report ' * 100
+
+    @staticmethod
+    def _docx():
+        import io
+        import zipfile
+
+        out = io.BytesIO()
+        with zipfile.ZipFile(out, 'w') as package:
+            package.writestr('[Content_Types].xml', '<Types/>')
+            package.writestr('word/document.xml', '<w:document/>')
+        return out.getvalue()
+
+    def _upload(self, ticket, name='report.pdf', content=None):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        upload = SimpleUploadedFile(name, content or self.content, content_type='application/pdf')
+        response = self.api.post(f'/api/tickets/{ticket.id}/upload_resolution_proof/', {'files': [upload]})
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()[0]
+
+    def test_identical_uploads_share_one_blob_until_the_last_is_deleted(self):
+        import hashlib
+
+        from django.core.files.storage import default_storage
+
+        from .models import AttachmentBlob, TicketAttachment
+
+        first = self._upload(self.tickets[0], 'report.pdf')
+        second = self._upload(self.tickets[1], 'copy of report.pdf')
+        self.assertEqual((first['file_name'], second['file_name']), ('report.pdf', 'copy_of_report.pdf'))
+
+        blob = AttachmentBlob.objects.get()
+        self.assertEqual(blob.sha256, hashlib.sha256(self.content).hexdigest())
+        self.assertEqual((blob.ref_count, blob.size), (2, len(self.content)))
+        names = set(TicketAttachment.objects.values_list('file', flat=True))
+        self.assertEqual(names, {blob.name})
+        with default_storage.open(blob.name) as fh:
+            self.assertEqual(fh.read(), self.content)
+
+        response = self.api.delete(f'/api/tickets/{self.tickets[0].id}/delete_attachment/{first["id"]}/')
+        self.assertEqual(response.status_code, 204)
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(default_storage.exists(blob.name))
+
+        # A cascade from the ticket releases the last reference too; the
+        # file goes once the delete commits.
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tickets[1].delete()
+            self.assertTrue(default_storage.exists(blob.name))
+        self.assertFalse(AttachmentBlob.objects.exists())
+        self.assertFalse(default_storage.exists(blob.name))
+
+    def test_a_rolled_back_delete_keeps_the_blob_file(self):
+        from django.core.files.storage import default_storage
+        from django.db import transaction
+
+        from .models import AttachmentBlob
+
+        self._upload(self.tickets[0], 'report.pdf')
+        blob = AttachmentBlob.objects.get()
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                self.tickets[0].delete()
+                raise RuntimeError('abort')
+        self.assertEqual(callbacks, [])
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(default_storage.exists(blob.name))
+
+    def test_bytes_are_written_before_the_transaction_opens(self):
+        from unittest import mock
+
+        from django.core.files.storage import FileSystemStorage
+        from django.db import connection
+
+        save = FileSystemStorage._save
+        depths = []
+
+        def recording_save(storage, name, content):
+            depths.append(len(connection.atomic_blocks))
+            return save(storage, name, content)
+
+        baseline = len(connection.atomic_blocks)
+        with self.settings(ATTACHMENT_WRITE_WORKERS=1), \
+                mock.patch.object(FileSystemStorage, '_save', recording_save):
+            self._upload(self.tickets[0], 'report.pdf')
+        self.assertEqual(depths, [baseline])
+
+    def test_media_downloads_use_the_uploaded_name(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        upload = SimpleUploadedFile('notes.docx', self._docx(), content_type='application/octet-stream')
+        response = self.api.post(f'/api/tickets/{self.tickets[0].id}/upload_resolution_proof/', {'files': [upload]})
+        attachment = response.json()[0]
+        self.client.force_login(self.tech)
+        with self.settings(MEDIA_OFFLOAD=''):
+            download = self.client.get(attachment['file'])
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(download['Content-Disposition'], 'attachment; filename="notes.docx"')
+
+    def test_dedupe_command_moves_existing_files_into_the_blob_store(self):
+        from django.core.files.base import ContentFile
+        from django.core.files.storage import default_storage
+        from django.core.management import call_command
+
+        from .models import AttachmentBlob, TicketAttachment
+
+        legacy = [
+            TicketAttachment.objects.create(ticket=ticket, file=ContentFile(self.content, name='scan.pdf'))
+            for ticket in self.tickets
+        ]
+        unique = TicketAttachment.objects.create(ticket=self.tickets[0], file=ContentFile(b'other', name='log.txt'))
+        old_names = [attachment.file.name for attachment in (*legacy, unique)]
+
+        out = StringIO()
+        call_command('dedupe_attachments', stdout=out)
+        self.assertIn('Moved 3 attachments', out.getvalue())
+
+        self.assertEqual(AttachmentBlob.objects.count(), 2)
+        self.assertEqual(AttachmentBlob.objects.get(size=len(self.content)).ref_count, 2)
+        for name in old_names:
+            self.assertFalse(default_storage.exists(name))
+        for attachment in TicketAttachment.objects.all():
+            self.assertEqual(attachment.file.name, attachment.blob.name)
+            self.assertTrue(default_storage.exists(attachment.file.name))
+        self.assertEqual(TicketAttachment.objects.get(pk=unique.pk).original_name, 'log.txt')
+        self.assertFalse(TicketAttachment.objects.filter(blob__isnull=True).exists())
+
+    def test_multi_file_upload_is_one_insert(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        from .models import AttachmentBlob, TicketAttachment
+
+        files = [
+            SimpleUploadedFile('report.pdf', self.content, content_type='application/pdf'),
+            SimpleUploadedFile('screen.png', b'\x89PNG\r\n\x1a\n' + b'\x00' * 64, content_type='image/png'),
+            SimpleUploadedFile('notes.docx', self._docx(), content_type='application/octet-stream'),
+            SimpleUploadedFile('again.pdf', self.content, content_type='application/pdf'),
+        ]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.api.post(f'/api/tickets/{self.tickets[0].id}/upload_resolution_proof/', {'files': files})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(
+            [attachment['file_name'] for attachment in response.json()],
+            ['report.pdf', 'screen.png', 'notes.docx', 'again.pdf'],
+        )
+        inserts = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('INSERT INTO "tickets_ticketattachment"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(TicketAttachment.objects.count(), 4)
+        self.assertEqual(AttachmentBlob.objects.get(size=len(self.content)).ref_count, 2)
+
+    def test_files_whose_bytes_do_not_match_their_type_are_rejected(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        from .models import TicketAttachment
+
+        disguised = [
+            ('photo.png', b'<html><script>alert(1)</script></html>', 'image/png'),
+            ('logo.svg', b'<svg xmlns="http://www.w3.org/2000/svg"/>', 'image/svg+xml'),
+            ('invoice.pdf', b'\x89PNG\r\n\x1a\n' + b'\x00' * 64, 'application/pdf'),
+            ('sheet.xlsx', b'PK\x03\x04 not really a workbook', 'application/octet-stream'),
+        ]
+        for name, content, content_type in disguised:
+            with self.subTest(name=name):
+                files = [
+                    SimpleUploadedFile('report.pdf', self.content, content_type='application/pdf'),
+                    SimpleUploadedFile(name, content, content_type=content_type),
+                ]
+                response = self.api.post(f'/api/tickets/{self.tickets[0].id}/upload_resolution_proof/', {'files': files})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(name, response.json()['detail'])
+        self.assertFalse(TicketAttachment.objects.exists())
+
+    def test_heic_and_avif_images_are_screenshots_not_recordings(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        from .filetypes import sniff_attachment_type
+
+        for brand in (b'heic', b'heix', b'mif1', b'avif'):
+            with self.subTest(brand=brand):
+                image = SimpleUploadedFile('photo', b'\x00\x00\x00\x18ftyp' + brand + b'\x00' * 16)
+                self.assertEqual(sniff_attachment_type(image), 'screenshot')
+        video = SimpleUploadedFile('clip', b'\x00\x00\x00\x18ftypisom' + b'\x00' * 16)
+        self.assertEqual(sniff_attachment_type(video), 'recording')
+
+        heic = b'\x00\x00\x00\x18ftypheic' + b'\x00' * 64
+        upload = SimpleUploadedFile('photo.heic', heic, content_type='application/octet-stream')
+        response = self.api.post(f'/api/tickets/{self.tickets[0].id}/upload_resolution_proof/', {'files': [upload]})
+        self.assertEqual(response.status_code, 201, response.content)
+        disguised = SimpleUploadedFile('clip.mp4', heic, content_type='video/mp4')
+        response = self.api.post(f'/api/tickets/{self.tickets[0].id}/upload_resolution_proof/', {'files': [disguised]})
+        self.assertEqual(response.status_code, 400)
+
+    def test_video_and_image_formats_the_upload_form_accepted_still_sniff(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        from .filetypes import check_attachment_type
+
+        accepted = [
+            ('clip.avi', b'RIFF\x00\x10\x00\x00AVI LIST', 'video/x-msvideo'),
+            ('clip.wmv', b'\x30\x26\xb2\x75\x8e\x66\xcf\x11\xa6\xd9\x00\xaa', 'video/x-ms-wmv'),
+            ('clip.mpg', b'\x00\x00\x01\xba\x44\x00\x04\x00', 'video/mpeg'),
+            ('clip.ogv', b'OggS\x00\x02\x00\x00', 'video/ogg'),
+            ('scan.tif', b'II*\x00\x08\x00\x00\x00', 'image/tiff'),
+            ('scan.tiff', b'MM\x00*\x00\x00\x00\x08', 'image/tiff'),
+        ]
+        for name, head, content_type in accepted:
+            with self.subTest(name=name):
+                check_attachment_type(SimpleUploadedFile(name, head + b'\x00' * 64, content_type=content_type))
+
+        # Still rejected: a claimed type whose bytes are something else.
+        disguised = SimpleUploadedFile('clip.avi', b'RIFF\x00\x10\x00\x00WEBPVP8 ', content_type='video/x-msvideo')
+        response = self.api.post(f'/api/tickets/{self.tickets[0].id}/upload_resolution_proof/', {'files': [disguised]})
+        self.assertEqual(response.status_code, 400)
+
+    def test_a_failed_write_stores_none_of_the_files(self):
+        from unittest import mock
+
+        from django.core.files.storage import FileSystemStorage, default_storage
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        from .models import AttachmentBlob, TicketAttachment
+
+        save = FileSystemStorage._save
+
+        def failing_save(storage, name, content):
+            content.seek(0)
+            if content.read(4) == b'\x89PNG':
+                raise OSError('No space left on device')
+            content.seek(0)
+            return save(storage, name, content)
+
+        files = [
+            SimpleUploadedFile('report.pdf', self.content, content_type='application/pdf'),
+            SimpleUploadedFile('screen.png', b'\x89PNG\r\n\x1a\n' + b'\x00' * 64, content_type='image/png'),
+            SimpleUploadedFile('notes.docx', self._docx(), content_type='application/octet-stream'),
+        ]
+        with mock.patch.object(FileSystemStorage, '_save', failing_save), self.assertRaises(OSError):
+            self.api.post(f'/api/tickets/{self.tickets[0].id}/upload_resolution_proof/', {'files': files})
+
+        self.assertFalse(TicketAttachment.objects.exists())
+        self.assertFalse(AttachmentBlob.objects.exists())
+        # The PDF and DOCX were staged, then removed; nothing was promoted.
+        self.assertEqual(default_storage.listdir('ticket_attachments/staging')[1], [])
+        self.assertFalse(default_storage.exists('ticket_attachments/blobs'))
@@ -0,0 +1,277 @@
+"""Server-side search and filtering for the ticket list.
+
+``filter_tickets`` applies the ``/api/tickets/`` query parameters::
+
+    status=open,in_progress   priority=high,critical
+    assigned_to=<id>|none     client=<id>      product=<id>
+    date_from / date_to       (inclusive dates on created_at)
+    sla=none|on_track|warning|urgent|breached
+    search=<text>
+
+``search_tickets`` matches every word of the query as a substring of the
+ticket's STF number, problem description, action taken or remarks, or of
+its linked client's name or product's name, brand or model. Each of those
+three tables carries a trigram index, so substring matches never scan:
+
+- PostgreSQL: ``pg_trgm`` GIN indexes serving ``ILIKE '%word%'``.
+- SQLite: external-content FTS5 tables with the ``trigram`` tokenizer,
+  kept in sync by triggers.
+
+Words shorter than three characters, other databases and SQLite builds
+without FTS5 fall back to ``icontains``. ``install()`` creates the indexes
+and ``rebuild()`` repopulates them; the ``rebuild_ticket_search`` command
+runs both. A migration that makes SQLite remake one of these tables drops
+its triggers and must call ``install()`` again.
+"""
+import datetime
+import re
+
+from django.db import connections
+from django.db.models import Case, DateTimeField, DurationField, ExpressionWrapper, F, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import timezone
+
+from .exports import date_range_filter
+
+# (table, indexed columns, column on tickets_ticket that points at the table)
+INDEXES = (
+    ('tickets_ticket', ('stf_no', 'description_of_problem', 'action_taken', 'remarks'), 'id'),
+    ('tickets_client', ('client_name',), 'client_record_id'),
+    ('tickets_product', ('product_name', 'brand', 'model_name'), 'product_record_id'),
+)
+SEARCH_FIELDS = (
+    'stf_no', 'description_of_problem', 'action_taken', 'remarks',
+    'client_record__client_name',
+    'product_record__product_name', 'product_record__brand', 'product_record__model_name',
+)
+MIN_INDEXED_LENGTH = 3
+
+SLA_NONE = 'none'
+SLA_ON_TRACK = 'on_track'
+SLA_WARNING = 'warning'
+SLA_URGENT = 'urgent'
+SLA_BREACHED = 'breached'
+# state -> (min, max) fraction of the SLA window already used; matches SLATimer's colours.
+SLA_WINDOWS = {
+    SLA_ON_TRACK: (None, 0.5),
+    SLA_WARNING: (0.5, 0.75),
+    SLA_URGENT: (0.75, 1),
+    SLA_BREACHED: (1, None),
+}
+SLA_STATES = (SLA_NONE, *SLA_WINDOWS)
+
+_WORD = re.compile(r'\S+')
+
+# alias -> whether the FTS5 tables exist; filled on first search.
+_fts_available = {}
+
+
+def _fts_table(table):
+    return f'{table}_fts'
+
+
+def _pg_index(table):
+    return f'{table}_search_trgm'
+
+
+def _pg_document(columns):
+    return " || ' ' || ".join(f"coalesce({column}, '')" for column in columns)
+
+
+def _like_escape(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def _sqlite_has_fts(connection):
+    alias = connection.alias
+    if alias not in _fts_available:
+        tables = set(connection.introspection.table_names())
+        _fts_available[alias] = all(_fts_table(table) in tables for table, _, _ in INDEXES)
+    return _fts_available[alias]
+
+
+def _term_condition(term, vendor):
+    """Q for one search word: any indexed table matches it."""
+    condition = Q()
+    for table, columns, ticket_column in INDEXES:
+        if vendor == 'postgresql':
+            sql = f"SELECT id FROM {table} WHERE ({_pg_document(columns)}) ILIKE %s"
+            params = (f'%{_like_escape(term)}%',)
+        else:
+            fts = _fts_table(table)
+            sql = f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s'
+            params = ('"{}"'.format(term.replace('"', '""')),)
+        condition |= Q(**{f'{ticket_column}__in': RawSQL(sql, params)})
+    return condition
+
+
+def search_tickets(queryset, text):
+    """Filter a Ticket ``queryset`` to rows matching every word of ``text``."""
+    connection = connections[queryset.db]
+    indexed = connection.vendor == 'postgresql' or (
+        connection.vendor == 'sqlite' and _sqlite_has_fts(connection)
+    )
+    for term in _WORD.findall(text):
+        if indexed and len(term) >= MIN_INDEXED_LENGTH:
+            queryset = queryset.filter(_term_condition(term, connection.vendor))
+        else:
+            condition = Q()
+            for field in SEARCH_FIELDS:
+                condition |= Q(**{f'{field}__icontains': term})
+            queryset = queryset.filter(condition)
+    return queryset
+
+
+def sla_days():
+    """Expression form of ``Ticket.sla_estimated_days``."""
+    return Case(
+        When(confirmed_by_admin=False, then=Value(0)),
+        When(priority='', then=Value(0)),
+        default=Coalesce(
+            NullIf('estimated_resolution_days_override', Value(0)),
+            NullIf('type_of_service__estimated_resolution_days', Value(0)),
+            Value(0),
+        ),
+        output_field=IntegerField(),
+    )
+
+
+def _sla_point(fraction):
+    """When a running ticket will have used ``fraction`` of its SLA window."""
+    window = ExpressionWrapper(
+        F('sla_days') * Value(datetime.timedelta(days=fraction)), output_field=DurationField(),
+    )
+    return ExpressionWrapper(F('time_in') + window, output_field=DateTimeField())
+
+
+def filter_sla(queryset, state, now=None):
+    """Filter tickets by SLA state; unknown states leave the queryset unchanged.
+
+    ``none`` is every ticket without an SLA (unconfirmed, no priority or no
+    resolution days). The other states only cover tickets whose SLA clock
+    is running: not closed or unresolved. The clock starts at ``time_in``,
+    so a ticket nobody has started on is on track.
+    """
+    from .models import Ticket
+
+    if state not in SLA_STATES:
+        return queryset
+    queryset = queryset.alias(sla_days=sla_days())
+    if state == SLA_NONE:
+        return queryset.filter(sla_days=0)
+    now = now or timezone.now()
+    queryset = queryset.filter(sla_days__gt=0).exclude(
+        status__in=(Ticket.STATUS_CLOSED, Ticket.STATUS_UNRESOLVED),
+    )
+    low, high = SLA_WINDOWS[state]
+    if low is not None:
+        queryset = queryset.alias(sla_low=_sla_point(low)).filter(sla_low__lte=now)
+    if high is not None:
+        queryset = queryset.alias(sla_high=_sla_point(high)).filter(
+            Q(time_in__isnull=True) | Q(sla_high__gt=now),
+        )
+    return queryset
+
+
+def _id_list(raw):
+    ids = []
+    for part in raw.split(','):
+        try:
+            ids.append(int(part))
+        except ValueError:
+            pass
+    return ids
+
+
+def filter_tickets(queryset, params, now=None):
+    """Apply the ticket list's filter and search parameters to ``queryset``.
+
+    Multi-valued parameters take comma-separated values. Invalid ids, dates
+    and SLA states are ignored rather than rejected.
+    """
+    for param, field in (('status', 'status'), ('priority', 'priority')):
+        values = [value for value in (params.get(param) or '').split(',') if value]
+        if values:
+            queryset = queryset.filter(**{f'{field}__in': values})
+
+    if params.get('assigned_to') == 'none':
+        queryset = queryset.filter(assigned_to__isnull=True)
+    for param, field in (('assigned_to', 'assigned_to'), ('client', 'client_record'), ('product', 'product_record')):
+        ids = _id_list(params.get(param) or '')
+        if ids:
+            queryset = queryset.filter(**{f'{field}__in': ids})
+
+    queryset = queryset.filter(**date_range_filter(params, 'created_at'))
+
+    sla = params.get('sla')
+    if sla:
+        queryset = filter_sla(queryset, sla, now=now)
+
+    search = (params.get('search') or '').strip()
+    if search:
+        queryset = search_tickets(queryset, search)
+    return queryset
+
+
+def _sqlite_statements(table, columns):
+    fts = _fts_table(table)
+    names = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    insert = f'INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values});'
+    delete = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values});"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{names}, content='{table}', content_rowid='id', tokenize='trigram')",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {names} ON {table} '
+        f'BEGIN {delete} {insert} END',
+    ]
+
+
+def install(connection):
+    """Create the search indexes (and SQLite triggers) if missing; returns whether they exist."""
+    _fts_available.pop(connection.alias, None)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for table, columns, _ in INDEXES:
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {_pg_index(table)} ON {table} '
+                    f'USING gin (({_pg_document(columns)}) gin_trgm_ops)'
+                )
+            return True
+        if connection.vendor == 'sqlite':
+            try:
+                for table, columns, _ in INDEXES:
+                    for statement in _sqlite_statements(table, columns):
+                        cursor.execute(statement)
+            except Exception:
+                # SQLite without FTS5 or its trigram tokenizer (3.34+): search keeps using icontains.
+                return False
+            return True
+    return False
+
+
+def uninstall(connection):
+    _fts_available.pop(connection.alias, None)
+    with connection.cursor() as cursor:
+        for table, _, _ in INDEXES:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f'DROP INDEX IF EXISTS {_pg_index(table)}')
+            elif connection.vendor == 'sqlite':
+                fts = _fts_table(table)
+                for suffix in ('ai', 'ad', 'au'):
+                    cursor.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+                cursor.execute(f'DROP TABLE IF EXISTS {fts}')
+
+
+def rebuild(connection):
+    """Repopulate the SQLite FTS tables from their source tables (PostgreSQL indexes need no rebuild)."""
+    if connection.vendor == 'sqlite' and _sqlite_has_fts(connection):
+        with connection.cursor() as cursor:
+            for table, _, _ in INDEXES:
+                fts = _fts_table(table)
+                cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
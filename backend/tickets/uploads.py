@@ -0,0 +1,257 @@
+"""Resumable, chunked attachment uploads.
+
+A client opens a ``ChunkedUpload`` with the file's name, size and type,
+then sends the bytes as a series of chunks, each tagged with its offset and
+SHA-256. A chunk is streamed to a scratch file while it is hashed, so memory
+stays constant however large the file is. Only a verified chunk that starts
+exactly at the upload's current offset is appended to the part file, under
+a short row lock. The stored offset is the source of truth: after a dropped
+connection the client asks for it and carries on from there.
+
+Finalizing stages the part file into the blob store with ``tickets.blobs``
+(a move on ``FileSystemStorage``; nothing when the same content is already
+stored) before any lock is taken, then creates the ``TicketAttachment``.
+If that fails, the part file is put back. Finalize is idempotent, so a
+client that lost the response can simply call it again.
+
+Part files live under ``FILE_UPLOAD_TEMP_DIR/chunked``. Unfinished uploads
+idle for ``UPLOAD_MAX_IDLE_HOURS`` are removed by the ``purge_stale_uploads``
+command. Completed ones have no part file left and are kept, so a repeated
+finalize still answers with the attachment; they go with their ticket.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+READ_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """A rejected upload request; ``status`` is the HTTP status to answer with."""
+
+    def __init__(self, detail, status=400, offset=None):
+        super().__init__(detail)
+        self.detail = detail
+        self.status = status
+        self.offset = offset
+
+    def as_response_data(self):
+        data = {'detail': self.detail}
+        if self.offset is not None:
+            data['offset'] = self.offset
+        return data
+
+
+def chunk_size():
+    """Largest chunk accepted in one request."""
+    return getattr(settings, 'UPLOAD_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+def _upload_dir():
+    path = Path(settings.FILE_UPLOAD_TEMP_DIR) / 'chunked'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def part_path(upload):
+    return _upload_dir() / f'{upload.pk}.part'
+
+
+class _PartFile(File):
+    """The finished part file; ``temporary_file_path`` lets FileSystemStorage move it instead of copying."""
+
+    def __init__(self, path, name, content_type=''):
+        super().__init__(open(path, 'rb'), name=name)
+        self._path = str(path)
+        self.content_type = content_type
+
+    def temporary_file_path(self):
+        return self._path
+
+
+def start_upload(ticket, user, *, filename, size, content_type='', sha256='', is_resolution_proof=True):
+    """Open an upload and create its empty part file.
+
+    Raises ``SuspiciousFileOperation`` when ``filename`` has no usable name.
+    """
+    from .models import ChunkedUpload
+
+    upload = ChunkedUpload.objects.create(
+        ticket=ticket,
+        uploaded_by=user,
+        filename=get_valid_filename(Path(filename).name)[:255],
+        content_type=content_type,
+        size=size,
+        sha256=sha256.lower(),
+        is_resolution_proof=is_resolution_proof,
+    )
+    part_path(upload).touch()
+    return upload
+
+
+def _receive(stream, length, scratch):
+    """Copy exactly ``length`` bytes from ``stream`` into ``scratch``; returns their SHA-256 hex digest."""
+    digest = hashlib.sha256()
+    remaining = length
+    while remaining:
+        data = stream.read(min(READ_SIZE, remaining))
+        if not data:
+            raise UploadError(f'Chunk ended after {length - remaining} of {length} bytes.')
+        scratch.write(data)
+        digest.update(data)
+        remaining -= len(data)
+    return digest.hexdigest()
+
+
+def write_chunk(upload, *, offset, length, checksum, stream):
+    """Verify the chunk in ``stream`` and append it at ``offset``; returns the new offset.
+
+    The chunk is read and hashed before any lock is taken. Appending writes
+    at the locked row's offset and truncates after it, so bytes left behind
+    by an append whose transaction never committed are overwritten.
+    """
+    from .models import ChunkedUpload
+
+    if upload.status == ChunkedUpload.STATUS_COMPLETE:
+        raise UploadError('Upload is already complete.', status=409, offset=upload.offset)
+    if offset != upload.offset:
+        raise UploadError('Offset does not match the upload.', status=409, offset=upload.offset)
+    if length <= 0:
+        raise UploadError('Chunk is empty.')
+    if length > chunk_size():
+        raise UploadError(f'Chunks may be at most {chunk_size()} bytes.', status=413)
+    if offset + length > upload.size:
+        raise UploadError('Chunk runs past the declared file size.', offset=upload.offset)
+
+    with tempfile.TemporaryFile(dir=_upload_dir()) as scratch:
+        digest = _receive(stream, length, scratch)
+        if digest != checksum.lower():
+            raise UploadError('Chunk checksum does not match.', offset=upload.offset)
+
+        with transaction.atomic():
+            locked = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+            if locked.status == ChunkedUpload.STATUS_COMPLETE or locked.offset != offset:
+                # Another request got there first.
+                raise UploadError('Offset does not match the upload.', status=409, offset=locked.offset)
+            scratch.seek(0)
+            with open(part_path(locked), 'r+b') as part:
+                part.seek(offset)
+                while data := scratch.read(READ_SIZE):
+                    part.write(data)
+                part.truncate()
+                part.flush()
+                os.fsync(part.fileno())
+            locked.offset = offset + length
+            locked.save(update_fields=['offset', 'updated_at'])
+
+    upload.offset = locked.offset
+    return upload.offset
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        while data := fh.read(1024 * 1024):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def finalize_upload(upload):
+    """Turn a fully received upload into a TicketAttachment; returns ``(attachment, created)``.
+
+    The whole-file digest is computed (and checked against the declared
+    one), and the file is type-checked and staged into the blob store,
+    before the row is locked; once every byte has arrived no chunk can
+    change the part file. Content that is not the type the upload claimed
+    is rejected with 400.
+    """
+    from . import blobs
+    from .filetypes import AttachmentTypeError
+    from .models import ChunkedUpload
+
+    staged = part = None
+    if upload.status != ChunkedUpload.STATUS_COMPLETE:
+        if upload.offset != upload.size:
+            raise UploadError('Upload is incomplete.', status=409, offset=upload.offset)
+        path = part_path(upload)
+        if not path.exists():
+            raise UploadError('The uploaded data is gone; start a new upload.', status=410)
+        digest = _file_digest(path)
+        if upload.sha256 and digest != upload.sha256:
+            raise UploadError('File checksum does not match.', status=422)
+        part = _PartFile(path, upload.filename, upload.content_type)
+
+    try:
+        if part is not None:
+            try:
+                staged = blobs.stage(part, filename=upload.filename, digest=digest)
+            except AttachmentTypeError as e:
+                raise UploadError(e.detail, status=400)
+        with transaction.atomic():
+            upload = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+            if upload.status == ChunkedUpload.STATUS_COMPLETE:
+                if staged is not None:
+                    # A concurrent finalize got there first.
+                    staged.discard()
+                if upload.attachment is None:
+                    raise UploadError('The attachment for this upload was deleted.', status=410)
+                return upload.attachment, False
+
+            attachment = blobs.store_staged(
+                upload.ticket, staged,
+                uploaded_by=upload.uploaded_by,
+                is_resolution_proof=upload.is_resolution_proof,
+                filename=upload.filename,
+            )
+            upload.status = ChunkedUpload.STATUS_COMPLETE
+            upload.attachment = attachment
+            upload.save(update_fields=['status', 'attachment', 'updated_at'])
+    except Exception:
+        if staged is not None:
+            staged.discard()
+        raise
+    finally:
+        if part is not None:
+            part.close()
+
+    # Already-stored content, and storages that copy rather than move,
+    # leave the part file behind.
+    part_path(upload).unlink(missing_ok=True)
+    return attachment, True
+
+
+def abort_upload(upload):
+    """Discard an upload and its part file."""
+    part_path(upload).unlink(missing_ok=True)
+    upload.delete()
+
+
+def purge_stale_uploads(max_age=None, now=None):
+    """Delete unfinished uploads idle for longer than ``max_age`` (default ``UPLOAD_MAX_IDLE_HOURS``); returns the count.
+
+    Completed uploads are kept so that finalize stays idempotent.
+    """
+    from .models import ChunkedUpload
+
+    if max_age is None:
+        max_age = timezone.timedelta(hours=getattr(settings, 'UPLOAD_MAX_IDLE_HOURS', 24))
+    cutoff = (now or timezone.now()) - max_age
+    purged = 0
+    stale = ChunkedUpload.objects.filter(updated_at__lt=cutoff).exclude(status=ChunkedUpload.STATUS_COMPLETE)
+    for upload in stale.iterator():
+        abort_upload(upload)
+        purged += 1
+    if purged:
+        logger.info(f'Purged {purged} stale chunked uploads')
+    return purged
@@ -1,41 +1,64 @@
-from rest_framework import viewsets
-from django.db.models import Count, Q
+from rest_framework import serializers, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 from django.utils import timezone
 
-from ..models import AuditLog
+from ..models import AuditLog, AuditSummaryBucket
 from ..serializers import AuditLogSerializer
 from ..permissions import IsAdminLevel
+from ..archive import archive_page, archived_until
+from ..audit_search import record_matcher, search_audit_logs
+from ..exports import EXPORT_RENDERERS, StreamingExport, date_range_filter, display_name, user_name_fields
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+AUDIT_EXPORT = StreamingExport(
+    name='audit_logs',
+    fields=[
+        'timestamp', 'entity', 'entity_id', 'activity', 'action', 'actor_id',
+        'actor_email', 'ip_address', 'changes', *user_name_fields('actor'),
+    ],
+    columns=[
+        ('timestamp', 'Timestamp', lambda r: r['timestamp']),
+        ('entity', 'Entity', lambda r: r['entity']),
+        ('entity_id', 'Entity ID', lambda r: r['entity_id']),
+        ('activity', 'Activity', lambda r: r['activity']),
+        ('action', 'Action', lambda r: r['action']),
+        ('actor_name', 'Actor Name',
+         lambda r: display_name(r, 'actor') if r['actor_id'] else (r['actor_email'] or 'System')),
+        ('actor_email', 'Actor Email', lambda r: r['actor_email']),
+        ('ip_address', 'IP Address', lambda r: r['ip_address']),
+        ('changes', 'Changes', lambda r: r['changes']),
+    ],
+    date_field='timestamp',
+)
+
 
 class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     """Read-only viewset for audit logs.
     - Superadmin sees audit logs of both admin and employee actors.
     - Admin sees audit logs of employee actors only.
+    - A list whose date_from reaches back past the hot table also returns
+      matching logs from the archive segments (see tickets.archive), at most
+      archive_page_size of them. When more match, a `Link: <...>; rel="next"`
+      header points at the rest: the same query with `archive_cursor`, which
+      returns only the next archived page.
     """
     serializer_class = AuditLogSerializer
+    archive_page_size = 500
     permission_classes = [IsAuthenticated, IsAdminLevel]
     swagger_tags = ['Audit Logs']
 
     def _role_filtered_qs(self):
-        """Return base queryset filtered by the requesting user's role."""
-        qs = AuditLog.objects.all().order_by('-timestamp')
-        user = self.request.user
-        if user.role == User.ROLE_SUPERADMIN:
-            qs = qs.filter(
-                Q(actor__role__in=[User.ROLE_ADMIN, User.ROLE_EMPLOYEE]) |
-                Q(actor__isnull=True)
-            )
-        elif user.role in (User.ROLE_ADMIN, User.ROLE_SALES):
-            qs = qs.filter(actor__role=User.ROLE_EMPLOYEE)
-        else:
-            qs = qs.none()
-        return qs
+        """Return base queryset filtered by the requesting user's role.
+
+        Filters on the actor_role snapshot, so the (actor_role, -timestamp)
+        index serves it without joining users.
+        """
+        return AuditLog.objects.filter(actor_role__in=self._visible_actor_roles()).order_by('-timestamp')
 
     def get_queryset(self):
         if getattr(self, 'swagger_fake_view', False):
@@ -56,67 +79,100 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
 
         search = self.request.query_params.get('search')
         if search:
-            qs = qs.filter(
-                Q(activity__icontains=search) |
-                Q(actor_email__icontains=search) |
-                Q(entity__icontains=search)
-            )
-
-        date_from = self.request.query_params.get('date_from')
-        date_to = self.request.query_params.get('date_to')
-        if date_from:
-            qs = qs.filter(timestamp__date__gte=date_from)
-        if date_to:
-            qs = qs.filter(timestamp__date__lte=date_to)
+            qs = search_audit_logs(qs, search)
+
+        qs = qs.filter(**date_range_filter(self.request.query_params, 'timestamp'))
 
         return qs
 
+    def list(self, request, *args, **kwargs):
+        cursor = request.query_params.get('archive_cursor')
+        try:
+            archived, next_cursor = self._archived_logs(cursor)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if cursor:
+            # A continuation page: the hot rows came with the first one.
+            response = Response(archived)
+        else:
+            response = super().list(request, *args, **kwargs)
+            if archived:
+                # Archived logs are all older than the hot table's, so they follow it.
+                response.data = [*response.data, *archived]
+        if next_cursor:
+            url = replace_query_param(request.build_absolute_uri(), 'archive_cursor', next_cursor)
+            response['Link'] = f'<{url}>; rel="next"'
+        return response
+
+    def _visible_actor_roles(self):
+        """Actor roles whose logs the user may see; '' stands for system entries."""
+        user = self.request.user
+        if user.role == User.ROLE_SUPERADMIN:
+            return [User.ROLE_ADMIN, User.ROLE_EMPLOYEE, '']
+        if user.role in (User.ROLE_ADMIN, User.ROLE_SALES):
+            return [User.ROLE_EMPLOYEE]
+        return []
+
+    def _archived_logs(self, cursor=None):
+        """A page of archived logs matching the list filters when date_from predates the hot table.
+
+        Returns ``(records, next_cursor)``; raises ValueError for a bad ``cursor``.
+        """
+        params = self.request.query_params
+        bounds = date_range_filter(params, 'timestamp')
+        start = bounds.get('timestamp__gte')
+        if start is None:
+            return [], None
+        boundary = archived_until()
+        if boundary is None or start > boundary:
+            return [], None
+
+        actor_email = (params.get('actor_email') or '').lower()
+        search = params.get('search')
+        search_match = record_matcher(search) if search else None
+
+        def match(record):
+            if actor_email and actor_email not in (record['actor_email'] or '').lower():
+                return False
+            return search_match is None or search_match(record)
+
+        timestamp = serializers.DateTimeField()
+        records, next_cursor = archive_page(
+            self.archive_page_size,
+            cursor,
+            start=start,
+            end=bounds.get('timestamp__lt'),
+            entity=params.get('entity'),
+            action=params.get('action'),
+            actor_roles=set(self._visible_actor_roles()),
+            match=match,
+        )
+        records = [{**record, 'timestamp': timestamp.to_representation(record['timestamp'])} for record in records]
+        return records, next_cursor
+
     @action(detail=False, methods=['get'])
     def summary(self, request):
-        """Return audit log summary stats for dashboard cards."""
-        qs = self._role_filtered_qs()
-        total = qs.count()
-        by_entity = dict(qs.values_list('entity').annotate(c=Count('id')).values_list('entity', 'c'))
-        by_action = dict(qs.values_list('action').annotate(c=Count('id')).values_list('action', 'c'))
-        last_24h = qs.filter(timestamp__gte=timezone.now() - timezone.timedelta(hours=24)).count()
+        """Return audit log summary stats for dashboard cards.
+
+        Read from the hourly AuditSummaryBucket counters; only the partial
+        hour at the start of the last-24h window touches the audit table.
+        `hourly` is the per-hour trend for the last 24 hours.
+        """
+        summary = AuditSummaryBucket.summary(self._visible_actor_roles())
+        since = timezone.now() - timezone.timedelta(hours=24)
+        first_full_hour = AuditSummaryBucket.hour_of(since) + timezone.timedelta(hours=1)
+        partial = self._role_filtered_qs().filter(timestamp__gte=since, timestamp__lt=first_full_hour).count()
+        last_24h = partial + sum(point['count'] for point in summary['hourly'] if point['hour'] >= first_full_hour)
 
         return Response({
-            'total': total,
+            'total': summary['total'],
             'last_24h': last_24h,
-            'by_entity': by_entity,
-            'by_action': by_action,
+            'by_entity': summary['by_entity'],
+            'by_action': summary['by_action'],
+            'hourly': summary['hourly'],
         })
 
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], renderer_classes=EXPORT_RENDERERS)
     def export(self, request):
-        """Export audit logs as CSV."""
-        import csv, json
-        from django.http import HttpResponse as DjangoHttpResponse
-
-        qs = self.get_queryset().select_related('actor')
-        response = DjangoHttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="audit_logs_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow(['Timestamp', 'Entity', 'Entity ID', 'Activity', 'Action', 'Actor Name', 'Actor Email', 'IP Address', 'Changes'])
-        for log in qs[:5000]:
-            actor_name = ''
-            if log.actor:
-                full = log.actor.get_full_name()
-                actor_name = full if full.strip() else log.actor.username
-            else:
-                actor_name = log.actor_email or 'System'
-
-            writer.writerow([
-                log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                log.entity,
-                log.entity_id or '',
-                log.activity,
-                log.action,
-                actor_name,
-                log.actor_email,
-                log.ip_address or '',
-                json.dumps(log.changes) if log.changes else '',
-            ])
-
-        return response
+        """Stream audit logs as CSV or JSONL (see tickets.exports for options)."""
+        return AUDIT_EXPORT.response(request, self.get_queryset())
@@ -5,7 +5,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from ..models import Category, Product, Client, Ticket
-from ..serializers import CategorySerializer, ProductSerializer, ClientSerializer, TicketSerializer
+from ..serializers import CategorySerializer, ProductSerializer, ClientSerializer, TicketSummarySerializer
 from ..permissions import IsAdminLevel, IsSupervisorLevel
 
 
@@ -115,7 +115,7 @@ class ClientViewSet(viewsets.ModelViewSet):
     def tickets(self, request, pk=None):
         """Return all tickets linked to this client."""
         client = self.get_object()
-        tickets = Ticket.objects.filter(
-            Q(client_record=client) | Q(client__iexact=client.client_name)
-        ).order_by('-created_at')
-        return Response(TicketSerializer(tickets, many=True, context={'request': request}).data)
+        tickets = TicketSummarySerializer.setup_eager_loading(
+            Ticket.objects.filter(client_record=client).order_by('-created_at')
+        )
+        return Response(TicketSummarySerializer(tickets, many=True, context={'request': request}).data)
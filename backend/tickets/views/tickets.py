@@ -1,24 +1,33 @@
 from rest_framework import viewsets, status
-from django.db.models import Count, Q
+from django.db.models import Count, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
+from django.core.exceptions import SuspiciousFileOperation
 from django.utils import timezone
-from pathlib import Path
+from types import SimpleNamespace
+import re
 
 from tickets.input_security import clean_text, clean_text_list
 
 from ..models import (
-    Ticket, TicketTask, TicketAttachment, AssignmentSession,
-    Message, EscalationLog, AuditLog, Product, Client,
+    Ticket, TicketTask, TicketAttachment, ChunkedUpload, AssignmentSession,
+    Message, EscalationLog, AuditLog, Product, Client, TicketStatsSnapshot,
 )
 from ..serializers import (
-    TicketSerializer, TypeOfServiceSerializer, TicketAttachmentSerializer,
+    TicketSerializer, TicketSummarySerializer, TypeOfServiceSerializer, TicketAttachmentSerializer,
     EscalationLogSerializer, MessageSerializer, AssignmentSessionSerializer,
     AdminCreateTicketSerializer, EmployeeTicketActionSerializer,
 )
 from ..permissions import IsAdminLevel, IsSupervisorLevel, IsAssignedEmployee, IsAdminOrAssignedEmployee, IsTicketParticipant
+from ..pagination import TicketCursorPagination
+from ..ticket_search import filter_tickets
+from .. import uploads
+from ..blobs import store_attachments
+from ..filetypes import AttachmentTypeError, claimed_attachment_type
+from ..exports import EXPORT_RENDERERS, StreamingExport, date_range_filter, display_name, user_name_fields
 from users.serializers import UserSerializer
 from ._helpers import _get_client_ip
 
@@ -41,22 +50,7 @@ def _clean_ticket_text(value, *, max_length=None, allow_newlines=False, strip_ta
 
 
 def _get_attachment_type(file):
-    content_type = (getattr(file, 'content_type', '') or '').lower()
-    extension = Path(getattr(file, 'name', '')).suffix.lower()
-
-    if content_type.startswith('image/') or extension in {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.bmp'}:
-        return 'screenshot'
-    if content_type.startswith('video/') or extension in {'.mp4', '.webm'}:
-        return 'recording'
-    if content_type in {
-        'application/pdf',
-        'application/msword',
-        'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-        'application/vnd.ms-excel',
-        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-    } or extension in {'.pdf', '.doc', '.docx', '.xls', '.xlsx'}:
-        return 'file'
-    return None
+    return claimed_attachment_type(getattr(file, 'name', ''), getattr(file, 'content_type', ''))
 
 
 def _get_attachment_size_limit(attachment_type):
@@ -77,6 +71,7 @@ class TicketViewSet(viewsets.ModelViewSet):
     queryset = Ticket.objects.all().order_by('-created_at')
     serializer_class = TicketSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TicketCursorPagination
     swagger_tags = ['Tickets']
 
     def get_queryset(self):
@@ -84,12 +79,37 @@ class TicketViewSet(viewsets.ModelViewSet):
             return Ticket.objects.none()
         user = self.request.user
         if user.role == User.ROLE_SALES:
-            return Ticket.objects.filter(created_by=user).order_by('-created_at')
-        if user.role in (User.ROLE_ADMIN, User.ROLE_SUPERADMIN):
-            return Ticket.objects.all().order_by('-created_at')
-        if user.role == User.ROLE_EMPLOYEE:
-            return Ticket.objects.filter(assigned_to=user).order_by('-created_at')
-        return Ticket.objects.none()
+            qs = Ticket.objects.filter(created_by=user)
+        elif user.role in (User.ROLE_ADMIN, User.ROLE_SUPERADMIN):
+            qs = Ticket.objects.all()
+        elif user.role == User.ROLE_EMPLOYEE:
+            qs = Ticket.objects.filter(assigned_to=user)
+        else:
+            return Ticket.objects.none()
+        qs = qs.order_by('-created_at')
+        if self.action == 'list':
+            qs = filter_tickets(qs, self.request.query_params)
+        # Read paths serialize the full nested ticket, so plan the joins up front.
+        # Write actions re-serialize after mutating relations and must not reuse
+        # stale prefetch caches.
+        if self.action in ('list', 'retrieve'):
+            qs = self.get_serializer_class().setup_eager_loading(qs, fields=self._requested_fields())
+        return qs
+
+    def _wants_summary(self):
+        return self.request.query_params.get('view') == 'summary'
+
+    def _requested_fields(self):
+        """Sparse fieldset for read paths: `?fields=a,b,c`."""
+        raw = self.request.query_params.get('fields')
+        if raw:
+            return ('id',) + tuple(f.strip() for f in raw.split(',') if f.strip())
+        return None
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in ('list', 'retrieve') and not getattr(self, 'swagger_fake_view', False):
+            kwargs.setdefault('fields', self._requested_fields())
+        return super().get_serializer(*args, **kwargs)
 
     def _audit_ticket(self, request, ticket, action, activity, changes=None):
         """Shortcut to create an AuditLog entry for a ticket action."""
@@ -108,6 +128,8 @@ class TicketViewSet(viewsets.ModelViewSet):
         DRF browsable API shows different form fields per role."""
         if getattr(self, 'swagger_fake_view', False):
             return TicketSerializer
+        if self.action in ('list', 'retrieve') and self._wants_summary():
+            return TicketSummarySerializer
         if self.action == 'create':
             user = self.request.user
             if user.is_authenticated:
@@ -347,6 +369,9 @@ class TicketViewSet(viewsets.ModelViewSet):
             # Admin or assigned employee
             'escalate_external':        [IsAuthenticated(), IsAdminOrAssignedEmployee()],
             'upload_resolution_proof':  [IsAuthenticated(), IsAdminOrAssignedEmployee()],
+            'start_upload':             [IsAuthenticated(), IsAdminOrAssignedEmployee()],
+            'upload':                   [IsAuthenticated(), IsAdminOrAssignedEmployee()],
+            'finalize_upload':          [IsAuthenticated(), IsAdminOrAssignedEmployee()],
             'update_task':              [IsAuthenticated(), IsAdminOrAssignedEmployee()],
             # Admin or assigned employee — processing actions
             'start_work':               [IsAuthenticated(), IsAdminOrAssignedEmployee()],
@@ -456,6 +481,7 @@ class TicketViewSet(viewsets.ModelViewSet):
                 group = f'chat_{ticket_id}_{ch}'
                 async_to_sync(channel_layer.group_send)(group, {
                     'type': 'force_disconnect',
+                    'user_id': old_employee.id,
                     'reason': 'You have been unassigned from this ticket.',
                 })
 
@@ -976,14 +1002,18 @@ class TicketViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post'], url_path='upload_resolution_proof')
     def upload_resolution_proof(self, request, pk=None):
-        """Upload file attachments marked as resolution proof."""
+        """Upload file attachments marked as resolution proof.
+
+        Every file must be a supported type within its size limit, and its
+        leading bytes must be the type its name or declared content type
+        claims (checked by the blob store). The files are stored together;
+        if one cannot be saved, none are.
+        """
         ticket = self.get_object()
         user = request.user
         files = request.FILES.getlist('files')
         if not files:
             return Response({'detail': 'No files provided.'}, status=status.HTTP_400_BAD_REQUEST)
-        attachments = []
-        validated_files = []
         for f in files:
             attachment_type = _get_attachment_type(f)
             if not attachment_type:
@@ -997,11 +1027,11 @@ class TicketViewSet(viewsets.ModelViewSet):
                     {'detail': f'"{f.name}" exceeds the {_get_attachment_limit_label(attachment_type)} limit.'},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
-            validated_files.append((f, attachment_type))
 
-        for f, _attachment_type in validated_files:
-            att = TicketAttachment.objects.create(ticket=ticket, file=f, uploaded_by=user, is_resolution_proof=True)
-            attachments.append(att)
+        try:
+            attachments = store_attachments(ticket, files, uploaded_by=user, is_resolution_proof=True)
+        except AttachmentTypeError as e:
+            return Response({'detail': e.detail}, status=status.HTTP_400_BAD_REQUEST)
 
         self._audit_ticket(request, ticket, AuditLog.ACTION_UPLOAD,
                            f"{user.email} uploaded {len(files)} resolution proof file(s) on ticket {ticket.stf_no}",
@@ -1009,6 +1039,111 @@ class TicketViewSet(viewsets.ModelViewSet):
 
         return Response(TicketAttachmentSerializer(attachments, many=True, context={'request': request}).data, status=status.HTTP_201_CREATED)
 
+    # ── Resumable uploads (see tickets.uploads) ──
+
+    @staticmethod
+    def _upload_state(upload):
+        return {
+            'id': str(upload.id),
+            'filename': upload.filename,
+            'size': upload.size,
+            'offset': upload.offset,
+            'chunk_size': uploads.chunk_size(),
+            'status': upload.status,
+        }
+
+    def _get_upload(self, request, ticket, upload_id):
+        return ChunkedUpload.objects.filter(id=upload_id, ticket=ticket, uploaded_by=request.user).first()
+
+    @action(detail=True, methods=['post'], url_path='uploads')
+    def start_upload(self, request, pk=None):
+        """Open a resumable resolution proof upload.
+
+        Body: `filename`, `size` in bytes, optional `content_type` and
+        `sha256` of the whole file. Then PUT each chunk to
+        `uploads/<id>/` and POST `uploads/<id>/finalize/`.
+        """
+        ticket = self.get_object()
+        filename = str(request.data.get('filename') or '')
+        content_type = str(request.data.get('content_type') or '')[:100]
+        sha256 = str(request.data.get('sha256') or '')
+        try:
+            size = int(request.data.get('size'))
+        except (TypeError, ValueError):
+            size = 0
+        if not filename or size <= 0:
+            return Response({'detail': 'filename and a positive size are required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if sha256 and not re.fullmatch(r'[0-9a-fA-F]{64}', sha256):
+            return Response({'detail': 'sha256 must be a hex SHA-256 digest.'}, status=status.HTTP_400_BAD_REQUEST)
+        attachment_type = _get_attachment_type(SimpleNamespace(name=filename, content_type=content_type))
+        if not attachment_type:
+            return Response(
+                {'detail': f'"{filename}" is not a supported attachment type. Use images, videos, PDF, DOC, DOCX, XLS, or XLSX.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if size > _get_attachment_size_limit(attachment_type):
+            return Response(
+                {'detail': f'"{filename}" exceeds the {_get_attachment_limit_label(attachment_type)} limit.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            upload = uploads.start_upload(
+                ticket, request.user, filename=filename, size=size, content_type=content_type, sha256=sha256,
+            )
+        except SuspiciousFileOperation:
+            return Response({'detail': 'Invalid filename.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self._upload_state(upload), status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get', 'put', 'delete'], url_path='uploads/(?P<upload_id>[0-9a-f-]{36})')
+    def upload(self, request, pk=None, upload_id=None):
+        """GET: the upload's verified offset, to resume from. DELETE: abort.
+
+        PUT: the raw chunk bytes starting at the `Upload-Offset` header, with
+        their hex SHA-256 in `Upload-Checksum`. A wrong offset answers 409
+        with the current `offset`.
+        """
+        ticket = self.get_object()
+        upload = self._get_upload(request, ticket, upload_id)
+        if upload is None:
+            return Response({'detail': 'Upload not found.'}, status=status.HTTP_404_NOT_FOUND)
+        if request.method == 'GET':
+            return Response(self._upload_state(upload))
+        if request.method == 'DELETE':
+            uploads.abort_upload(upload)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        try:
+            offset = int(request.META.get('HTTP_UPLOAD_OFFSET', ''))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return Response({'detail': 'Upload-Offset must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        checksum = request.META.get('HTTP_UPLOAD_CHECKSUM', '')
+        if not checksum:
+            return Response({'detail': 'Upload-Checksum is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            uploads.write_chunk(upload, offset=offset, length=length, checksum=checksum, stream=request.stream)
+        except uploads.UploadError as e:
+            return Response(e.as_response_data(), status=e.status)
+        return Response(self._upload_state(upload))
+
+    @action(detail=True, methods=['post'], url_path='uploads/(?P<upload_id>[0-9a-f-]{36})/finalize')
+    def finalize_upload(self, request, pk=None, upload_id=None):
+        """Create the attachment once every byte has arrived. Safe to repeat."""
+        ticket = self.get_object()
+        upload = self._get_upload(request, ticket, upload_id)
+        if upload is None:
+            return Response({'detail': 'Upload not found.'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            attachment, created = uploads.finalize_upload(upload)
+        except uploads.UploadError as e:
+            return Response(e.as_response_data(), status=e.status)
+        if created:
+            self._audit_ticket(request, ticket, AuditLog.ACTION_UPLOAD,
+                               f"{request.user.email} uploaded 1 resolution proof file(s) on ticket {ticket.stf_no}",
+                               changes={'file_count': 1, 'file_names': [upload.filename], 'chunked': True})
+        data = TicketAttachmentSerializer([attachment], many=True, context={'request': request}).data
+        return Response(data, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
     @action(detail=True, methods=['patch'], url_path='update_task/(?P<task_id>[0-9]+)')
     def update_task(self, request, pk=None, task_id=None):
         """Update a task's status (todo, in_progress, done)."""
@@ -1033,8 +1168,10 @@ class TicketViewSet(viewsets.ModelViewSet):
             return Response({'detail': 'Attachment not found.'}, status=status.HTTP_404_NOT_FOUND)
         if not request.user.is_admin_level and att.uploaded_by != request.user:
             return Response({'detail': 'You can only delete your own attachments.'}, status=status.HTTP_403_FORBIDDEN)
-        file_name = att.file.name if att.file else 'unknown'
-        att.file.delete(save=False)
+        file_name = att.original_name or (att.file.name if att.file else 'unknown')
+        if att.blob_id is None:
+            att.file.delete(save=False)
+        # Shared content is released by the post_delete signal (tickets.blobs).
         att.delete()
 
         self._audit_ticket(request, ticket, AuditLog.ACTION_DELETE,
@@ -1065,38 +1202,24 @@ class TicketViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        """Dashboard statistics scoped to user role."""
-        from django.db.models import Avg, F, ExpressionWrapper, DurationField
-        qs = self.get_queryset()
-        by_status = dict(qs.values_list('status').annotate(c=Count('id')).values_list('status', 'c'))
-        by_priority = dict(qs.exclude(priority='').values_list('priority').annotate(c=Count('id')).values_list('priority', 'c'))
-        total = qs.count()
-        open_count = by_status.get(Ticket.STATUS_OPEN, 0)
-        in_progress = by_status.get(Ticket.STATUS_IN_PROGRESS, 0)
-        closed = by_status.get(Ticket.STATUS_CLOSED, 0)
-        escalated = by_status.get(Ticket.STATUS_ESCALATED, 0) + by_status.get(Ticket.STATUS_ESCALATED_EXTERNAL, 0)
-        pending = by_status.get(Ticket.STATUS_PENDING_CLOSURE, 0)
-
-        closed_with_times = qs.filter(status=Ticket.STATUS_CLOSED, time_in__isnull=False, time_out__isnull=False)
-        avg_resolution = 0
-        if closed_with_times.exists():
-            durations = closed_with_times.annotate(
-                duration=ExpressionWrapper(F('time_out') - F('time_in'), output_field=DurationField())
-            ).aggregate(avg=Avg('duration'))
-            if durations['avg']:
-                avg_resolution = durations['avg'].total_seconds() / 3600  # hours
-
-        return Response({
-            'total': total,
-            'by_status': by_status,
-            'by_priority': by_priority,
-            'open': open_count,
-            'in_progress': in_progress,
-            'closed': closed,
-            'escalated': escalated,
-            'pending': pending,
-            'avg_resolution_time': avg_resolution,
-        })
+        """Dashboard statistics scoped to user role.
+
+        Reads the pre-aggregated TicketStatsSnapshot row for the caller's
+        scope; `?day=YYYY-MM-DD` narrows it to tickets created that day.
+        """
+        from django.utils.dateparse import parse_date
+        key = TicketStatsSnapshot.key_for_user(request.user)
+        raw_day = request.query_params.get('day')
+        if raw_day:
+            try:
+                day = parse_date(raw_day)
+            except ValueError:
+                day = None
+            if not day:
+                return Response({'detail': 'day must be YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+            key = key and f'{key}{day.isoformat()}'
+        snapshot = TicketStatsSnapshot.objects.filter(key=key).first() if key else None
+        return Response((snapshot or TicketStatsSnapshot()).as_stats())
 
     @action(detail=True, methods=['get'])
     def messages(self, request, pk=None):
@@ -1156,6 +1279,25 @@ class TypeOfServiceViewSet(viewsets.ModelViewSet):
         return TypeOfService.objects.filter(is_active=True).order_by('name')
 
 
+ESCALATION_EXPORT = StreamingExport(
+    name='escalation_logs',
+    fields=[
+        'ticket__stf_no', 'escalation_type', 'from_user_id', 'to_user_id', 'to_external', 'notes', 'created_at',
+        *user_name_fields('from_user'), *user_name_fields('to_user'),
+    ],
+    columns=[
+        ('ticket', 'Ticket Number', lambda r: r['ticket__stf_no']),
+        ('escalation_type', 'Escalation Type', lambda r: r['escalation_type']),
+        ('from_user', 'From User', lambda r: display_name(r, 'from_user') if r['from_user_id'] else ''),
+        ('to_user', 'To User', lambda r: display_name(r, 'to_user') if r['to_user_id'] else ''),
+        ('to_external', 'External Recipient', lambda r: r['to_external']),
+        ('notes', 'Notes', lambda r: r['notes']),
+        ('created_at', 'Created At', lambda r: r['created_at']),
+    ],
+    date_field='created_at',
+)
+
+
 class EscalationLogViewSet(viewsets.ReadOnlyModelViewSet):
     """Read-only viewset for escalation logs (admin sees all, employee sees own)."""
     serializer_class = EscalationLogSerializer
@@ -1174,40 +1316,11 @@ class EscalationLogViewSet(viewsets.ReadOnlyModelViewSet):
             ).order_by('-created_at')
         return EscalationLog.objects.none()
 
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], renderer_classes=EXPORT_RENDERERS)
     def export(self, request):
-        """Export escalation logs as CSV."""
-        import csv
-        from django.http import HttpResponse as DjangoHttpResponse
-
-        qs = self.get_queryset().select_related('ticket', 'from_user', 'to_user')
-        response = DjangoHttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="escalation_logs_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow(['Ticket Number', 'Escalation Type', 'From User', 'To User', 'External Recipient', 'Notes', 'Created At'])
-        for log in qs[:5000]:
-            from_user_name = ''
-            if log.from_user:
-                full = log.from_user.get_full_name()
-                from_user_name = full if full.strip() else log.from_user.username
-            
-            to_user_name = ''
-            if log.to_user:
-                full = log.to_user.get_full_name()
-                to_user_name = full if full.strip() else log.to_user.username
-
-            writer.writerow([
-                log.ticket.stf_no if log.ticket else '',
-                log.escalation_type,
-                from_user_name,
-                to_user_name,
-                log.to_external or '',
-                log.notes,
-                log.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            ])
-
-        return response
+        """Stream escalation logs as CSV or JSONL (see tickets.exports for options)."""
+        qs = self.get_queryset().filter(**date_range_filter(request.query_params, 'created_at'))
+        return ESCALATION_EXPORT.response(request, qs)
 
 
 @swagger_auto_schema(method='get', tags=['Employees'])
@@ -1217,13 +1330,13 @@ def list_employees(request):
     """Return list of employees with their active ticket counts (for SLA-based assignment)."""
     if not (request.user.is_admin_level or request.user.role == User.ROLE_EMPLOYEE):
         return Response({'detail': 'Not allowed'}, status=status.HTTP_403_FORBIDDEN)
+    # A correlated count per employee, served by the (assigned_to, status) index
+    # without joining and grouping every ticket row.
+    active_tickets = Ticket.objects.filter(
+        assigned_to=OuterRef('pk'), status__in=Ticket.ACTIVE_STATUSES,
+    ).order_by().values('assigned_to').annotate(count=Count('*')).values('count')
     employees = User.objects.filter(role=User.ROLE_EMPLOYEE).annotate(
-        active_ticket_count=Count(
-            'assigned_tickets',
-            filter=Q(assigned_tickets__status__in=[
-                Ticket.STATUS_OPEN, Ticket.STATUS_IN_PROGRESS, Ticket.STATUS_ESCALATED,
-            ])
-        )
+        active_ticket_count=Coalesce(Subquery(active_tickets), 0),
     ).order_by('active_ticket_count', 'first_name', 'last_name')
     data = UserSerializer(employees, many=True).data
     emp_counts = {e.id: e.active_ticket_count for e in employees}
@@ -49,6 +49,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'tickets.audit_writer.AuditBatchMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -74,11 +75,49 @@ TEMPLATES = [
 WSGI_APPLICATION = 'tickets_backend.wsgi.application'
 ASGI_APPLICATION = 'tickets_backend.asgi.application'
 
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-    },
-}
+# Channel layer used by the WebSocket consumers. CHANNEL_LAYER selects:
+#   memory - in-process only; a single Daphne worker (default without REDIS_URL)
+#   redis  - REDIS_URL; required to run several workers or hosts
+#   sqlite - CHANNEL_LAYER_PATH; a local broker shared by workers on one host
+REDIS_URL = os.environ.get('REDIS_URL', '')
+CHANNEL_LAYER = os.environ.get('CHANNEL_LAYER', 'redis' if REDIS_URL else 'memory').lower()
+if CHANNEL_LAYER == 'redis':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [REDIS_URL or 'redis://127.0.0.1:6379/0'],
+                'prefix': os.environ.get('CHANNEL_LAYER_PREFIX', 'maptech'),
+            },
+        },
+    }
+elif CHANNEL_LAYER == 'sqlite':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'tickets.channel_layers.SQLiteChannelLayer',
+            'CONFIG': {
+                'path': os.environ.get('CHANNEL_LAYER_PATH', str(BASE_DIR / 'channel_layer.sqlite3')),
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+
+# Real-time notification pushes are queued on commit and delivered by this
+# backend (see tickets/dispatch.py). Use tickets.dispatch.SyncDispatcher to
+# deliver on the request thread instead.
+NOTIFICATION_DISPATCHER = os.environ.get('NOTIFICATION_DISPATCHER', 'tickets.dispatch.InProcessDispatcher')
+NOTIFICATION_QUEUE_SIZE = int(os.environ.get('NOTIFICATION_QUEUE_SIZE', '1000'))
+
+# Audit log entries are collected per request and inserted in one batch (see
+# tickets/audit_writer.py). Use tickets.audit_writer.BackgroundAuditWriter to
+# insert batches on a worker thread instead of the request thread.
+AUDIT_LOG_WRITER = os.environ.get('AUDIT_LOG_WRITER', 'tickets.audit_writer.SyncAuditWriter')
+AUDIT_LOG_QUEUE_SIZE = int(os.environ.get('AUDIT_LOG_QUEUE_SIZE', '1000'))
 
 DATABASE_URL = os.environ.get('DATABASE_URL')
 
@@ -117,6 +156,15 @@ else:
             'ENGINE': 'django.db.backends.sqlite3',
             # DB_PATH can be overridden via environment variable (e.g. inside Docker)
             'NAME': os.environ.get('DB_PATH', str(BASE_DIR / 'db.sqlite3')),
+            # Concurrent writers wait up to DB_TIMEOUT seconds for the lock
+            # instead of failing with "database is locked".
+            'OPTIONS': {
+                'timeout': int(os.environ.get('DB_TIMEOUT', '20')),
+            },
+            # A file-backed test database, so threaded tests share real locking.
+            'TEST': {
+                'NAME': os.environ.get('TEST_DB_PATH', str(BASE_DIR / 'test_db.sqlite3')),
+            },
         }
     }
 
@@ -144,10 +192,39 @@ MEDIA_URL = _media_url
 MEDIA_ROOT = Path(os.environ.get('MEDIA_ROOT', str(BASE_DIR / 'media')))
 MEDIA_ROOT.mkdir(parents=True, exist_ok=True)
 
+# Media is served by tickets.media after a permission check. Once the front
+# proxy can read MEDIA_ROOT, set MEDIA_OFFLOAD to 'x-accel-redirect' (nginx,
+# internal location at MEDIA_OFFLOAD_PREFIX) or 'x-sendfile' (Apache,
+# lighttpd) and the proxy streams the file instead of Django.
+MEDIA_OFFLOAD = os.environ.get('MEDIA_OFFLOAD', '').strip().lower()
+MEDIA_OFFLOAD_PREFIX = os.environ.get('MEDIA_OFFLOAD_PREFIX', '/protected-media/')
+
+# Thumbnails for attachments and avatars (tickets.previews). Video posters
+# need ffmpeg on PATH or at FFMPEG_BINARY.
+MEDIA_PREVIEW_BUILDER = os.environ.get('MEDIA_PREVIEW_BUILDER', 'tickets.previews.BackgroundPreviewBuilder')
+MEDIA_PREVIEW_QUEUE_SIZE = int(os.environ.get('MEDIA_PREVIEW_QUEUE_SIZE', '1000'))
+FFMPEG_BINARY = os.environ.get('FFMPEG_BINARY', '')
+
 FILE_UPLOAD_TEMP_DIR = os.environ.get('FILE_UPLOAD_TEMP_DIR', str(BASE_DIR / 'tmp_uploads'))
 Path(FILE_UPLOAD_TEMP_DIR).mkdir(parents=True, exist_ok=True)
 
-# Support larger multipart uploads for screenshots and video proof.
+# Resumable uploads (tickets.uploads): largest chunk per request, and how
+# long an unfinished upload may sit idle before purge_stale_uploads drops it.
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', str(8 * 1024 * 1024)))
+UPLOAD_MAX_IDLE_HOURS = int(os.environ.get('UPLOAD_MAX_IDLE_HOURS', '24'))
+
+# Uploaded files are hashed as they stream in, for content-addressed
+# attachment storage (tickets.blobs).
+FILE_UPLOAD_HANDLERS = [
+    'tickets.blobs.HashingMemoryFileUploadHandler',
+    'tickets.blobs.HashingTemporaryFileUploadHandler',
+]
+# Threads that write the files of one multi-file upload to storage.
+ATTACHMENT_WRITE_WORKERS = int(os.environ.get('ATTACHMENT_WRITE_WORKERS', '4'))
+
+# Support larger multipart uploads for screenshots and video proof. The
+# chunked upload API does not need these; they keep the single-request
+# upload_resolution_proof fallback working.
 FILE_UPLOAD_MAX_MEMORY_SIZE = int(os.environ.get('FILE_UPLOAD_MAX_MEMORY_SIZE', str(25 * 1024 * 1024)))
 DATA_UPLOAD_MAX_MEMORY_SIZE = int(
     os.environ.get(
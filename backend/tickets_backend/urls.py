@@ -1,14 +1,14 @@
 from django.contrib import admin
 from django.urls import path, include, re_path
 from django.conf import settings
-from django.conf.urls.static import static
-from django.views.static import serve
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from tickets.media import serve_media
+
 schema_view = get_schema_view(
     openapi.Info(
         title="Maptech Ticketing System API",
@@ -51,11 +51,9 @@ urlpatterns = [
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
 ]
 
-# Serve media files (profile pictures, ticket attachments, etc.).
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-else:
-    media_prefix = settings.MEDIA_URL.lstrip('/')
-    urlpatterns += [
-        re_path(rf'^{media_prefix}(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
-    ]
+# Serve media files (profile pictures, ticket attachments, etc.) to users
+# allowed to see them, with Range support; see tickets.media.
+media_prefix = settings.MEDIA_URL.lstrip('/')
+urlpatterns += [
+    re_path(rf'^{media_prefix}(?P<path>.*)$', serve_media, name='media'),
+]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 20:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_alter_user_role'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='profile_picture_previews',
+            field=models.JSONField(blank=True, default=dict, help_text='Generated profile picture thumbnails (see tickets.previews)'),
+        ),
+    ]
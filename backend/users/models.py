@@ -36,6 +36,11 @@ class User(AbstractUser):
         blank=True,
         help_text='User profile picture',
     )
+    profile_picture_previews = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text='Generated profile picture thumbnails (see tickets.previews)',
+    )
     recovery_key = models.CharField(
         max_length=255,
         db_index=True,
@@ -2,12 +2,14 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 
 from tickets.input_security import clean_text, sanitize_payload
+from tickets.previews import preview_urls
 
 User = get_user_model()
 
 class UserSerializer(serializers.ModelSerializer):
     has_usable_password = serializers.SerializerMethodField()
     profile_picture_url = serializers.SerializerMethodField()
+    profile_picture_previews = serializers.SerializerMethodField()
 
     class Meta:
         model = User
@@ -15,7 +17,7 @@ class UserSerializer(serializers.ModelSerializer):
             'id', 'username', 'email', 'role',
             'first_name', 'middle_name', 'last_name', 'suffix', 'phone',
             'last_login', 'is_active', 'has_usable_password',
-            'profile_picture', 'profile_picture_url',
+            'profile_picture', 'profile_picture_url', 'profile_picture_previews',
         ]
         extra_kwargs = {'profile_picture': {'write_only': True, 'required': False}}
 
@@ -31,6 +33,19 @@ class UserSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(url)
         return url
 
+    def get_profile_picture_previews(self, obj):
+        return preview_urls(obj, self.context.get('request'))
+
+
+class UserSummarySerializer(serializers.ModelSerializer):
+    """Compact user reference for high-volume list payloads."""
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'first_name', 'last_name', 'role']
+        read_only_fields = fields
+
+
 class AdminUserCreateSerializer(serializers.Serializer):
     first_name = serializers.CharField(max_length=150)
     middle_name = serializers.CharField(max_length=150, required=False, allow_blank=True)
@@ -451,8 +451,8 @@ export default function KnowledgeHub({ filter }: { filter?: 'uploaded' | 'publis
               >
                 {isImageFile(lead.file) ? (
                   <img
-                    src={lead.file}
-                    alt={getFileName(lead.file)}
+                    src={lead.previews?.thumb || lead.file}
+                    alt={(lead.file_name || getFileName(lead.file))}
                     className="w-full h-full object-cover"
                     onError={(e) => {
                       const target = e.target as HTMLImageElement;
@@ -566,8 +566,8 @@ export default function KnowledgeHub({ filter }: { filter?: 'uploaded' | 'publis
                       onClick={() => setSelected(att)}
                     >
                       <FileTypeIcon url={att.file} />
-                      <p className="min-w-0 flex-1 text-xs text-gray-700 dark:text-gray-300 truncate" title={getFileName(att.file)}>
-                        {getFileName(att.file)}
+                      <p className="min-w-0 flex-1 text-xs text-gray-700 dark:text-gray-300 truncate" title={(att.file_name || getFileName(att.file))}>
+                        {(att.file_name || getFileName(att.file))}
                       </p>
                       {renderRowActions(att)}
                     </div>
@@ -663,7 +663,7 @@ export default function KnowledgeHub({ filter }: { filter?: 'uploaded' | 'publis
                 {isImageFile(selected.file) ? (
                   <img
                     src={selected.file}
-                    alt={getFileName(selected.file)}
+                    alt={(selected.file_name || getFileName(selected.file))}
                     className="w-full max-h-96 object-contain cursor-pointer hover:opacity-90 transition-opacity"
                     onClick={() => openLightbox(selected.file)}
                     title="Click to view full size"
@@ -678,7 +678,7 @@ export default function KnowledgeHub({ filter }: { filter?: 'uploaded' | 'publis
                 ) : (
                   <div className="flex flex-col items-center justify-center py-12 gap-3">
                     <FileTypeIcon url={selected.file} />
-                    <p className="text-sm text-gray-500 dark:text-gray-400">{getFileName(selected.file)}</p>
+                    <p className="text-sm text-gray-500 dark:text-gray-400">{(selected.file_name || getFileName(selected.file))}</p>
                     <button
                       onClick={() => openLightbox(selected.file)}
                       className="inline-flex items-center gap-1.5 px-4 py-2 rounded-lg bg-[#0E8F79] text-white text-sm font-medium hover:bg-[#0b7a67] transition-colors"
@@ -691,7 +691,7 @@ export default function KnowledgeHub({ filter }: { filter?: 'uploaded' | 'publis
 
               {/* Details Grid */}
               <div className="grid grid-cols-1 sm:grid-cols-2 gap-4">
-                <DetailRow label="File Name" value={getFileName(selected.file)} />
+                <DetailRow label="File Name" value={(selected.file_name || getFileName(selected.file))} />
                 <DetailRow label="STF Number" value={selected.stf_no} />
                 <DetailRow label="Client" value={selected.client || '—'} />
                 <DetailRow
@@ -954,7 +954,7 @@ export default function KnowledgeHub({ filter }: { filter?: 'uploaded' | 'publis
             <div className="flex items-center justify-between p-5 border-b border-gray-100 dark:border-gray-700">
               <div>
                 <h2 className="text-lg font-bold text-gray-900 dark:text-white">Edit Published Article</h2>
-                <p className="text-sm text-gray-500 dark:text-gray-400">{getFileName(editTarget.file)}</p>
+                <p className="text-sm text-gray-500 dark:text-gray-400">{(editTarget.file_name || getFileName(editTarget.file))}</p>
               </div>
               <button
                 onClick={() => setEditTarget(null)}
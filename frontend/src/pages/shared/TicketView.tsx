@@ -496,7 +496,7 @@ export function TicketView() {
           remarks: btData.remarks || '',
           jobStatus: btData.job_status || '',
           ticketAttachments: (btData.attachments || []).map((a) => ({
-            name: a.file?.split('/').pop() || 'file',
+            name: a.file_name || a.file?.split('/').pop() || 'file',
             type: getResolutionAttachmentTypeFromName(a.file || ''),
           })),
           timeIn: btData.time_in ? new Date(btData.time_in).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }) : 'N/A',
@@ -573,6 +573,8 @@ export function TicketView() {
 
   // ── WebSocket Chat State ──
   const [chatMessages, setChatMessages] = useState<ChatMessage[]>([]);
+  const [hasOlderMessages, setHasOlderMessages] = useState(false);
+  const [loadingOlderMessages, setLoadingOlderMessages] = useState(false);
   const [newMsg, setNewMsg] = useState('');
   const [wsConnected, setWsConnected] = useState(false);
   const [typingUsers, setTypingUsers] = useState<Map<number, string>>(new Map());
@@ -646,7 +648,21 @@ export function TicketView() {
   const handleChatEvent = useCallback((event: ChatEvent) => {
     switch (event.type) {
       case 'message_history':
-        setChatMessages(event.messages);
+        if (event.incremental) {
+          // Reconnected: append only what was missed while offline
+          setChatMessages((prev) => {
+            const seen = new Set(prev.map((m) => m.id));
+            return [...prev, ...event.messages.filter((m) => m.id == null || !seen.has(m.id))];
+          });
+        } else {
+          setChatMessages(event.messages);
+          setHasOlderMessages(Boolean(event.has_more));
+        }
+        break;
+      case 'history_page':
+        setChatMessages((prev) => [...event.messages, ...prev]);
+        setHasOlderMessages(event.has_more);
+        setLoadingOlderMessages(false);
         break;
       case 'new_message':
         setChatMessages((prev) => [...prev, event.message]);
@@ -1291,7 +1307,7 @@ export function TicketView() {
       if (btData.attachments && btData.attachments.length > 0) {
         setUploadedAttachments(btData.attachments.map((a) => ({
           id: a.id,
-          name: a.file?.split('/').pop() || 'file',
+          name: a.file_name || a.file?.split('/').pop() || 'file',
           type: getResolutionAttachmentTypeFromName(a.file || ''),
           url: a.file,
         })));
@@ -1632,7 +1648,7 @@ export function TicketView() {
       const result = await uploadResolutionProof(backendTicketId, allFiles);
       const uploaded = (result as UploadedAttachment[]).map((att) => ({
         id: att.id,
-        name: att.file?.split('/').pop() || 'file',
+        name: att.file_name || att.file?.split('/').pop() || 'file',
         type: getResolutionAttachmentTypeFromName(att.file || ''),
         url: att.file,
       }));
@@ -1757,7 +1773,7 @@ export function TicketView() {
       <tbody>${escLogs.map((esc) => `<tr><td>${esc.created_at ? new Date(esc.created_at).toLocaleString() : ''}</td><td>${esc.from_user_name || ''}</td><td>${esc.to_user_name || esc.external_escalated_to || ''}</td><td>${esc.cascade_type || ''}</td><td>${esc.notes || ''}</td></tr>`).join('')}</tbody></table>` : ''}
       ${atts.length > 0 ? `<h2>Attachments</h2>
       <table><thead><tr><th>#</th><th>File Name</th><th>Type</th></tr></thead>
-      <tbody>${atts.map((att, i: number) => { const fname = att.file?.split('/').pop() || 'file'; const ftype = fname.match(/\.(mp4|webm)$/i) ? 'Recording' : fname.match(/\.(jpg|jpeg|png|gif)$/i) ? 'Screenshot' : 'Document'; return `<tr><td>${i+1}</td><td>${fname}</td><td>${ftype}</td></tr>`; }).join('')}</tbody></table>` : ''}
+      <tbody>${atts.map((att, i: number) => { const fname = att.file_name || att.file?.split('/').pop() || 'file'; const ftype = fname.match(/\.(mp4|webm)$/i) ? 'Recording' : fname.match(/\.(jpg|jpeg|png|gif)$/i) ? 'Screenshot' : 'Document'; return `<tr><td>${i+1}</td><td>${fname}</td><td>${ftype}</td></tr>`; }).join('')}</tbody></table>` : ''}
       ${ticket.feedbackRating ? `<h2>Feedback Ratings</h2>
       <div class="info-grid">
         <div class="info-row"><span class="info-label">Assignee:</span><span class="info-value">${ticket.assignedTo || 'Unassigned'}</span></div>
@@ -1983,7 +1999,7 @@ export function TicketView() {
         rowHeights[R] = { hpt: 24 }; R++;
         atts.forEach((att, i: number) => {
           const bg = i % 2 === 0 ? C.WHITE : C.ALT_ROW;
-          const fname = att.file?.split('/').pop() || 'file';
+          const fname = att.file_name || att.file?.split('/').pop() || 'file';
           const ftype = fname.match(/\.(mp4|webm)$/i) ? 'Recording' : fname.match(/\.(jpg|jpeg|png|gif)$/i) ? 'Screenshot' : 'Document';
           setCell(R, 0, sc(i + 1, bg, '000000', { center: true, sz: 10 }));
           setCell(R, 1, sc(fname, bg, '1D4ED8', { sz: 10 }));
@@ -3138,6 +3154,24 @@ export function TicketView() {
               className="h-full overflow-y-auto overflow-x-hidden px-4 py-3 space-y-1 scroll-smooth relative z-[1]"
               style={{ scrollbarWidth: 'thin', scrollbarColor: '#d1d5db transparent' }}
             >
+            {hasOlderMessages && (
+              <div className="flex justify-center py-2">
+                <button
+                  type="button"
+                  disabled={loadingOlderMessages}
+                  onClick={() => {
+                    const oldest = chatMessages.find((m) => m.id != null);
+                    if (!oldest || oldest.id == null) return;
+                    setLoadingOlderMessages(true);
+                    chatSocketRef.current?.loadHistory(oldest.id);
+                  }}
+                  className="text-xs font-medium text-gray-500 hover:text-gray-700 dark:text-gray-400 dark:hover:text-gray-200 disabled:opacity-50"
+                >
+                  {loadingOlderMessages ? 'Loading…' : 'Load older messages'}
+                </button>
+              </div>
+            )}
+
             {chatMessages.length === 0 && (
               <div className="flex flex-col items-center text-center pt-4">
                 <p className="text-sm font-medium text-gray-500 dark:text-gray-400">No messages yet</p>
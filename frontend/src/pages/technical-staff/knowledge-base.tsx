@@ -198,17 +198,18 @@ export default function TechnicalStaffKnowledgeBase() {
                   <div className="h-40 bg-gray-50 dark:bg-gray-900 flex items-center justify-center relative group">
                     {isImageUrl(lead.file_url) ? (
                       <img
-                        src={lead.file_url}
+                        src={lead.previews?.thumb || lead.file_url}
                         alt={lead.published_title}
                         className="w-full h-full object-cover"
                       />
                     ) : isVideoUrl(lead.file_url) ? (
                       <video
                         src={lead.file_url}
+                        poster={lead.previews?.thumb}
                         className="w-full h-full object-cover"
                         muted
                         playsInline
-                        preload="metadata"
+                        preload={lead.previews?.thumb ? 'none' : 'metadata'}
                       />
                     ) : (
                       <div className="flex flex-col items-center gap-2">
@@ -261,8 +262,8 @@ export default function TechnicalStaffKnowledgeBase() {
                           }}
                         >
                           <FileTypeIcon url={article.file_url} />
-                          <p className="min-w-0 flex-1 text-xs text-gray-700 dark:text-gray-300 truncate" title={getFileName(article.file_url)}>
-                            {getFileName(article.file_url)}
+                          <p className="min-w-0 flex-1 text-xs text-gray-700 dark:text-gray-300 truncate" title={(article.file_name || getFileName(article.file_url))}>
+                            {(article.file_name || getFileName(article.file_url))}
                           </p>
                         </div>
                       ))}
@@ -362,7 +363,7 @@ export default function TechnicalStaffKnowledgeBase() {
                 ) : (
                   <div className="flex flex-col items-center justify-center py-12 gap-3">
                     <FileTypeIcon url={selected.file_url} />
-                    <p className="text-sm text-gray-500 dark:text-gray-400">{getFileName(selected.file_url)}</p>
+                    <p className="text-sm text-gray-500 dark:text-gray-400">{(selected.file_name || getFileName(selected.file_url))}</p>
                     <a
                       href={selected.file_url}
                       target="_blank"
@@ -378,7 +379,7 @@ export default function TechnicalStaffKnowledgeBase() {
               <div className="grid grid-cols-1 sm:grid-cols-2 gap-4">
                 <DetailRow label="Title" value={selected.published_title} />
                 <DetailRow label="STF Number" value={selected.stf_no} />
-                <DetailRow label="File Name" value={getFileName(selected.file_url)} />
+                <DetailRow label="File Name" value={(selected.file_name || getFileName(selected.file_url))} />
                 <DetailRow label="Uploaded By" value={selected.uploaded_by_name || '—'} />
                 <DetailRow label="Published By" value={selected.published_by_name || '—'} />
                 <DetailRow label="Uploaded At" value={new Date(selected.uploaded_at).toLocaleString()} />
@@ -40,6 +40,15 @@ function normalizeMediaUrl(rawUrl: string | null | undefined): string {
   return trimmed;
 }
 
+/** Normalize the `{spec: url}` thumbnail map returned next to media files. */
+function normalizePreviewUrls(previews: Record<string, string> | null | undefined): Record<string, string> {
+  const normalized: Record<string, string> = {};
+  for (const [spec, url] of Object.entries(previews || {})) {
+    normalized[spec] = normalizeMediaUrl(url);
+  }
+  return normalized;
+}
+
 function normalizeTicketMedia(ticket: BackendTicket): BackendTicket {
   return {
     ...ticket,
@@ -163,7 +172,7 @@ export interface BackendTicket {
   external_escalated_at: string | null;
   // Nested
   tasks: { id: number; description: string; assigned_to: number | null; status: string }[];
-  attachments: { id: number; file: string; uploaded_by: number; uploaded_at: string; is_resolution_proof: boolean }[];
+  attachments: { id: number; file: string; file_name?: string; uploaded_by: number; uploaded_at: string; is_resolution_proof: boolean }[];
   escalation_logs: {
     id: number;
     escalation_type: string;
@@ -536,27 +545,98 @@ export async function linkTickets(ticketId: number, ticketIds: number[]): Promis
 export interface UploadedAttachment {
   id: number;
   file: string;
+  /** Name the file was uploaded under; `file` is a content-addressed path. */
+  file_name?: string;
   uploaded_by: number;
   uploaded_at: string;
   is_resolution_proof: boolean;
 }
 
-/** Upload resolution proof (supports one or multiple files). */
+interface ChunkedUploadState {
+  id: string;
+  size: number;
+  offset: number;
+  chunk_size: number;
+}
+
+const CHUNK_RETRIES = 3;
+
+async function sha256Hex(data: ArrayBuffer): Promise<string> {
+  const digest = await crypto.subtle.digest('SHA-256', data);
+  return Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, '0')).join('');
+}
+
+/** Upload one file through the resumable upload API, one verified chunk at a time. */
+async function uploadFileInChunks(ticketId: number, file: File): Promise<UploadedAttachment[] | null> {
+  const base = `${API_BASE}/tickets/${ticketId}/uploads/`;
+  const res = await apiFetch(base, {
+    method: 'POST',
+    headers: authHeaders(),
+    body: JSON.stringify({ filename: file.name, size: file.size, content_type: file.type }),
+  });
+  if (res.status === 404 || res.status === 405) return null; // server without chunked uploads
+  const upload = await handleResponse<ChunkedUploadState>(res);
+  const url = `${base}${upload.id}/`;
+
+  let offset = upload.offset;
+  let failures = 0;
+  while (offset < file.size) {
+    const chunk = await file.slice(offset, offset + upload.chunk_size).arrayBuffer();
+    let next: Response | null = null;
+    try {
+      next = await apiFetch(url, {
+        method: 'PUT',
+        headers: {
+          'Content-Type': 'application/offset+octet-stream',
+          'Upload-Offset': String(offset),
+          'Upload-Checksum': await sha256Hex(chunk),
+        },
+        body: chunk,
+      });
+    } catch {
+      next = null; // dropped connection: ask the server where to resume
+    }
+    if (next?.ok) {
+      offset = (await next.json()).offset;
+      failures = 0;
+      continue;
+    }
+    // Auth, missing-upload and size errors will not go away by retrying.
+    if (next && [401, 403, 404, 413].includes(next.status)) await handleResponse(next);
+    if (++failures > CHUNK_RETRIES) throw new Error(`Upload of "${file.name}" failed; please try again.`);
+    offset = (await handleResponse<ChunkedUploadState>(await apiFetch(url, { headers: authHeaders() }))).offset;
+  }
+
+  const done = await apiFetch(`${url}finalize/`, { method: 'POST', headers: authHeaders() });
+  return handleResponse<UploadedAttachment[]>(done);
+}
+
+/** Upload resolution proof (supports one or multiple files).
+ *
+ * Uses the resumable chunked upload API, falling back to a single multipart
+ * request where chunk hashing (WebCrypto, secure contexts only) or the
+ * chunked endpoints are unavailable.
+ */
 export async function uploadResolutionProof(ticketId: number, files: File | File[]): Promise<UploadedAttachment[]> {
   const fileList = Array.isArray(files) ? files : [files];
   const uploaded: UploadedAttachment[] = [];
+  const canChunk = typeof crypto !== 'undefined' && !!crypto.subtle;
 
   for (const file of fileList) {
-    const formData = new FormData();
-    formData.append('files', file);
-
-    const res = await apiFetch(`${API_BASE}/tickets/${ticketId}/upload_resolution_proof/`, {
-      method: 'POST',
-      headers: authHeaders(false),
-      body: formData,
-    });
+    let response = canChunk ? await uploadFileInChunks(ticketId, file) : null;
+
+    if (response === null) {
+      const formData = new FormData();
+      formData.append('files', file);
+
+      const res = await apiFetch(`${API_BASE}/tickets/${ticketId}/upload_resolution_proof/`, {
+        method: 'POST',
+        headers: authHeaders(false),
+        body: formData,
+      });
+      response = await handleResponse<UploadedAttachment[]>(res);
+    }
 
-    const response = await handleResponse<UploadedAttachment[]>(res);
     if (Array.isArray(response)) {
       uploaded.push(...response.map((attachment) => ({
         ...attachment,
@@ -833,6 +913,9 @@ export async function exportAuditLogs(params?: {
 export interface KnowledgeHubAttachment {
   id: number;
   file: string;
+  file_name?: string;
+  /** Thumbnail URLs by size (`thumb`, `preview`); empty until generated. */
+  previews?: Record<string, string>;
   uploaded_by: { id: number; username: string; email: string; role: string; first_name: string; last_name: string } | null;
   uploaded_at: string;
   is_resolution_proof: boolean;
@@ -868,6 +951,8 @@ export interface PublishedArticle {
   published_description: string;
   published_tags: string[];
   file_url: string;
+  file_name?: string;
+  previews?: Record<string, string>;
   stf_no: string;
   uploaded_by_name: string;
   published_by_name: string;
@@ -897,6 +982,7 @@ export async function fetchKnowledgeHubAttachments(params?: {
   return items.map((item) => ({
     ...item,
     file: normalizeMediaUrl(item.file),
+    previews: normalizePreviewUrls(item.previews),
   }));
 }
 
@@ -975,6 +1061,7 @@ export async function fetchPublishedArticles(params?: { search?: string }): Prom
   return items.map((item) => ({
     ...item,
     file_url: normalizeMediaUrl(item.file_url),
+    previews: normalizePreviewUrls(item.previews),
   }));
 }
 
@@ -48,7 +48,8 @@ export type TypingEvent = {
 };
 
 export type ChatEvent =
-  | { type: 'message_history'; messages: ChatMessage[] }
+  | { type: 'message_history'; messages: ChatMessage[]; has_more?: boolean; incremental?: boolean }
+  | { type: 'history_page'; before_id: number; messages: ChatMessage[]; has_more: boolean }
   | { type: 'new_message'; message: ChatMessage }
   | { type: 'typing'; user_id: number; username: string; display_name?: string; is_typing: boolean }
   | {
@@ -117,6 +118,8 @@ export class TicketChatSocket {
   private reconnectTimer?: ReturnType<typeof setTimeout>;
   private shouldReconnect = true;
   private reconnectDelay = 1000;
+  // Newest message seen, so a reconnect only fetches what was missed.
+  private lastMessageId: number | null = null;
 
   constructor(
     ticketId: number,
@@ -132,7 +135,11 @@ export class TicketChatSocket {
   private connect() {
     const token = getAccessToken();
     const base = getWsBaseUrl();
-    const url = `${base}/ws/chat/${this.ticketId}/${this.channelType}/${token ? `?token=${encodeURIComponent(token)}` : ''}`;
+    const params = new URLSearchParams();
+    if (token) params.set('token', token);
+    if (this.lastMessageId != null) params.set('since_id', String(this.lastMessageId));
+    const query = params.toString();
+    const url = `${base}/ws/chat/${this.ticketId}/${this.channelType}/${query ? `?${query}` : ''}`;
 
     this.ws = new WebSocket(url);
 
@@ -143,8 +150,9 @@ export class TicketChatSocket {
 
     this.ws.onmessage = (e) => {
       try {
-        const data = JSON.parse(e.data);
-        this.callbacks.onEvent(data as ChatEvent);
+        const data = JSON.parse(e.data) as ChatEvent;
+        this.trackLastMessage(data);
+        this.callbacks.onEvent(data);
       } catch {
         /* ignore malformed frames */
       }
@@ -165,6 +173,17 @@ export class TicketChatSocket {
     };
   }
 
+  private trackLastMessage(event: ChatEvent) {
+    const messages = event.type === 'message_history'
+      ? event.messages
+      : event.type === 'new_message' ? [event.message] : [];
+    for (const m of messages) {
+      if (m.id != null && (this.lastMessageId == null || m.id > this.lastMessageId)) {
+        this.lastMessageId = m.id;
+      }
+    }
+  }
+
   // ── Outbound actions ──
 
   send(action: string, payload: Record<string, unknown> = {}) {
@@ -202,6 +221,10 @@ export class TicketChatSocket {
     reader.readAsDataURL(file);
   }
 
+  loadHistory(beforeId: number, limit?: number) {
+    this.send('load_history', { before_id: beforeId, ...(limit ? { limit } : {}) });
+  }
+
   sendTyping(isTyping: boolean) {
     this.send('typing', { is_typing: isTyping });
   }